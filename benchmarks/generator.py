@@ -0,0 +1,109 @@
+#This module generates synthetic temporal paper-author multiplexes for benchmarks, in the file formats the readers expect:
+#a meta file (paper author year) for read_meta_create_collab and a citation edge list (cited citing) for read_edgelist.
+#All sampling is vectorized and seeded, so the same parameters always give the same files.
+
+import json
+import os
+import numpy
+
+SIZES = {'10k':10000,'100k':100000,'1M':1000000,'10M':10000000}
+META_FILE = 'meta.txt'
+CITATION_FILE = 'citations.txt'
+YEARS_FILE = 'years.npy'
+PARAMETERS_FILE = 'parameters.json'
+
+################################################################
+    ##
+#Function to generate a synthetic multiplex
+def generate(directory,n_papers,seed=0,first_year=1950,last_year=2015,growth=0.04,authors_exponent=2.5,max_authors=100,
+             new_author_probability=0.3,mean_references=10.,chunk_size=1000000):
+    '''Writes meta file, citation edge list, paper years and parameters of a synthetic multiplex with n_papers papers to directory. Returns the dict of parameters.
+    
+    The number of papers per year grows by growth per year from first_year to last_year. The number of authors per paper
+    is Zipf distributed (authors_exponent, at most max_authors); an author slot is a new author with new_author_probability,
+    otherwise the author of a uniformly drawn earlier slot, i.e. authors are drawn proportional to their number of papers.
+    Papers make Poisson(mean_references) references to papers of earlier years, drawn proportional to 1+citations received
+    before the citing year (preferential attachment that respects time).'''
+    parameters = {'n_papers':int(n_papers),'seed':seed,'first_year':first_year,'last_year':last_year,'growth':growth,
+                  'authors_exponent':authors_exponent,'max_authors':max_authors,'new_author_probability':new_author_probability,
+                  'mean_references':mean_references}
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    rnd = numpy.random.RandomState(seed)
+    
+    years = paper_years(n_papers,first_year,last_year,growth)
+    papers,authors = authorships(rnd,n_papers,authors_exponent,max_authors,new_author_probability)
+    cited,citing = citations(rnd,years,mean_references)
+    parameters['n_authors'] = int(authors.max())+1 if len(authors)>0 else 0
+    parameters['n_authorships'] = len(papers)
+    parameters['n_citations'] = len(cited)
+    
+    numpy.save(os.path.join(directory,YEARS_FILE),years)
+    _write_pairs(os.path.join(directory,META_FILE),'paper author year','p%d a%d %d',(papers,authors,years[papers]),chunk_size)
+    _write_pairs(os.path.join(directory,CITATION_FILE),'cited citing','p%d p%d',(cited,citing),chunk_size)
+    with open(os.path.join(directory,PARAMETERS_FILE),'w') as f:
+        json.dump(parameters,f,indent=1)
+    return parameters
+
+
+################################################################
+    ##
+#Functions to sample the parts of the multiplex
+def paper_years(n_papers,first_year,last_year,growth):
+    '''Returns the sorted publication years of n_papers papers, the number of papers per year growing exponentially.'''
+    weights = (1.+growth)**numpy.arange(last_year-first_year+1)
+    per_year = numpy.floor(n_papers*numpy.cumsum(weights)/weights.sum()+0.5).astype('int64')
+    return numpy.repeat(numpy.arange(first_year,last_year+1),numpy.diff(numpy.concatenate(([0],per_year))))
+
+def authorships(rnd,n_papers,authors_exponent,max_authors,new_author_probability):
+    '''Returns aligned arrays (papers, authors) of the authorships, without duplicate (paper, author) pairs.'''
+    n_authors = numpy.minimum(rnd.zipf(authors_exponent,size=n_papers),max_authors)
+    papers = numpy.repeat(numpy.arange(n_papers),n_authors)
+    
+    #every slot copies the author of a uniformly drawn earlier slot, unless it gets a new author (as the first slot always does)
+    n_slots = len(papers)
+    parent = (rnd.random_sample(n_slots)*numpy.arange(n_slots)).astype('int64')
+    new = rnd.random_sample(n_slots)<new_author_probability
+    new[:1] = True
+    parent[new] = numpy.flatnonzero(new)
+    while True: #pointer jumping, until every slot points at a slot with a new author
+        grand_parent = parent[parent]
+        if (grand_parent==parent).all():
+            break
+        parent = grand_parent
+    authors = numpy.cumsum(new)-1
+    authors = authors[parent]
+    
+    keys = numpy.unique(papers*n_slots+authors)
+    return keys//n_slots,keys%n_slots
+
+def citations(rnd,years,mean_references):
+    '''Returns aligned arrays (cited, citing) of citations to papers of earlier years, drawn by preferential attachment year by year.'''
+    n_papers = len(years)
+    received = numpy.zeros(n_papers,dtype='int64')
+    cited = []
+    citing = []
+    year_starts = numpy.searchsorted(years,numpy.unique(years))
+    for lo,hi in zip(year_starts[1:].tolist(),numpy.append(year_starts[2:],n_papers).tolist()):
+        references = rnd.poisson(mean_references,size=hi-lo)
+        new_citing = numpy.repeat(numpy.arange(lo,hi),references)
+        cumulative = numpy.cumsum(received[:lo]+1)
+        new_cited = numpy.searchsorted(cumulative,rnd.random_sample(len(new_citing))*cumulative[-1],side='right')
+        keys = numpy.unique(new_citing*n_papers+new_cited) #no multi-edges
+        cited.append(keys%n_papers)
+        citing.append(keys//n_papers)
+        received += numpy.bincount(cited[-1],minlength=n_papers)
+    if not cited:
+        return numpy.zeros(0,dtype='int64'),numpy.zeros(0,dtype='int64')
+    return numpy.concatenate(cited),numpy.concatenate(citing)
+
+
+#################################################
+#helper functions
+
+def _write_pairs(path,header,line_format,columns,chunk_size):
+    with open(path,'w') as f:
+        f.write(header+'\n')
+        for lo in xrange(0,len(columns[0]),chunk_size):
+            rows = zip(*[column[lo:lo+chunk_size].tolist() for column in columns])
+            f.write('\n'.join(line_format%row for row in rows)+'\n')
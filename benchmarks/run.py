@@ -0,0 +1,378 @@
+#This module times the public entry points of scientometric_graph_tool on synthetic multiplexes (see generator.py).
+#Every benchmark runs in a fresh process, so its peak RSS is its own; results are written to JSON and can be compared
+#against a stored baseline to flag regressions.
+#
+#usage: python -m benchmarks.run --size 100k --output results.json [--baseline baseline.json]
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import time
+import numpy
+from scientometric_graph_tool import array_utils
+from scientometric_graph_tool import citation_net
+from scientometric_graph_tool import multiplex_structures
+from benchmarks import generator
+
+SLOW_LIMIT = 1000000 #line-by-line readers are only run up to this number of papers, unless all benchmarks are requested
+MIN_RSS_CHANGE_MB = 8. #smaller changes of the memory of a kernel are not reported as regressions
+
+class Timer():
+    'Wall clock time and peak RSS of the timed part of a benchmark'
+
+    def __init__(self):
+        self.seconds=None
+        self.setup_peak_rss_mb=None
+        self.start_rss_mb=None
+        self.peak_rss_mb=None
+        self.kernel_rss_mb=None
+
+    def start(self):
+        self.setup_peak_rss_mb=_peak_rss_mb()
+        self._reset=_reset_peak_rss()
+        self.start_rss_mb=_rss_mb() if self._reset else self.setup_peak_rss_mb
+        self._t0=time.time()
+
+    def stop(self):
+        self.seconds=time.time()-self._t0
+        self.peak_rss_mb=_peak_rss_mb()
+        #memory the timed part needs on top of what the setup left; without a reset of the peak only growth beyond the setup's peak is seen
+        self.kernel_rss_mb=max(self.peak_rss_mb-self.start_rss_mb,0.)
+
+
+################################################################
+    ##
+#Functions preparing the networks the benchmarks work on (not timed)
+def load_citation_net(data):
+    '''Returns the PaperCitationNet of the citation edge list in data, with the publication years of the generator.'''
+    net=citation_net.PaperCitationNet()
+    net.read_edgelist(os.path.join(data,generator.CITATION_FILE),bulk=True)
+    years=numpy.load(os.path.join(data,generator.YEARS_FILE))
+    vertices=net._citation_graphml_vertex_id_to_gt_id.lookup(['p%d'%i for i in xrange(len(years))])
+    found=vertices>=0 #papers without citations are not in the edge list
+    net.graph.vertex_properties['year'].a[vertices[found]]=years[found]
+    return net
+
+def build_multiplex(data):
+    '''Returns the PaperAuthorMultiplex of the meta file and citation edge list in data.'''
+    m=multiplex_structures.PaperAuthorMultiplex()
+    m.read_meta_create_collab(os.path.join(data,generator.META_FILE),bulk=True)
+    cited,citing=_read_citations(os.path.join(data,generator.CITATION_FILE),m._citation_graphml_vertex_id_to_gt_id)
+    new_edges=array_utils.add_edges(m.citation,cited,citing)
+    m.citation.edge_properties['year'].a[new_edges]=m.citation.vertex_properties['year'].a[citing]
+    return m
+
+def load_multiplex(data):
+    '''Returns the multiplex from the snapshot in data, with all parts materialized.'''
+    m=multiplex_structures.PaperAuthorMultiplex()
+    m.load_snapshot(os.path.join(data,'snapshot'))
+    for attribute in m._snapshot.lazy_attributes:
+        getattr(m,attribute)
+    return m
+
+
+################################################################
+    ##
+#Benchmarks: functions of (data directory, parameters, timer) returning the number of items processed
+def bench_read_edgelist(data,parameters,timer):
+    net=citation_net.PaperCitationNet()
+    timer.start()
+    net.read_edgelist(os.path.join(data,generator.CITATION_FILE))
+    timer.stop()
+    return parameters['n_citations']
+
+def bench_read_edgelist_bulk(data,parameters,timer):
+    net=citation_net.PaperCitationNet()
+    timer.start()
+    net.read_edgelist(os.path.join(data,generator.CITATION_FILE),bulk=True)
+    timer.stop()
+    return parameters['n_citations']
+
+def bench_read_meta_create_collab(data,parameters,timer):
+    m=multiplex_structures.PaperAuthorMultiplex()
+    timer.start()
+    m.read_meta_create_collab(os.path.join(data,generator.META_FILE))
+    timer.stop()
+    return parameters['n_authorships']
+
+def bench_read_meta_create_collab_bulk(data,parameters,timer):
+    m=multiplex_structures.PaperAuthorMultiplex()
+    timer.start()
+    m.read_meta_create_collab(os.path.join(data,generator.META_FILE),bulk=True)
+    timer.stop()
+    return parameters['n_authorships']
+
+def bench_molloy_reed(data,parameters,timer):
+    net=load_citation_net(data)
+    timer.start()
+    citation_net.MolloyReedCitationInstance(net,seed=parameters['seed'])
+    timer.stop()
+    return parameters['n_citations']
+
+def bench_socially_biased_citations(data,parameters,timer):
+    m=load_multiplex(data)
+    timer.start()
+    m.socially_biased_citations(as_arrays=True)
+    timer.stop()
+    return parameters['n_citations']
+
+def bench_socially_biased_citations_parallel(data,parameters,timer):
+    m=load_multiplex(data)
+    timer.start()
+    m.socially_biased_citations(as_arrays=True,processes=None)
+    timer.stop()
+    return parameters['n_citations']
+
+def bench_citation_success(data,parameters,timer):
+    m=load_multiplex(data)
+    timer.start()
+    m.citation_success(range(parameters['first_year'],parameters['last_year']+1),5,90)
+    timer.stop()
+    return parameters['n_papers']
+
+def bench_shortest_path_collab_formation_sweep(data,parameters,timer):
+    m=load_multiplex(data)
+    timer.start()
+    m.shortest_path_collab_formation_sweep(min_year=parameters['first_year'])
+    timer.stop()
+    return m.collab.num_edges()
+
+def bench_multiplex_property_mapping(data,parameters,timer):
+    m=load_multiplex(data)
+    degree=m.collab.degree_property_map('total')
+    timer.start()
+    m.multiplex_property_mapping(m.citation.vertex_properties['year'].a>=0,m.citation.vertex_properties['year'],degree,'citation_to_collab','mean',as_arrays=True)
+    timer.stop()
+    return parameters['n_authorships']
+
+def bench_projection(data,parameters,timer):
+    m=load_multiplex(data)
+    timer.start()
+    m.projection('collab')
+    timer.stop()
+    return parameters['n_authorships']
+
+def bench_pickle(data,parameters,timer):
+    m=load_multiplex(data)
+    timer.start()
+    m.pickle(os.path.join(data,'pickled'))
+    timer.stop()
+    return parameters['n_papers']
+
+def bench_unpickle(data,parameters,timer):
+    m=multiplex_structures.PaperAuthorMultiplex()
+    timer.start()
+    m.unpickle(os.path.join(data,'pickled'))
+    timer.stop()
+    return parameters['n_papers']
+
+def bench_save_snapshot(data,parameters,timer):
+    m=load_multiplex(data)
+    timer.start()
+    m.save_snapshot(os.path.join(data,'snapshot_copy'))
+    timer.stop()
+    return parameters['n_papers']
+
+def bench_load_snapshot(data,parameters,timer):
+    timer.start()
+    load_multiplex(data)
+    timer.stop()
+    return parameters['n_papers']
+
+#(name, function, slow): in this order, so that pickle runs before unpickle
+BENCHMARKS = [('read_edgelist',bench_read_edgelist,True),
+              ('read_edgelist_bulk',bench_read_edgelist_bulk,False),
+              ('read_meta_create_collab',bench_read_meta_create_collab,True),
+              ('read_meta_create_collab_bulk',bench_read_meta_create_collab_bulk,False),
+              ('MolloyReedCitationInstance',bench_molloy_reed,False),
+              ('socially_biased_citations',bench_socially_biased_citations,False),
+              ('socially_biased_citations_parallel',bench_socially_biased_citations_parallel,False),
+              ('citation_success',bench_citation_success,False),
+              ('shortest_path_collab_formation_sweep',bench_shortest_path_collab_formation_sweep,False),
+              ('multiplex_property_mapping',bench_multiplex_property_mapping,False),
+              ('projection',bench_projection,False),
+              ('pickle',bench_pickle,False),
+              ('unpickle',bench_unpickle,False),
+              ('save_snapshot',bench_save_snapshot,False),
+              ('load_snapshot',bench_load_snapshot,False)]
+
+
+################################################################
+    ##
+#Function to run the benchmarks
+def run(data,names=None,repeat=1,run_all=False):
+    '''Runs the benchmarks (all by default) on the generated data directory, each in a fresh process. Returns dict name -> {seconds, items, items_per_second, peak_rss_mb, kernel_rss_mb, setup_peak_rss_mb}; seconds is the minimum over repeat runs, the memory the maximum.'''
+    with open(os.path.join(data,generator.PARAMETERS_FILE),'r') as f:
+        parameters=json.load(f)
+    if not os.path.exists(os.path.join(data,'snapshot',multiplex_structures.snapshot.MANIFEST)):
+        _in_process(_prepare,data)
+
+    results={}
+    for name,function,slow in BENCHMARKS:
+        if names is not None and name not in names:
+            continue
+        if names is None and slow and not run_all and parameters['n_papers']>SLOW_LIMIT:
+            continue
+        runs=[_in_process(_measure,function,data,parameters) for i in xrange(repeat)]
+        best=min(runs,key=lambda r:r['seconds'])
+        best['peak_rss_mb']=max(r['peak_rss_mb'] for r in runs)
+        best['kernel_rss_mb']=max(r['kernel_rss_mb'] for r in runs)
+        results[name]=best
+        print '%-40s %10.3f s %14.0f items/s %10.1f MB %10.1f MB kernel'%(name,best['seconds'],best['items_per_second'],best['peak_rss_mb'],best['kernel_rss_mb'])
+    return results
+
+################################################################
+    ##
+#Function to compare results against a baseline
+def compare(results,baseline,tolerance=0.2):
+    '''Returns a list of (name, quantity, value, baseline value) for the benchmarks whose seconds or kernel_rss_mb (the memory of the timed part, without the setup) exceed the baseline by more than the fraction tolerance; memory changes below MIN_RSS_CHANGE_MB are ignored.'''
+    regressions=[]
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        for quantity in ('seconds','kernel_rss_mb'):
+            if quantity not in baseline[name]: #results of an older version of the benchmarks
+                continue
+            value=results[name][quantity]
+            reference=baseline[name][quantity]
+            if quantity=='kernel_rss_mb' and value-reference<MIN_RSS_CHANGE_MB:
+                continue
+            if reference>=0 and value>reference*(1.+tolerance):
+                regressions.append((name,quantity,value,reference))
+    return regressions
+
+
+################################################################
+    ##
+#Command line interface
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Benchmark scientometric_graph_tool on a synthetic multiplex.')
+    parser.add_argument('--size',default='10k',help='one of '+', '.join(sorted(generator.SIZES,key=generator.SIZES.get))+' papers')
+    parser.add_argument('--papers',type=int,default=None,help='number of papers (overrides --size)')
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--data',default=None,help='directory of the generated data (reused if it exists)')
+    parser.add_argument('--output',default=None,help='JSON file to write the results to')
+    parser.add_argument('--baseline',default=None,help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance',type=float,default=0.2,help='allowed relative slowdown or memory growth')
+    parser.add_argument('--repeat',type=int,default=1)
+    parser.add_argument('--only',nargs='+',default=None,help='names of the benchmarks to run')
+    parser.add_argument('--all',action='store_true',help='also run the line-by-line readers on more than %d papers'%SLOW_LIMIT)
+    args=parser.parse_args(argv)
+
+    n_papers=args.papers if args.papers is not None else generator.SIZES[args.size]
+    data=args.data
+    if data is None:
+        data=os.path.join('benchmark_data','papers%d_seed%d'%(n_papers,args.seed))
+    if not os.path.exists(os.path.join(data,generator.PARAMETERS_FILE)):
+        print 'Generating %d papers in %s'%(n_papers,data)
+        generator.generate(data,n_papers,seed=args.seed)
+    with open(os.path.join(data,generator.PARAMETERS_FILE),'r') as f:
+        parameters=json.load(f)
+
+    results=run(data,names=args.only,repeat=args.repeat,run_all=args.all)
+    report={'parameters':parameters,'python':platform.python_version(),'numpy':numpy.__version__,'machine':platform.node(),
+            'time':time.strftime('%Y-%m-%d %H:%M:%S'),'results':results}
+    if args.output is not None:
+        with open(args.output,'w') as f:
+            json.dump(report,f,indent=1,sort_keys=True)
+
+    if args.baseline is not None:
+        with open(args.baseline,'r') as f:
+            baseline=json.load(f)
+        if baseline['parameters']['n_papers']!=parameters['n_papers'] or baseline['parameters']['seed']!=parameters['seed']:
+            print 'Warning: the baseline was measured on different data'
+        regressions=compare(results,baseline['results'],args.tolerance)
+        for name,quantity,value,reference in regressions:
+            print 'REGRESSION %-40s %s %.3f (baseline %.3f)'%(name,quantity,value,reference)
+        if regressions:
+            return 1
+        print 'No regressions.'
+    return 0
+
+
+#################################################
+#helper functions
+
+def _peak_rss_mb():
+    peak=_proc_status_mb('VmHWM')
+    if peak is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024. #kilobytes on Linux
+    return peak
+
+def _rss_mb():
+    return _proc_status_mb('VmRSS')
+
+def _reset_peak_rss():
+    #Linux (since 4.0) resets the peak RSS of the process to its current RSS, so the peak of the timed part can be measured alone
+    try:
+        with open('/proc/self/clear_refs','w') as f:
+            f.write('5')
+    except (IOError,OSError):
+        return False
+    return _rss_mb() is not None
+
+def _proc_status_mb(field):
+    try:
+        with open('/proc/self/status','r') as f:
+            for line in f:
+                if line.startswith(field+':'):
+                    return int(line.split()[1])/1024. #kB
+    except (IOError,OSError):
+        pass
+    return None
+
+def _read_citations(path,ids):
+    cited=[]
+    citing=[]
+    with open(path,'r') as f:
+        f.readline()
+        for line in f:
+            tmp=line.split()
+            cited.append(tmp[0])
+            citing.append(tmp[1])
+    return ids.lookup(cited),ids.lookup(citing)
+
+def _prepare(data):
+    snapshot_directory=os.path.join(data,'snapshot')
+    if os.path.isdir(snapshot_directory):
+        shutil.rmtree(snapshot_directory)
+    build_multiplex(data).save_snapshot(snapshot_directory)
+
+def _measure(function,data,parameters):
+    timer=Timer()
+    items=function(data,parameters,timer)
+    return {'seconds':timer.seconds,'items':items,'items_per_second':items/max(timer.seconds,1e-9),
+            'peak_rss_mb':timer.peak_rss_mb,'kernel_rss_mb':timer.kernel_rss_mb,'setup_peak_rss_mb':timer.setup_peak_rss_mb}
+
+def _in_process(function,*args):
+    #run function in a child process (progress output of the readers is discarded) and return its result
+    receiver,sender=multiprocessing.Pipe(duplex=False)
+    def target():
+        sys.stdout=open(os.devnull,'w')
+        sender.send(function(*args))
+    process=multiprocessing.Process(target=target)
+    process.start()
+    sender.close()
+    try:
+        result=receiver.recv()
+    except EOFError:
+        raise BenchmarkFailedError(function.__name__+' '+str(args[0].__name__ if callable(args[0]) else args[0]))
+    finally:
+        process.join()
+    return result
+
+
+#################################################
+#define Error Classes
+
+class BenchmarkFailedError(Exception):
+    pass
+
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#This module implements numpy helpers shared by the bulk (array based) code paths
+
+import numpy
+
+################################################################
+    ##
+#Function to get edge endpoints and edge indices of a graph as arrays
+def edge_arrays(graph):
+    '''Returns arrays (sources, targets, edge_indices) of all edges of graph, in graph-tool edge iteration order.'''
+    edges = graph.get_edges()
+    if edges.shape[0] == 0:
+        empty = numpy.zeros(0, dtype='int64')
+        return empty, empty.copy(), empty.copy()
+    if edges.shape[1] < 3: #newer graph-tool versions only return (source, target) by default
+        edges = graph.get_edges([graph.edge_index])
+    edges = edges.astype('int64')
+    return edges[:, 0], edges[:, 1], edges[:, 2]
+
+
+################################################################
+    ##
+#Function to add many edges and get their edge indices
+def add_edges(graph,sources,targets):
+    '''Adds the edges (sources[k], targets[k]) to graph with add_edge_list and returns their edge indices, in the same order. The pairs must be distinct. graph-tool reuses the indices of removed edges, so the new edges only get the indices from edge_index_range on if no edge was removed.'''
+    sources = numpy.asarray(sources,dtype='int64')
+    targets = numpy.asarray(targets,dtype='int64')
+    if len(sources)==0:
+        return numpy.zeros(0,dtype='int64')
+    first_new_edge = graph.edge_index_range
+    reuses_indices = graph.num_edges()<first_new_edge
+    if reuses_indices:
+        old_indices = numpy.sort(edge_arrays(graph)[2])
+    graph.add_edge_list(numpy.column_stack((sources,targets)))
+    if not reuses_indices:
+        return numpy.arange(first_new_edge,first_new_edge+len(sources),dtype='int64')
+
+    #find the new edges by index, then match them to the requested pairs by their endpoints
+    s,t,idx = edge_arrays(graph)
+    position = numpy.minimum(numpy.searchsorted(old_indices,idx),max(len(old_indices)-1,0))
+    new = (old_indices[position]!=idx) if len(old_indices)>0 else numpy.ones(len(idx),dtype=bool)
+    n = max(graph.num_vertices(),1)
+    keys = _pair_keys(s[new],t[new],n,graph.is_directed())
+    order = numpy.argsort(keys,kind='mergesort')
+    found = numpy.searchsorted(keys[order],_pair_keys(sources,targets,n,graph.is_directed()))
+    return idx[new][order[found]]
+
+################################################################
+    ##
+#Function to find unique values in order of their first occurrence
+def unique_first_occurrence(values):
+    '''Returns (unique values in order of first occurrence, inverse index array mapping values onto them).'''
+    values = numpy.asarray(values)
+    if len(values) == 0:
+        return values[:0], numpy.zeros(0, dtype='int64')
+    uniq, first, inverse = numpy.unique(values, return_index=True, return_inverse=True)
+    order = numpy.argsort(first, kind='mergesort')
+    rank = numpy.empty(len(order), dtype='int64')
+    rank[order] = numpy.arange(len(order))
+    return uniq[order], rank[inverse]
+
+
+################################################################
+    ##
+#Function to build a compressed sparse row (CSR) structure from (row, column) pairs
+def csr_from_pairs(rows,cols,n_rows,index_dtype='int64',values=None):
+    '''Returns (offsets, columns) of the CSR structure of the pairs, columns sorted within each row. If values are given, returns (offsets, columns, values) with values permuted alongside.'''
+    rows = numpy.asarray(rows,dtype='int64')
+    cols = numpy.asarray(cols,dtype='int64')
+    order = numpy.lexsort((cols,rows))
+    offsets = numpy.zeros(n_rows+1,dtype='int64')
+    numpy.cumsum(numpy.bincount(rows,minlength=n_rows),out=offsets[1:])
+    if values is not None:
+        return offsets, cols[order].astype(index_dtype), numpy.asarray(values)[order]
+    return offsets, cols[order].astype(index_dtype)
+
+
+################################################################
+    ##
+#Function to expand CSR offsets into the row index of every stored entry
+def csr_rows(offsets):
+    '''Returns the row index of every entry of a CSR structure with the given offsets.'''
+    return numpy.repeat(numpy.arange(len(offsets)-1,dtype='int64'),numpy.diff(offsets))
+
+
+################################################################
+    ##
+#Function to gather the CSR rows of many vertices at once
+def csr_positions(offsets,rows):
+    '''Returns (position of the requested row, position in the CSR index array) for all entries of the requested rows, in request order.'''
+    rows = numpy.asarray(rows,dtype='int64')
+    starts = offsets[rows]
+    lengths = offsets[rows+1]-starts
+    owner = numpy.repeat(numpy.arange(len(rows),dtype='int64'),lengths)
+    positions = numpy.arange(len(owner),dtype='int64')-numpy.repeat(numpy.cumsum(lengths)-lengths,lengths)+starts[owner]
+    return owner, positions
+
+def csr_gather(offsets,indices,rows):
+    '''Returns (position of the requested row, stored entry) for all entries of the requested rows, in request order.'''
+    owner, positions = csr_positions(offsets,rows)
+    return owner, indices[positions]
+
+
+################################################################
+    ##
+#Function to sum values over consecutive segments
+def segment_sums(offsets,values):
+    '''Returns the sums of values[offsets[i]-offsets[0]:offsets[i+1]-offsets[0]] for all segments i.'''
+    offsets = numpy.asarray(offsets,dtype='int64')
+    cumulative = numpy.zeros(len(values)+1,dtype=numpy.result_type(values,'int64'))
+    numpy.cumsum(values,out=cumulative[1:])
+    return cumulative[offsets[1:]-offsets[0]]-cumulative[offsets[:-1]-offsets[0]]
+
+
+################################################################
+    ##
+#Function to reduce values over consecutive segments
+SEGMENT_REDUCTIONS = ('sum','mean','max','min','count','median')
+
+def segment_reduce(offsets,values,reduction):
+    '''Returns reduction (one of SEGMENT_REDUCTIONS) of values[offsets[i]-offsets[0]:offsets[i+1]-offsets[0]] for all segments i; segments must not be empty.'''
+    offsets = numpy.asarray(offsets,dtype='int64')
+    values = numpy.asarray(values)
+    counts = numpy.diff(offsets)
+    if reduction=='count':
+        return counts
+    if values.dtype==bool:
+        values = values.astype('int64')
+    if len(counts)==0:
+        return numpy.zeros(0,dtype='float64' if reduction in ('mean','median') else values.dtype)
+    starts = offsets[:-1]-offsets[0]
+    if reduction=='sum':
+        return numpy.add.reduceat(values,starts)
+    if reduction=='mean':
+        return numpy.add.reduceat(values.astype('float64'),starts)/counts
+    if reduction=='max':
+        return numpy.maximum.reduceat(values,starts)
+    if reduction=='min':
+        return numpy.minimum.reduceat(values,starts)
+    if reduction=='median':
+        #sort within segments, then average the middle value(s)
+        ordered = values[numpy.lexsort((values,csr_rows(offsets)))].astype('float64')
+        return (ordered[starts+(counts-1)//2]+ordered[starts+counts//2])/2.
+    raise ValueError('unknown reduction '+str(reduction))
+
+
+################################################################
+    ##
+#Function to test membership in a sorted array
+def in_sorted(values,sorted_values):
+    '''Returns a bool array, True where values occur in the sorted array sorted_values.'''
+    if len(sorted_values)==0:
+        return numpy.zeros(len(values),dtype=bool)
+    pos = numpy.searchsorted(sorted_values,values)
+    pos[pos==len(sorted_values)] = 0
+    return sorted_values[pos]==values
+
+
+################################################################
+    ##
+#Function to split work into blocks of bounded size
+def work_blocks(work,limit):
+    '''Returns boundaries b such that the items b[i]:b[i+1] have a total work of at most limit (or are a single item).'''
+    total = numpy.cumsum(work)
+    bounds = [0]
+    while bounds[-1]<len(work):
+        start = bounds[-1]
+        done = total[start-1] if start>0 else 0
+        end = int(numpy.searchsorted(total,done+limit,side='right'))
+        bounds.append(max(end,start+1))
+    return bounds
+
+
+################################################################
+    ##
+#Function to turn a selection of vertices into an index array
+def vertex_selection(vertices,n):
+    '''Returns the vertex indices of a bool vertex property map or array (mask of the first n vertices), an index array or an iterable of vertex objects.'''
+    if hasattr(vertices,'a') and vertices.a is not None:
+        #graph-tool stores bool property maps as uint8
+        return numpy.flatnonzero(vertices.a[:n])
+    if isinstance(vertices,numpy.ndarray):
+        if vertices.dtype==bool:
+            return numpy.flatnonzero(vertices[:n])
+        return vertices.astype('int64')
+    return numpy.fromiter((int(v) for v in vertices),dtype='int64')
+
+
+#################################################
+#helper functions
+
+def _pair_keys(sources,targets,n,directed):
+    if not directed:
+        sources,targets = numpy.minimum(sources,targets),numpy.maximum(sources,targets)
+    return sources*n+targets
@@ -7,7 +7,13 @@ import graph_tool.all as gt
 import csv
 import itertools
 import random
-import time
+import logging
+import numpy
+import array_utils
+import external_memory
+import id_index
+import result_cache
+import instrumentation
 
 ######################################################################################################
 
@@ -19,28 +25,33 @@ class PaperCitationNet():
         #create empty citation_net
         self.graph = gt.Graph(directed=True)
         self.graph.vertex_properties['year']=self.graph.new_vertex_property('int')
-        self.graph.vertex_properties['_graphml_vertex_id']=self.graph.new_vertex_property('string')
         self.graph.edge_properties['year']=self.graph.new_edge_property('int')        
         
-        self._citation_graphml_vertex_id_to_gt_id = {}
+        #paper id strings by vertex index, with lookup of the vertex index of an id
+        self._citation_graphml_vertex_id_to_gt_id = id_index.IdIndex()
+        
+        #number of changes so far; cached results are only valid for the version they were computed at
+        self.version = 0
+        self._result_cache = None
     
 ###############################################################
-    def read_edgelist(self,citation_file,delimiter=' ',cited_column=0,citing_column=1,header=True):
+    def read_edgelist(self,citation_file,delimiter=' ',cited_column=0,citing_column=1,header=True,bulk=False,chunk_size=1000000,memory_budget=None,tmp_dir=None):
+        '''Reads a citation edge list (cited paper, citing paper per line). With bulk=True the file is parsed in chunks of chunk_size lines and the graph is built with one batched edge insertion. With memory_budget (bytes) the file is read out of core, spilling to tmp_dir (see external_memory.read_edgelist).'''
+        self.version+=1
+        if memory_budget is not None:
+            return external_memory.read_edgelist(self,citation_file,delimiter,cited_column,citing_column,header,memory_budget,tmp_dir)
+        if bulk==True:
+            return self._read_edgelist_bulk(citation_file,delimiter,cited_column,citing_column,header,chunk_size)
         
         with open(citation_file,'r') as f:
             if header==True:
                 header_text=f.readline()
             cou=0
-            t_prev=time.time()
-            t_cum=0
+            duplicates=0
             for line in f:
                 cou+=1
                 if cou-10000*(cou/10000)==0:
-                    print 'Lines read: '+str(cou)
-                    t=time.time()
-                    t_cum+=t-t_prev
-                    t_prev=t
-                    print 'Time passed: '+str(t_cum)
+                    instrumentation.progress('read_edgelist',cou)
                 tmp=line.split(delimiter)
                 cited_paper=tmp[cited_column].rstrip()
                 citing_paper=tmp[citing_column].rstrip()
@@ -58,13 +69,77 @@ class PaperCitationNet():
                     try:
                         self.add_citation(cited_paper,citing_paper)
                     except NoSuchPaperError:
-                        print 'Something is terribly wrong...'
+                        instrumentation.message('read_edgelist: something is terribly wrong...',logging.ERROR)
                         break
                 except CitationExistsAlreadyError:
-                    #print "should be new: "+cited_paper+' '+citing_paper
-                    pass
-                    
-            
+                    duplicates+=1
+        instrumentation.count('read_edgelist.lines',cou)
+        instrumentation.count('read_edgelist.duplicates',duplicates)
+
+###############################################################
+    def _read_edgelist_bulk(self,citation_file,delimiter,cited_column,citing_column,header,chunk_size):
+        #papers are numbered in order of first appearance (cited before citing within a line), exactly as add_paper would do it
+        n_existing = self.graph.num_vertices()
+        codes = []
+        
+        with open(citation_file,'r') as f, instrumentation.timer('read_edgelist.parse'):
+            if header==True:
+                header_text=f.readline()
+            cou=0
+            while True:
+                lines = list(itertools.islice(f,chunk_size))
+                if not lines:
+                    break
+                cou+=len(lines)
+                
+                rows = [line.split(delimiter) for line in lines]
+                ids = [None]*(2*len(rows))
+                ids[0::2] = [tmp[cited_column].rstrip() for tmp in rows]
+                ids[1::2] = [tmp[citing_column].rstrip() for tmp in rows]
+                del rows,lines
+                
+                #intern the paper ids of this chunk into dense integer indices
+                codes.append(self._citation_graphml_vertex_id_to_gt_id.add_many(ids))
+                del ids
+                
+                instrumentation.progress('read_edgelist',cou)
+        instrumentation.count('read_edgelist.lines',cou)
+        
+        if codes:
+            codes = numpy.concatenate(codes)
+        else:
+            codes = numpy.zeros(0,dtype='int64')
+        cited = codes[0::2]
+        citing = codes[1::2]
+        del codes
+        
+        #remove duplicate citations, keeping the first occurrence of each pair in file order
+        n_vertices = len(self._citation_graphml_vertex_id_to_gt_id)
+        keys = cited*n_vertices+citing
+        first = numpy.sort(numpy.unique(keys,return_index=True)[1])
+        cited = cited[first]
+        citing = citing[first]
+        keys = keys[first]
+        
+        #drop citations that are already in the graph
+        if self.graph.num_edges()>0:
+            s,t,idx = array_utils.edge_arrays(self.graph)
+            is_new = ~numpy.in1d(keys,s*n_vertices+t)
+            cited = cited[is_new]
+            citing = citing[is_new]
+        del keys
+        instrumentation.count('read_edgelist.duplicates',cou-len(cited))
+        
+        #add new papers with year 0
+        if n_vertices>n_existing:
+            self.graph.add_vertex(n_vertices-n_existing)
+            self.graph.vertex_properties['year'].a[n_existing:] = 0
+        
+        #add all citations at once; the citation year is the year of the citing paper
+        if len(cited)>0:
+            new_edges = array_utils.add_edges(self.graph,cited,citing)
+            years = self.graph.vertex_properties['year'].a
+            self.graph.edge_properties['year'].a[new_edges] = years[citing]
         
         
 ###############################################################    
@@ -73,12 +148,12 @@ class PaperCitationNet():
     
 ###############################################################
     def read_graphml(self,citation_file,citation_meta):
+        self.version+=1
         self.graph = gt.load_graph(citation_file)
         self.graph.vertex_properties['year']=self.graph.new_vertex_property('int')
         
-        self._citation_graphml_vertex_id_to_gt_id = {}
-        for v in self.graph.vertices(): 
-            self._citation_graphml_vertex_id_to_gt_id[self.graph.vertex_properties['_graphml_vertex_id'][v]]=int(self.graph.vertex_index[v])
+        self._citation_graphml_vertex_id_to_gt_id = id_index.IdIndex([self.graph.vertex_properties['_graphml_vertex_id'][v] for v in self.graph.vertices()])
+        del self.graph.vertex_properties['_graphml_vertex_id']
         
         f=open(citation_meta,'r')
         dialect=csv.Sniffer().sniff(f.readline())
@@ -114,6 +189,7 @@ class PaperCitationNet():
     #Function to add new papers, incl. collaborations
     def add_paper(self,paper_id,year):
         '''Add a paper with paper_id (str), publication year (int)'''    
+        self.version+=1
         #try whether paper exists already in citation network
         try:
             self._citation_graphml_vertex_id_to_gt_id[paper_id]
@@ -123,8 +199,7 @@ class PaperCitationNet():
     
         #add new paper to citation network and additional data structures
         new_paper=self.graph.add_vertex()
-        self._citation_graphml_vertex_id_to_gt_id[paper_id]=self.graph.vertex_index[new_paper]
-        self.graph.vertex_properties['_graphml_vertex_id'][new_paper]=paper_id
+        self._citation_graphml_vertex_id_to_gt_id.add(paper_id)
         self.graph.vertex_properties['year'][new_paper]=int(year)
         return new_paper
     
@@ -134,6 +209,7 @@ class PaperCitationNet():
     #Funtion to add citation to citation network
     def add_citation(self,cited_paper,citing_paper):
         '''Add citation between two paper in citation network.'''
+        self.version+=1
         try:
             cited_paper_gt=self._citation_graphml_vertex_id_to_gt_id[cited_paper]
         except KeyError:
@@ -153,12 +229,46 @@ class PaperCitationNet():
             raise CitationExistsAlreadyError()
     
 
+################################################################
+    ##
+    #Degree property map of the citation graph
+    def degree_property_map(self,deg):
+        '''Returns the degree property map of the citation graph, deg being 'in' (references made), 'out' (citations received) or 'total' as in graph-tool.'''
+        return self.graph.degree_property_map(deg)
+
+################################################################
+    ##
+    #Functions to cache derived results while the network is unchanged
+    def enable_result_cache(self,max_entries=32):
+        '''Keep the results of degree_property_map by arguments in an LRU cache of max_entries results; add_paper, add_citation and the readers increase .version and thereby invalidate them.'''
+        self._result_cache=result_cache.ResultCache(max_entries)
+
+    def disable_result_cache(self):
+        '''Stop caching results.'''
+        self._result_cache=None
+
 ################################################################
     ##
     #Function to get vertex_id's from vertex objects
     def vertex_id(self,iterable_of_vertices):
         'Returns an iterator of vertex id strings of the vertex objects specified in iterable_of_vertices'
-        return itertools.imap(lambda x: self.graph.vertex_properties['_graphml_vertex_id'][x],iterable_of_vertices)
+        return itertools.imap(lambda x: self._citation_graphml_vertex_id_to_gt_id.id_of(int(x)),iterable_of_vertices)
+
+################################################################
+    ##
+    #Functions to convert between vertices and ids of many vertices at once
+    def vertex_ids(self,vertices):
+        '''Returns (data, offsets): the id strings of the vertices packed into one byte array, the id of the k-th vertex being data[offsets[k]:offsets[k+1]]. vertices may be a bool vertex mask (property map or array), an index array or an iterable of vertex objects.'''
+        return self._citation_graphml_vertex_id_to_gt_id.ids_packed(array_utils.vertex_selection(vertices,self.graph.num_vertices()))
+
+    def write_vertex_ids(self,vertices,filename,separator='\n'):
+        '''Writes the id strings of the vertices (selected as in vertex_ids) to filename (or a file object), each followed by separator.'''
+        self._citation_graphml_vertex_id_to_gt_id.write_ids(filename,array_utils.vertex_selection(vertices,self.graph.num_vertices()),separator)
+
+    def vertex_indices(self,ids):
+        '''Returns (indices, missing): the vertex indices of the id strings ids (a list or a numpy array of byte strings), -1 where missing is True.'''
+        indices = self._citation_graphml_vertex_id_to_gt_id.lookup(ids)
+        return indices,indices<0
 
 
 ##########################################################################################################################
@@ -167,199 +277,215 @@ class MolloyReedCitationInstance(PaperCitationNet):
     'A class for Molloy-Reed shuffled citation graphs'
      
 ##########################################################   
-    def __init__(self,citation_net):
-        '''This calculates ONE random alternative multiplex, with citations reshuffled, such that a) time is still respected and b) degrees are kept the same.'''
+    def __init__(self,citation_net,seed=None,max_tries=100):
+        '''This calculates ONE random alternative citation network, with citations reshuffled, such that a) time is still respected and b) degrees are kept the same. seed makes the realization reproducible.'''
         ############
         
         #initialize new graph that will hold the shuffled realization
         self.graph=citation_net.graph.copy()
+        self._citation_graphml_vertex_id_to_gt_id=citation_net._citation_graphml_vertex_id_to_gt_id #vertices are not changed, only citations
+        self._random=random.Random(seed)
+        self.version=0
+        self._result_cache=None
+        
+        years=numpy.asarray(self.graph.vertex_properties['year'].a,dtype='int64')
+        n_vertices=len(years)
+        if n_vertices==0:
+            return
+        self.min_year=int(years.min())
+        self.max_year=int(years.max())
         
         ##first we create the necessary data structures
-        #keep track of empty in- and out-links of nodes in a double dictionary; the outer keys (year), are very few
-        #This will be a few kb data structure, plus content to-be-filled below
-        #outer key: year
-        #inner key: _empty_in_links
-        
-        #self.min_year=min(self.graph.vertex_properties['year'].get_array())
-        #self.max_year=max(self.graph.vertex_properties['year'].get_array())
-        
-        self.min_year=citation_net.min_year
-        self.max_year=citation_net.max_year
-        
-        max_in_degree = int(max(self.graph.degree_property_map('in').get_array()))
-        max_out_degree = int(max(self.graph.degree_property_map('out').get_array()))
-
-        self._empty_in_links={}
-        self._empty_out_links={}
-        
-        for y in range(self.min_year,self.max_year+1):
-            self._empty_in_links[y]={}
-            for k in xrange(max_in_degree+1):
-                self._empty_in_links[y][k]=[]
-            self._empty_out_links[y]={}
-            for k in xrange(max_out_degree+1):
-                self._empty_out_links[y][k]=[]
-    
-        #create property map
-        self._vertex_empty_in_links = self.graph.new_vertex_property('int')
-        self._vertex_empty_out_links = self.graph.new_vertex_property('int')
-    
-        #initialize _empty_in_links and _empty_out_links list as well as property map
-        for v in self.graph.vertices():
-            v_year = self.graph.vertex_properties['year'][v]
-            v_in = v.in_degree()
-            v_out = v.out_degree()
-            if v_in>0:
-                self._empty_in_links[v_year][v.in_degree()].append(v)
-                self._vertex_empty_in_links[v] = v.in_degree()
-            if v_out>0:
-                self._empty_out_links[v_year][v.out_degree()].append(v)
-                self._vertex_empty_out_links[v] = v.out_degree()
-        
-        #cut all edges
-        self.graph.clear_edges()
+        #every vertex gets one free out-stub per citation it received and one free in-stub per reference it makes.
+        #Stubs are kept in one list per year; removal swaps the last element into the gap, so it is O(1).
+        #The free in-stubs and placed citations per year are counted in cumulative (Fenwick) indices over years,
+        #so a stub of any year > y can be drawn uniformly in O(log(#years)).
+        n_years=self.max_year-self.min_year+1
+        slot=years-self.min_year
+        out_degree=numpy.asarray(self.graph.degree_property_map('out').a,dtype='int64')
+        in_degree=numpy.asarray(self.graph.degree_property_map('in').a,dtype='int64')
+        
+        self._free_out_stubs=_stubs_by_year(slot,out_degree,n_years)
+        self._free_in_stubs=_stubs_by_year(slot,in_degree,n_years)
+        self._free_in_counts=_CumulativeCounts([len(stubs) for stubs in self._free_in_stubs])
+        
+        #placed citations, by year of the citing paper
+        self._placed_cited=[[] for y in xrange(n_years)]
+        self._placed_citing=[[] for y in xrange(n_years)]
+        self._placed_counts=_CumulativeCounts([0]*n_years)
+        self._placed=set() #keys cited*n_vertices+citing, to exclude multi-edges
+        
+        self.cuts=0
         
         ###########
         #then we define internal functions needed for the algorithm
-        ###
-        def select_free_out(year):
-            #get list of list of all youngest nodes with empty out-links (i.e. with k>0 !!)
-            #flatten this list of lists
-            all_youngest = list(itertools.chain.from_iterable(self._empty_out_links[year].values()[1:]))
-            try:
-                x = random.choice(all_youngest)
-                return x
-            except IndexError: #when list is empty
-                raise NoFreeOutLinksError()
+        rnd=self._random
         
         ###
-        def select_free_in(year,exclude_node):
-            #get list of list of all nodes with empty in-links (i.e. with k>0 !!) from years > year
-            #flatten this list of lists
-            #if no exclude_node list is specified, then select from all possible
-            if exclude_node == None:
-                all_youngest=[]
-                for i in range(year+1,self.max_year+1):
-                    all_youngest.extend(list(itertools.chain.from_iterable(self._empty_in_links[i].values()[1:])))
-                try:
-                    y = random.choice(all_youngest)
-                    return y
-                except IndexError: #when list is empty
-                    raise NoFreeInLinksError()
-            #if exclude_node list is specified, then remove these nodes from the choice
-            else:
-                all_youngest=[]
-                for i in range(year+1,self.max_year+1):
-                    all_youngest.extend(list(itertools.chain.from_iterable(self._empty_in_links[i].values()[1:])))
-                for ex in exclude_node:
-                    try:
-                        all_youngest.remove(ex)
-                    except ValueError:
-                        pass
-                try:
-                    y = random.choice(all_youngest)
-                    return y
-                except IndexError: #when list is empty
-                    raise NoFreeInLinksError()
-                
-                
+        def select_free_in(year_slot,out_link_node):
+            #draw free in-stubs of years > year_slot, until one does not duplicate an existing citation of out_link_node
+            counts=self._free_in_counts
+            offset=counts.prefix(year_slot)
+            available=counts.total-offset
+            if available==0:
+                raise NoFreeInLinksError()
+            for i in xrange(max_tries):
+                y_slot,k=counts.find(offset+rnd.randrange(available))
+                in_link_node=self._free_in_stubs[y_slot][k]
+                if out_link_node*n_vertices+in_link_node not in self._placed:
+                    return y_slot,k
+            #all draws collided: collect the admissible stubs explicitly
+            candidates=[]
+            for y_slot in xrange(year_slot+1,n_years):
+                for k,in_link_node in enumerate(self._free_in_stubs[y_slot]):
+                    if out_link_node*n_vertices+in_link_node not in self._placed:
+                        candidates.append((y_slot,k))
+            if not candidates:
+                raise NoFreeInLinksError()
+            return rnd.choice(candidates)
+        
         ###
-        def cut(year):
-            all_occupied=[]
-            for i in range(year+1,self.max_year+1):
-                all_occupied.extend(self._empty_in_links[i].values()[0])
-            try:
-                y = random.choice(all_occupied)
-            except IndexError: #when list is empty ... should not be possible ... 
+        def cut(year_slot,out_link_node):
+            #remove a random citation to a paper of year > year_slot and return its free in-stub
+            counts=self._placed_counts
+            offset=counts.prefix(year_slot)
+            available=counts.total-offset
+            if available==0:
                 raise BadError()
-            
-            #choose an edge
-            all_in_nodes = []
-            for v in y.in_neighbours():
-                all_in_nodes.append(v) 
-            x = random.choice(all_in_nodes)
-            #change empty_link properties
-            y_year=self.graph.vertex_properties['year'][y]
-            
-            self._empty_in_links[y_year][self._vertex_empty_in_links[y]].remove(y)
-            self._vertex_empty_in_links[y]+=1
-            self._empty_in_links[y_year][self._vertex_empty_in_links[y]].append(y)
-            
-            x_year=self.graph.vertex_properties['year'][x]
-            
-            self._empty_out_links[x_year][self._vertex_empty_out_links[x]].remove(x)
-            self._vertex_empty_out_links[x]+=1
-            self._empty_out_links[x_year][self._vertex_empty_out_links[x]].append(x)
-            
-            #remove_edge
-            self.graph.remove_edge(self.graph.edge(x,y))
-            
-            #return            
+            for i in xrange(max_tries):
+                y_slot,k=counts.find(offset+rnd.randrange(available))
+                if out_link_node*n_vertices+self._placed_citing[y_slot][k] not in self._placed:
+                    break
+            else:
+                #all draws collided: collect the admissible citations explicitly
+                candidates=[]
+                for y_slot in xrange(year_slot+1,n_years):
+                    for k,in_link_node in enumerate(self._placed_citing[y_slot]):
+                        if out_link_node*n_vertices+in_link_node not in self._placed:
+                            candidates.append((y_slot,k))
+                if not candidates:
+                    raise BadError()
+                y_slot,k=rnd.choice(candidates)
+            x=_swap_remove(self._placed_cited[y_slot],k)
+            y=_swap_remove(self._placed_citing[y_slot],k)
+            counts.add(y_slot,-1)
+            self._placed.discard(x*n_vertices+y)
+            #the cited paper gets its out-stub back
+            self._free_out_stubs[slot[x]].append(x)
+            self.cuts+=1
             return x,y
         
         ##
         def new_edge(out_link_node,in_link_node):
-            #change empty_in_link and empty_out_link properties accordingly
-            in_link_node_year = self.graph.vertex_properties['year'][in_link_node]
+            y_slot=slot[in_link_node]
+            self._placed_cited[y_slot].append(out_link_node)
+            self._placed_citing[y_slot].append(in_link_node)
+            self._placed_counts.add(y_slot,1)
+            self._placed.add(out_link_node*n_vertices+in_link_node)
+        
+        ############
+        #then we go on with actually shuffling edges, always completing the oldest year with free out-stubs first
+        slot=slot.tolist()
+        year_slot=0
+        while year_slot<n_years:
+            out_stubs=self._free_out_stubs[year_slot]
+            if not out_stubs:
+                year_slot+=1
+                continue
+            out_link_node=_swap_remove(out_stubs,rnd.randrange(len(out_stubs)))
+            try:
+                y_slot,k=select_free_in(year_slot,out_link_node)
+                in_link_node=_swap_remove(self._free_in_stubs[y_slot],k)
+                self._free_in_counts.add(y_slot,-1)
+            except NoFreeInLinksError: #if no younger in-link is free ...
+                #cut a suitable in-link
+                cut_out_link_node,in_link_node=cut(year_slot,out_link_node)
+                year_slot=min(year_slot,slot[cut_out_link_node])
+            #write new edge
+            new_edge(out_link_node,in_link_node)
+        
+        #write shuffled citations into the graph
+        cited=list(itertools.chain.from_iterable(self._placed_cited))
+        citing=list(itertools.chain.from_iterable(self._placed_citing))
+        self.graph.clear_edges()
+        if cited:
+            new_edges=array_utils.add_edges(self.graph,cited,citing)
+            if 'year' in self.graph.edge_properties: #not stored by a compact multiplex
+                self.graph.edge_properties['year'].a[new_edges]=years[citing]
+        
+        instrumentation.count('MolloyReedCitationInstance.cuts',self.cuts)
+        problems=len(_causality_problems(self.graph))
+        if problems>0:
+            instrumentation.message('MolloyReedCitationInstance: %d causality problems after shuffling'%problems,logging.WARNING)
+                
+##########################################################################################################################
             
-            self._empty_in_links[in_link_node_year][self._vertex_empty_in_links[in_link_node]].remove(in_link_node)
-            self._vertex_empty_in_links[in_link_node]-=1
-            self._empty_in_links[in_link_node_year][self._vertex_empty_in_links[in_link_node]].append(in_link_node)
+class EdgeSwapCitationInstance(PaperCitationNet):
+    'A class for citation graphs randomized by time-respecting double edge swaps'
+     
+##########################################################   
+    def __init__(self,citation_net,seed=None,swaps_per_edge=10,batch_size=None):
+        '''This calculates ONE random alternative citation network by swaps_per_edge*(number of citations) proposed double edge swaps on a copy of the citation graph: citations (a,b) and (c,d) become (a,d) and (c,b), which keeps in- and out-degrees. A swap is accepted if both new citations point forward in time and do not exist yet. Proposals are drawn and checked in batches of batch_size (default: 1/64 of the citations). seed makes the realization reproducible.'''
+        self.graph=citation_net.graph.copy()
+        self._citation_graphml_vertex_id_to_gt_id=citation_net._citation_graphml_vertex_id_to_gt_id #vertices are not changed, only citations
+        self._random=numpy.random.RandomState(seed)
+        self.version=0
+        self._result_cache=None
+        
+        years=numpy.asarray(self.graph.vertex_properties['year'].a,dtype='int64')
+        n_vertices=len(years)
+        cited,citing,idx=array_utils.edge_arrays(self.graph)
+        n_edges=len(cited)
+        self.swaps=0
+        self.proposals=0
+        self.acceptance_rate=0.
+        if n_edges<2:
+            return
+        if batch_size is None:
+            batch_size=max(n_edges//64,1)
+        
+        #existing citations, as keys cited*n_vertices+citing
+        existing=_KeySet(cited*n_vertices+citing)
+        
+        n_proposals=int(swaps_per_edge*n_edges)
+        while self.proposals<n_proposals:
+            size=min(batch_size,n_proposals-self.proposals)
+            self.proposals+=size
+            i=self._random.randint(0,n_edges,size)
+            j=self._random.randint(0,n_edges,size)
             
-            out_link_node_year = self.graph.vertex_properties['year'][out_link_node]
+            #proposals of one batch must not share citations, the first one wins
+            first=_first_occurrences(numpy.column_stack((i,j)).ravel()).reshape(size,2).all(axis=1)
+            ok=first&(i!=j)
+            i=i[ok]
+            j=j[ok]
             
-            self._empty_out_links[out_link_node_year][self._vertex_empty_out_links[out_link_node]].remove(out_link_node)
-            self._vertex_empty_out_links[out_link_node]-=1
-            self._empty_out_links[out_link_node_year][self._vertex_empty_out_links[out_link_node]].append(out_link_node)
+            #both new citations point forward in time and are new
+            a,b,c,d=cited[i],citing[i],cited[j],citing[j]
+            ok=(years[d]>years[a])&(years[b]>years[c])&(a!=c)&(b!=d)
+            new_ad=a*n_vertices+d
+            new_cb=c*n_vertices+b
+            ok[ok]=~existing.contains(new_ad[ok])&~existing.contains(new_cb[ok])
+            i,j,new_ad,new_cb=i[ok],j[ok],new_ad[ok],new_cb[ok]
             
-            #write new edge
-            self.graph.add_edge(out_link_node,in_link_node)
+            #and no two proposals of the batch create the same citation
+            ok=_first_occurrences(numpy.column_stack((new_ad,new_cb)).ravel()).reshape(len(i),2).all(axis=1)
+            i,j,new_ad,new_cb=i[ok],j[ok],new_ad[ok],new_cb[ok]
             
+            existing.remove(numpy.concatenate((cited[i]*n_vertices+citing[i],cited[j]*n_vertices+citing[j])))
+            existing.add(numpy.concatenate((new_ad,new_cb)))
+            citing[i],citing[j]=citing[j],citing[i]
+            self.swaps+=len(i)
+        self.acceptance_rate=float(self.swaps)/self.proposals
         
-        ############
-        #then we go on with actually shuffling edges
-        all_years = range(self.min_year,self.max_year+1)
-        try:
-            #find youngest year of nodes that have empty out-links
-            year_index = 0
-            while True:
-                try:
-                    year = all_years[year_index]
-                except IndexError: #Error occurs if all possible years are exhausted
-                    raise ExhaustedPossibleYearsError()
-                    
-                try:
-                    out_link_node = select_free_out(year)
-                
-                    while True:
-                        try:
-                            #exclude self node and all already neighbors from choice of where to link to
-                            exclude_nodes_from_choice=[out_link_node]
-                            exclude_nodes_from_choice.extend(list(out_link_node.out_neighbours()))
-                            in_link_node=select_free_in(year,exclude_nodes_from_choice)
-                            year_index=0
-                            break
-                        except NoFreeInLinksError: #if no older than "year" in-link is free ...
-                            #cut a suitable in-link
-                            in_link_node = cut(year)[1]
-                            year_index=0
-                            break
-
-                    #write new edge
-                    new_edge(out_link_node,in_link_node)
-                
-                except NoFreeOutLinksError: #when list is empty, second line above
-                    year_index+=1
-                #         
-        except ExhaustedPossibleYearsError:
-            print('Finished shuffling!')
-            print ('Old edges:')
-            for e in citation_net.graph.edges():
-                print e
-            print ('New edges:')
-            for e in self.graph.edges():
-                print e
-            check_citation_causality(self.graph)
+        #write swapped citations into the graph, in the order of the original edges
+        self.graph.clear_edges()
+        new_edges=array_utils.add_edges(self.graph,cited,citing)
+        if 'year' in self.graph.edge_properties: #not stored by a compact multiplex
+            self.graph.edge_properties['year'].a[new_edges]=years[citing]
+        
+        instrumentation.count('EdgeSwapCitationInstance.swaps',self.swaps)
+        instrumentation.count('EdgeSwapCitationInstance.proposals',self.proposals)
                 
 ###############################################################################################################################
 ##define global functions
@@ -368,12 +494,7 @@ class MolloyReedCitationInstance(PaperCitationNet):
 def check_citation_causality(citation_net):
     print 'Causality check ...'
     print 'Returns list of edges with causality problems...'
-    problems = []
-    for e in citation_net.edges():
-        s = e.source()
-        t = e.target()
-        if citation_net.vertex_properties['year'][s]>=citation_net.vertex_properties['year'][t]:
-            problems.append(str(e))
+    problems = ['(%d, %d)' % (s,t) for s,t in _causality_problems(citation_net)]
     
     if len(problems)>0:
         print len(problems), ' causality Problems detected!'
@@ -382,6 +503,144 @@ def check_citation_causality(citation_net):
         print 'No causality problems!'
         return
 
+def _causality_problems(citation_net):
+    #(cited, citing) pairs of the citations that do not point forward in time
+    s,t,idx = array_utils.edge_arrays(citation_net)
+    years = citation_net.vertex_properties['year'].a
+    bad = numpy.flatnonzero(years[s]>=years[t])
+    return zip(s[bad].tolist(),t[bad].tolist())
+
+################################################################
+#helpers of the Molloy-Reed shuffling
+
+class _CumulativeCounts():
+    'Fenwick tree over per-year counts: point updates and prefix sums in O(log(#years))'
+    
+    def __init__(self,counts):
+        self.n=len(counts)
+        self.total=0
+        self._tree=[0]*(self.n+1)
+        for i,c in enumerate(counts):
+            self.add(i,c)
+        self._top=1
+        while self._top*2<=self.n:
+            self._top*=2
+    
+    def add(self,i,delta):
+        self.total+=delta
+        i+=1
+        while i<=self.n:
+            self._tree[i]+=delta
+            i+=i & -i
+    
+    def prefix(self,i):
+        'Sum of the counts of slots 0..i'
+        i+=1
+        result=0
+        while i>0:
+            result+=self._tree[i]
+            i-=i & -i
+        return result
+    
+    def find(self,k):
+        'Returns (slot, position within slot) of the k-th counted item'
+        pos=0
+        bit=self._top
+        while bit:
+            nxt=pos+bit
+            if nxt<=self.n and self._tree[nxt]<=k:
+                pos=nxt
+                k-=self._tree[nxt]
+            bit>>=1
+        return pos,k
+
+def _stubs_by_year(slot,degree,n_years):
+    stubs=[[] for y in xrange(n_years)]
+    vertices=numpy.repeat(numpy.arange(len(degree)),degree)
+    order=numpy.argsort(slot[vertices],kind='mergesort')
+    vertices=vertices[order]
+    bounds=numpy.searchsorted(slot[vertices],numpy.arange(n_years+1))
+    for y in xrange(n_years):
+        stubs[y]=vertices[bounds[y]:bounds[y+1]].tolist()
+    return stubs
+
+def _swap_remove(stubs,k):
+    item=stubs[k]
+    last=stubs.pop()
+    if k<len(stubs):
+        stubs[k]=last
+    return item
+
+
+################################################################
+#helpers of the edge swapping
+
+_EMPTY_KEY=-1
+_DELETED_KEY=-2
+_KEY_MIX=numpy.uint64(0x9E3779B97F4A7C15)
+
+class _KeySet():
+    'Set of non-negative int64 keys in an open-addressing hash table (linear probing), queried and changed with whole arrays'
+    
+    def __init__(self,keys):
+        self._build(numpy.asarray(keys,dtype='int64'))
+    
+    def contains(self,keys):
+        return self._find(keys)>=0
+    
+    def add(self,keys):
+        #keys must be distinct and not in the set
+        pending=numpy.arange(len(keys))
+        slots=self._hash(keys)
+        while len(pending)>0:
+            free=numpy.flatnonzero(self._slots[slots[pending]]<0)
+            claimed,first=numpy.unique(slots[pending[free]],return_index=True)
+            self._deleted-=numpy.count_nonzero(self._slots[claimed]==_DELETED_KEY)
+            self._slots[claimed]=keys[pending[free[first]]]
+            placed=numpy.zeros(len(pending),dtype=bool)
+            placed[free[first]]=True
+            pending=pending[~placed]
+            slots[pending]=(slots[pending]+1)&self._mask
+    
+    def remove(self,keys):
+        #keys must be in the set
+        self._slots[self._find(keys)]=_DELETED_KEY
+        self._deleted+=len(keys)
+        if 4*self._deleted>len(self._slots):
+            self._build(self._slots[self._slots>=0])
+    
+    def _build(self,keys):
+        size=16
+        while size<4*len(keys):
+            size*=2
+        self._slots=numpy.zeros(size,dtype='int64')+_EMPTY_KEY
+        self._mask=size-1
+        self._shift=numpy.uint64(64-int(numpy.log2(size)))
+        self._deleted=0
+        self.add(keys)
+    
+    def _hash(self,keys):
+        return ((keys.astype('uint64')*_KEY_MIX)>>self._shift).astype('int64')
+    
+    def _find(self,keys):
+        #slot of every key, -1 for keys not in the set; deleted slots do not end the probe sequence
+        result=numpy.zeros(len(keys),dtype='int64')-1
+        pending=numpy.arange(len(keys))
+        slots=self._hash(keys)
+        while len(pending)>0:
+            current=self._slots[slots[pending]]
+            found=current==keys[pending]
+            result[pending[found]]=slots[pending[found]]
+            pending=pending[~found&(current!=_EMPTY_KEY)]
+            slots[pending]=(slots[pending]+1)&self._mask
+        return result
+
+def _first_occurrences(values):
+    #True at the first occurrence of every value
+    first=numpy.zeros(len(values),dtype=bool)
+    first[numpy.unique(values,return_index=True)[1]]=True
+    return first
+
             
 #################################################
 #define Error Classes
@@ -406,3 +665,9 @@ class CitationExistsAlreadyError(Exception):
     
 class NoSuchPaperError(Exception):
     pass
+
+
+result_cache.cache_methods(PaperCitationNet,['degree_property_map'])
+instrumentation.instrument_methods(PaperCitationNet)
+instrumentation.instrument_methods(MolloyReedCitationInstance,['__init__'])
+instrumentation.instrument_methods(EdgeSwapCitationInstance,['__init__'])
@@ -0,0 +1,151 @@
+#This module implements ensembles of randomized (null model) citation networks and multiplexes
+
+import multiprocessing
+import copy
+import numpy
+import array_utils
+import citation_net
+
+class RunningStatistics():
+    'Running mean and variance of an array-valued statistic (Welford), updated one ensemble instance at a time'
+
+    def __init__(self,observed=None):
+        self.n=0
+        self.mean=None
+        self._m2=None
+        self.observed=observed
+
+    def add(self,value):
+        '''Add the statistic of one more instance.'''
+        value=numpy.asarray(value,dtype='float64')
+        if self.n==0:
+            self.mean=numpy.zeros(value.shape)
+            self._m2=numpy.zeros(value.shape)
+        elif value.shape!=self.mean.shape:
+            raise ValueError('statistic has shape '+str(value.shape)+', expected '+str(self.mean.shape))
+        self.n+=1
+        delta=value-self.mean
+        self.mean+=delta/self.n
+        self._m2+=delta*(value-self.mean)
+
+    def variance(self):
+        '''Returns the (unbiased) sample variance over the instances added so far.'''
+        if self.n<2:
+            return numpy.zeros(self.mean.shape)*numpy.nan
+        return self._m2/(self.n-1)
+
+    def std(self):
+        '''Returns the sample standard deviation over the instances added so far.'''
+        return numpy.sqrt(self.variance())
+
+    def z_scores(self,observed=None):
+        '''Returns (observed-mean)/std; observed defaults to the statistic of the original network.'''
+        if observed is None:
+            observed=self.observed
+        with numpy.errstate(divide='ignore',invalid='ignore'):
+            return (numpy.asarray(observed,dtype='float64')-self.mean)/self.std()
+
+
+################################################################
+    ##
+#Function to stream the statistics of a null model ensemble
+def iter_null_model_ensemble(network,statistic,n_instances,processes=None,seed=0,null_model=citation_net.MolloyReedCitationInstance):
+    '''Creates n_instances randomized versions of network (a PaperCitationNet or a PaperAuthorMultiplex, whose citation layer gets randomized, or a SharedMultiplex that workers attach to) in a pool of processes and evaluates statistic on each. Yields the RunningStatistics after every instance.'''
+    stats=RunningStatistics(observed=numpy.asarray(statistic(_attached(network))))
+
+    #one seed per instance, so the ensemble does not depend on how instances are distributed over workers
+    seeds=numpy.random.RandomState(seed).randint(0,2**31-1,size=n_instances).tolist()
+
+    if processes==1:
+        _init_worker(network,statistic,null_model)
+        for s in seeds:
+            stats.add(_run_instance(s))
+            yield stats
+        return
+
+    #workers get the network once, when they are started; only seeds and statistics are sent afterwards
+    pool=multiprocessing.Pool(processes,_init_worker,(network,statistic,null_model))
+    try:
+        for value in pool.imap(_run_instance,seeds):
+            stats.add(value)
+            yield stats
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+################################################################
+    ##
+#Function to calculate the statistics of a null model ensemble
+def null_model_ensemble(network,statistic,n_instances,processes=None,seed=0,null_model=citation_net.MolloyReedCitationInstance):
+    '''Returns the RunningStatistics (mean, variance, z-scores) of statistic over n_instances randomized versions of network.'''
+    stats=None
+    for stats in iter_null_model_ensemble(network,statistic,n_instances,processes,seed,null_model):
+        pass
+    return stats
+
+
+################################################################
+    ##
+#Function to randomize the citations of a network
+def randomize(network,seed=None,null_model=citation_net.MolloyReedCitationInstance):
+    '''Returns a randomized copy of network. For a multiplex, only the citation layer is replaced, the collaboration layer and multiplex links are shared.'''
+    if hasattr(network,'citation'):
+        citation_layer=citation_net.PaperCitationNet()
+        citation_layer.graph=network.citation
+        citation_layer._citation_graphml_vertex_id_to_gt_id=network._citation_graphml_vertex_id_to_gt_id
+        randomized=copy.copy(network)
+        randomized.citation=null_model(citation_layer,seed=seed).graph
+        randomized._incremental_counts=None #counts kept for the original citations do not apply
+        randomized._temporal=None #so is the temporal index
+        randomized._result_cache=None #and so are cached results
+        randomized._snapshot_version=None #and the citation arrays of a loaded snapshot
+        return randomized
+    return null_model(network,seed=seed)
+
+
+################################################################
+#statistics that can be used with null_model_ensemble
+
+def socially_biased_citation_totals(multiplex):
+    '''Returns the total numbers of [citations, self citations, socially biased citations] of a multiplex.'''
+    totals=numpy.zeros(3,dtype='int64')
+    for counts in multiplex.socially_biased_citations().itervalues():
+        totals+=counts
+    return totals
+
+def citation_lag_distribution(network):
+    '''Returns the number of citations by difference of publication years (citing minus cited paper); citations backwards in time are ignored. Without papers, the array is empty; without citations, it is all zeros.'''
+    graph=_citation_graph(network)
+    years=graph.vertex_properties['year'].a.astype('int64')
+    if len(years)==0:
+        return numpy.zeros(0,dtype='int64')
+    s,t,idx=array_utils.edge_arrays(graph)
+    lags=years[t]-years[s]
+    return numpy.bincount(lags[lags>=0],minlength=int(years.max()-years.min())+1)
+
+#################################################
+#helper functions
+
+def _citation_graph(network):
+    if hasattr(network,'citation'):
+        return network.citation
+    return network.graph
+
+def _attached(network):
+    #a SharedMultiplex is attached in every process instead of being copied to it
+    if hasattr(network,'attach'):
+        return network.attach()
+    return network
+
+_worker_state={}
+
+def _init_worker(network,statistic,null_model):
+    _worker_state['network']=_attached(network)
+    _worker_state['statistic']=statistic
+    _worker_state['null_model']=null_model
+
+def _run_instance(seed):
+    randomized=randomize(_worker_state['network'],seed,_worker_state['null_model'])
+    return numpy.asarray(_worker_state['statistic'](randomized))
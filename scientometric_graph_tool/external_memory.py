@@ -0,0 +1,281 @@
+#This module implements out-of-core ingestion of citation edge lists that are too large to be parsed in memory.
+#The file is streamed in chunks, paper ids are mapped to integers through hash partitions spilled to disk, and the
+#citations are deduplicated and ordered by an external merge sort of integer keys. Apart from the graph and the id
+#index that are built, peak memory is bounded by a configurable budget; citations already in the graph are sorted
+#into runs on disk as well, and the new citations are checked against them while merging.
+
+import os
+import shutil
+import tempfile
+import numpy
+import array_utils
+import id_index
+import instrumentation
+
+DEFAULT_MEMORY_BUDGET = 2**30 #bytes
+
+################################################################
+    ##
+#Function to read a citation edge list out of core
+def read_edgelist(citation_net,citation_file,delimiter=' ',cited_column=0,citing_column=1,header=True,memory_budget=DEFAULT_MEMORY_BUDGET,tmp_dir=None):
+    '''Reads a citation edge list into citation_net (a PaperCitationNet) with peak memory of about memory_budget bytes besides the graph and id index, spilling to a temporary directory in tmp_dir (default: the system temp directory). Papers are numbered in order of first appearance and get year 0 if new, as with read_edgelist; duplicate and existing citations are skipped and the new citations are added ordered by (cited, citing).'''
+    plan = _Plan(memory_budget,os.path.getsize(citation_file))
+    work = tempfile.mkdtemp(prefix='sgt_edgelist_',dir=tmp_dir)
+    try:
+        index = citation_net._citation_graphml_vertex_id_to_gt_id
+        with instrumentation.timer('read_edgelist.partition'):
+            n_lines = _partition_ids(index,citation_file,delimiter,cited_column,citing_column,header,plan,work)
+        instrumentation.count('read_edgelist.lines',n_lines)
+        if n_lines==0:
+            return
+
+        with instrumentation.timer('read_edgelist.number'):
+            index,n_new = _number_ids(index,plan,work,2*n_lines)
+        citation_net._citation_graphml_vertex_id_to_gt_id = index
+        graph = citation_net.graph
+        if n_new>0:
+            n_existing = graph.num_vertices()
+            graph.add_vertex(n_new)
+            graph.vertex_properties['year'].a[n_existing:] = 0
+
+        with instrumentation.timer('read_edgelist.sort'):
+            runs = _sorted_runs(len(index),plan,work,n_lines)
+            existing_runs = _existing_runs(graph,len(index),plan,work)
+        if existing_runs:
+            #the new and the existing citations are merged at the same time, each with half of the merge budget
+            plan.fan_in = max(plan.fan_in//2,2)
+        with instrumentation.timer('read_edgelist.merge'):
+            new_keys = _new_keys(_merge(runs,plan,work,'merged'),_merge(existing_runs,plan,work,'existing_merged'))
+            n_edges = _add_citations(graph,len(index),new_keys)
+        instrumentation.count('read_edgelist.duplicates',n_lines-n_edges)
+    finally:
+        shutil.rmtree(work)
+
+
+#################################################
+#helper functions
+
+class _Plan(object):
+    'Chunk, partition and run sizes derived from the memory budget'
+
+    def __init__(self,memory_budget,file_size):
+        #parsing and hashing the ids of a chunk of lines take about 48 bytes per byte of text
+        self.chunk_bytes = max(memory_budget//48,2**16)
+        self.n_partitions = int(48*file_size//memory_budget)+1
+        #sorting a run of citation keys takes about 48 bytes per citation
+        self.run_length = max(memory_budget//48,2**16)
+        #a merge holds a block of keys of every run it merges, about 32 bytes per key with the merged block
+        self.block = 2**16
+        self.fan_in = max(memory_budget//(32*self.block),2)
+
+def _path(work,name):
+    return os.path.join(work,name)
+
+def _append(work,name,array):
+    with open(_path(work,name),'ab') as f:
+        array.tofile(f)
+
+def _load(work,name,dtype):
+    if not os.path.exists(_path(work,name)):
+        return numpy.zeros(0,dtype=dtype)
+    return numpy.fromfile(_path(work,name),dtype=dtype)
+
+def _segment_positions(starts,lengths):
+    #positions of the bytes of the segments [starts[k], starts[k]+lengths[k]), concatenated
+    return numpy.arange(lengths.sum())-numpy.repeat(numpy.cumsum(lengths)-lengths-starts,lengths)
+
+def _partition_ids(index,citation_file,delimiter,cited_column,citing_column,header,plan,work):
+    #occurrence 2*line is the cited, 2*line+1 the citing paper of a line; occurrences of known ids get their vertex
+    #index right away, those of unknown ids are spilled to the partition of their hash with their position
+    cou = 0
+    with open(citation_file,'r') as f:
+        if header==True:
+            header_text=f.readline()
+        while True:
+            lines = f.readlines(plan.chunk_bytes)
+            if not lines:
+                break
+            rows = [line.split(delimiter) for line in lines]
+            ids = [None]*(2*len(rows))
+            ids[0::2] = [tmp[cited_column].rstrip() for tmp in rows]
+            ids[1::2] = [tmp[citing_column].rstrip() for tmp in rows]
+            del rows,lines
+            data,offsets = id_index.pack(ids)
+            del ids
+            positions = 2*cou+numpy.arange(len(offsets)-1)
+            cou += (len(offsets)-1)//2
+            if len(index)>0:
+                known = index.lookup_packed(data,offsets)
+            else:
+                known = numpy.zeros(len(positions),dtype='int64')-1
+
+            #partition by the high bits of the hash, the low bits select the slot in the hash table of a partition;
+            #the positions stay in file order within a partition
+            partition = ((id_index.hash_packed(data,offsets)>>numpy.uint64(32))%numpy.uint64(plan.n_partitions)).astype('int64')
+            order = numpy.argsort(partition,kind='mergesort')
+            bounds = numpy.searchsorted(partition[order],numpy.arange(plan.n_partitions+1))
+            for p in xrange(plan.n_partitions):
+                selected = order[bounds[p]:bounds[p+1]]
+                is_known = known[selected]>=0
+                if is_known.any():
+                    _append(work,'known_positions_%d'%p,positions[selected[is_known]])
+                    _append(work,'known_codes_%d'%p,known[selected[is_known]])
+                selected = selected[~is_known]
+                if len(selected)==0:
+                    continue
+                lengths = offsets[selected+1]-offsets[selected]
+                _append(work,'ids_%d'%p,data[_segment_positions(offsets[selected],lengths)])
+                _append(work,'lengths_%d'%p,lengths.astype('int32'))
+                _append(work,'positions_%d'%p,positions[selected])
+            instrumentation.progress('read_edgelist',cou)
+    return cou
+
+def _number_ids(index,plan,work,n_occurrences):
+    #number the new ids of every partition in order of first appearance within the partition, then merge these
+    #numberings by position of first appearance; the vertex index of every occurrence goes to the column 'codes'
+    codes = numpy.memmap(_path(work,'codes'),dtype='int64',mode='w+',shape=(n_occurrences,))
+
+    first_positions = []
+    for p in xrange(plan.n_partitions):
+        codes[_load(work,'known_positions_%d'%p,'int64')] = _load(work,'known_codes_%d'%p,'int64')
+        lengths = _load(work,'lengths_%d'%p,'int32')
+        if len(lengths)==0:
+            first_positions.append(numpy.zeros(0,dtype='int64'))
+            continue
+        offsets = numpy.zeros(len(lengths)+1,dtype='int64')
+        numpy.cumsum(lengths,out=offsets[1:])
+        partition_index = id_index.IdIndex()
+        local_codes = partition_index.add_packed(_load(work,'ids_%d'%p,'uint8'),offsets)
+        del lengths,offsets
+        first = numpy.unique(local_codes,return_index=True)[1]
+        first_positions.append(_load(work,'positions_%d'%p,'int64')[first])
+        _append(work,'local_codes_%d'%p,local_codes)
+        pool,pool_offsets,table = partition_index.arrays()
+        _append(work,'distinct_ids_%d'%p,pool)
+        _append(work,'distinct_lengths_%d'%p,numpy.diff(pool_offsets))
+        del partition_index,local_codes,first
+
+    n_existing = len(index)
+    counts = [len(positions) for positions in first_positions]
+    n_new = sum(counts)
+    new_codes = numpy.zeros(n_new,dtype='int64')
+    new_codes[numpy.argsort(numpy.concatenate(first_positions),kind='mergesort')] = numpy.arange(n_new)
+    del first_positions
+    bounds = numpy.concatenate(([0],numpy.cumsum(counts)))
+
+    #lengths of the new ids in vertex order, then their bytes
+    new_offsets = numpy.zeros(n_new+1,dtype='int64')
+    for p in xrange(plan.n_partitions):
+        new_offsets[1+new_codes[bounds[p]:bounds[p+1]]] = _load(work,'distinct_lengths_%d'%p,'int64')
+    numpy.cumsum(new_offsets,out=new_offsets)
+    pool = numpy.zeros(new_offsets[-1],dtype='uint8')
+    for p in xrange(plan.n_partitions):
+        partition_codes = new_codes[bounds[p]:bounds[p+1]]
+        lengths = new_offsets[partition_codes+1]-new_offsets[partition_codes]
+        pool[_segment_positions(new_offsets[partition_codes],lengths)] = _load(work,'distinct_ids_%d'%p,'uint8')
+        codes[_load(work,'positions_%d'%p,'int64')] = n_existing+partition_codes[_load(work,'local_codes_%d'%p,'int64')]
+    codes.flush()
+    del codes
+
+    if n_new==0:
+        return index,0
+    old_pool,old_offsets,table = index.arrays()
+    pool = numpy.concatenate((old_pool,pool))
+    offsets = numpy.concatenate((old_offsets,old_offsets[-1]+new_offsets[1:]))
+    del new_offsets
+    #rehash in chunks of ids of about chunk_bytes bytes
+    chunk_size = max(int(plan.chunk_bytes*(len(offsets)-1)//max(len(pool),1)),1024)
+    index = id_index.IdIndex.from_arrays(pool,offsets,chunk_size=chunk_size)
+    return index,n_new
+
+def _sorted_runs(n_vertices,plan,work,n_lines):
+    #the citation (cited, citing) has the key cited*n_vertices+citing; every run is sorted and free of duplicates
+    codes = numpy.memmap(_path(work,'codes'),dtype='int64',mode='r',shape=(2*n_lines,))
+    runs = []
+    for lo in xrange(0,n_lines,plan.run_length):
+        hi = min(lo+plan.run_length,n_lines)
+        pairs = numpy.array(codes[2*lo:2*hi])
+        keys = numpy.unique(pairs[0::2]*n_vertices+pairs[1::2])
+        del pairs
+        runs.append('run_%d'%len(runs))
+        _append(work,runs[-1],keys)
+    del codes
+    return runs
+
+def _existing_runs(graph,n_vertices,plan,work):
+    #the citations already in the graph, as sorted runs of keys like the new ones
+    if graph.num_edges()==0:
+        return []
+    s,t,idx = array_utils.edge_arrays(graph)
+    del idx
+    runs = []
+    for lo in xrange(0,len(s),plan.run_length):
+        runs.append('existing_run_%d'%len(runs))
+        _append(work,runs[-1],numpy.sort(s[lo:lo+plan.run_length]*n_vertices+t[lo:lo+plan.run_length]))
+    return runs
+
+def _merge(runs,plan,work,name):
+    #merges runs in passes of at most fan_in runs, yields the sorted distinct keys in blocks
+    generation = 0
+    while len(runs)>plan.fan_in:
+        merged = []
+        for lo in xrange(0,len(runs),plan.fan_in):
+            merged.append('%s_%d_%d'%(name,generation,len(merged)))
+            for keys in _merge_blocks(runs[lo:lo+plan.fan_in],plan.block,work):
+                _append(work,merged[-1],keys)
+            for run in runs[lo:lo+plan.fan_in]:
+                os.remove(_path(work,run))
+        runs = merged
+        generation += 1
+    return _merge_blocks(runs,plan.block,work)
+
+def _merge_blocks(runs,block,work):
+    runs = [numpy.memmap(_path(work,name),dtype='int64',mode='r') for name in runs]
+    read = [0]*len(runs)
+    buffers = [numpy.zeros(0,dtype='int64') for run in runs]
+    while True:
+        for i,run in enumerate(runs):
+            if len(buffers[i])==0 and read[i]<len(run):
+                buffers[i] = numpy.array(run[read[i]:read[i]+block])
+                read[i] += len(buffers[i])
+        live = [i for i in xrange(len(runs)) if len(buffers[i])>0]
+        if not live:
+            break
+        #all keys up to the smallest last buffered key of the runs with unread keys are in the buffers
+        unread = [buffers[i][-1] for i in live if read[i]<len(runs[i])]
+        parts = []
+        for i in live:
+            k = len(buffers[i]) if not unread else numpy.searchsorted(buffers[i],min(unread),'right')
+            parts.append(buffers[i][:k])
+            buffers[i] = buffers[i][k:]
+        yield numpy.unique(numpy.concatenate(parts))
+
+def _new_keys(blocks,existing_blocks):
+    #yields the keys of the sorted blocks that are not in the sorted blocks existing_blocks, walking both in step
+    existing_blocks = iter(existing_blocks)
+    existing = next(existing_blocks,None)
+    for keys in blocks:
+        new = []
+        while existing is not None and len(keys)>0:
+            #the keys up to the last existing key of the buffer are decided by the buffer
+            k = numpy.searchsorted(keys,existing[-1],'right')
+            new.append(keys[:k][~array_utils.in_sorted(keys[:k],existing)])
+            keys = keys[k:]
+            if len(keys)>0:
+                existing = next(existing_blocks,None)
+        new.append(keys)
+        yield numpy.concatenate(new)
+
+def _add_citations(graph,n_vertices,blocks):
+    #adds the citations of the sorted key blocks; the citation year is the year of the citing paper
+    years = graph.vertex_properties['year'].a
+    n_edges = 0
+    for keys in blocks:
+        if len(keys)==0:
+            continue
+        cited = keys//n_vertices
+        citing = keys%n_vertices
+        new_edges = array_utils.add_edges(graph,cited,citing)
+        graph.edge_properties['year'].a[new_edges] = years[citing]
+        n_edges += len(keys)
+    return n_edges
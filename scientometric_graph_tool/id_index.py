@@ -0,0 +1,403 @@
+#This module implements a compact index of vertex ID strings.
+#All IDs are stored in one byte pool with an offset array, the position of an ID is its vertex index.
+#IDs are found through an open-addressing hash table (linear probing) of positions, which can be searched for
+#whole arrays of IDs at once. Single IDs are hashed with the same function and probed one by one; IDs added one by
+#one go to a small dict first and are inserted into the hash table in batches.
+
+import itertools
+import operator
+import sys
+import numpy
+
+_BASE = 1099511628211 #multiplier of the polynomial string hash (the 64 bit FNV prime)
+_MIX = 0x9E3779B97F4A7C15
+_EMPTY = -1
+_MAX_PENDING = 4096 #IDs added one by one that are kept in a dict before they are inserted into the hash table
+
+class IdIndex(object):
+    'Vertex ID strings by vertex index, with hash lookup of the index of an ID'
+
+################################################################
+    def __init__(self,ids=None,chunk_size=1000000):
+        self.chunk_size = chunk_size
+        self._pool = numpy.zeros(1024,dtype='uint8')
+        self._offsets = numpy.zeros(1024,dtype='int64')
+        self._n = 0
+        self._table = numpy.zeros(16,dtype='int32')+_EMPTY
+        self._hashed = 0 #IDs from here on were added one by one and are not in the hash table yet
+        self._pending = {} #dict ID -> index of these IDs
+        if ids is not None:
+            self.add_many(ids)
+
+    @classmethod
+    def from_arrays(cls,pool,offsets,table=None,chunk_size=1000000):
+        '''Returns an index of the IDs pool[offsets[i]:offsets[i+1]]; the arrays may be memory-mapped, they are copied on the first change. Without table, the hash table is rebuilt.'''
+        index = cls(chunk_size=chunk_size)
+        index._pool = pool
+        index._offsets = offsets
+        index._n = len(offsets)-1
+        if table is None:
+            index._rehash(_table_size(index._n))
+        else:
+            index._table = table
+            index._hashed = index._n
+        return index
+
+    @classmethod
+    def from_dict(cls,id_to_index):
+        '''Returns an index of the IDs of a dict ID -> vertex index (vertex indices 0..n-1).'''
+        ids = [None]*len(id_to_index)
+        for vertex_id,i in id_to_index.iteritems():
+            ids[i] = vertex_id
+        return cls(ids)
+
+################################################################
+    ##
+    #Functions to look up single IDs, like a dict ID -> vertex index
+    def __len__(self):
+        return self._n
+
+    def __contains__(self,vertex_id):
+        return self._find(vertex_id)!=_EMPTY
+
+    def __getitem__(self,vertex_id):
+        i = self._find(vertex_id)
+        if i==_EMPTY:
+            raise KeyError(vertex_id)
+        return i
+
+    def __iter__(self):
+        return iter(self.ids())
+
+    def get(self,vertex_id,default=None):
+        i = self._find(vertex_id)
+        if i==_EMPTY:
+            return default
+        return i
+
+    def iteritems(self):
+        return itertools.izip(self.ids(),itertools.count())
+
+################################################################
+    ##
+    #Function to add a single ID
+    def add(self,vertex_id):
+        '''Returns the index of vertex_id, appending it if it is new.'''
+        i = self._find(vertex_id)
+        if i==_EMPTY:
+            i = self._pending[vertex_id] = self._append(vertex_id)
+            if len(self._pending)>=_MAX_PENDING:
+                self._hash_added()
+        return i
+
+################################################################
+    ##
+    #Functions to look up and add many IDs at once
+    def lookup(self,ids):
+        '''Returns an array with the index of every ID in ids (a list of strings or a numpy array of byte strings), -1 for unknown IDs.'''
+        result = numpy.zeros(len(ids),dtype='int64')
+        for lo in xrange(0,len(ids),self.chunk_size):
+            data,offsets = pack(ids[lo:lo+self.chunk_size])
+            result[lo:lo+len(offsets)-1] = self._lookup_packed(data,offsets,_hash_packed(data,offsets))
+        return result
+
+    def add_many(self,ids):
+        '''Returns an array with the index of every ID in the list ids; new IDs are appended in order of first appearance.'''
+        result = numpy.zeros(len(ids),dtype='int64')
+        for lo in xrange(0,len(ids),self.chunk_size):
+            data,offsets = _pack(ids[lo:lo+self.chunk_size])
+            result[lo:lo+len(offsets)-1] = self._add_packed(data,offsets)
+        return result
+
+    def lookup_packed(self,data,offsets):
+        '''Like lookup, for IDs given as a byte pool: ID k is data[offsets[k]:offsets[k+1]] (see pack).'''
+        return self._lookup_packed(data,offsets,_hash_packed(data,offsets))
+
+    def add_packed(self,data,offsets):
+        '''Like add_many, for IDs given as a byte pool (see pack).'''
+        return self._add_packed(data,offsets)
+
+################################################################
+    ##
+    #Functions to get IDs by index
+    def id_of(self,i):
+        '''Returns the ID string of vertex index i.'''
+        if i<0 or i>=self._n:
+            raise IndexError(i)
+        return self._pool[self._offsets[i]:self._offsets[i+1]].tostring()
+
+    def ids(self,indices=None):
+        '''Returns the list of ID strings of the vertex indices (default: all, in index order).'''
+        data,offsets = self.ids_packed(indices)
+        data = data.tostring()
+        offsets = offsets.tolist()
+        return [data[a:b] for a,b in itertools.izip(offsets[:-1],offsets[1:])]
+
+    def ids_packed(self,indices=None):
+        '''Returns (data, offsets) with the IDs of the vertex index array indices (default: all, in index order) packed into one byte pool, ID k being data[offsets[k]:offsets[k+1]].'''
+        if indices is None:
+            return self._pool[:self._offsets[self._n]],self._offsets[:self._n+1]
+        indices = numpy.asarray(indices,dtype='int64')
+        if len(indices)>0 and (indices.min()<0 or indices.max()>=self._n):
+            raise IndexError('vertex index out of range')
+        lengths = self._offsets[indices+1]-self._offsets[indices]
+        offsets = numpy.zeros(len(indices)+1,dtype='int64')
+        numpy.cumsum(lengths,out=offsets[1:])
+        return self._pool[_segment_positions(self._offsets,indices)],offsets
+
+    def write_ids(self,f,indices=None,separator='\n'):
+        '''Writes the IDs of the vertex index array indices (default: all, in index order) to the file name or file object f, each followed by separator.'''
+        if not hasattr(f,'write'):
+            with open(f,'wb') as output:
+                return self.write_ids(output,indices,separator)
+        separator = numpy.frombuffer(separator,dtype='uint8')
+        n = self._n if indices is None else len(indices)
+        for lo in xrange(0,n,self.chunk_size):
+            hi = min(lo+self.chunk_size,n)
+            data,offsets = self.ids_packed(numpy.arange(lo,hi) if indices is None else indices[lo:hi])
+            #every ID moves by the separators before it
+            shift = numpy.arange(hi-lo)*len(separator)
+            output = numpy.zeros(len(data)+(hi-lo)*len(separator),dtype='uint8')
+            output[numpy.arange(len(data))+numpy.repeat(shift,numpy.diff(offsets))] = data
+            for k in xrange(len(separator)):
+                output[offsets[1:]+shift+k] = separator[k]
+            f.write(output.tostring())
+
+    def nbytes(self):
+        '''Returns the number of bytes of the pool, offsets and hash table, including spare capacity, and of the IDs added one by one that are not in the hash table yet.'''
+        return self._pool.nbytes+self._offsets.nbytes+self._table.nbytes+sys.getsizeof(self._pending)+sum(itertools.imap(sys.getsizeof,self._pending))
+
+    def arrays(self):
+        '''Returns (pool, offsets, table) without spare capacity, e.g. to store the index.'''
+        self._hash_added()
+        return self._pool[:self._offsets[self._n]],self._offsets[:self._n+1],self._table
+
+    def __getstate__(self):
+        pool,offsets,table = self.arrays()
+        return {'chunk_size':self.chunk_size,'pool':numpy.array(pool),'offsets':numpy.array(offsets),'table':numpy.array(table)}
+
+    def __setstate__(self,state):
+        self.chunk_size = state['chunk_size']
+        self._pool = state['pool']
+        self._offsets = state['offsets']
+        self._n = len(self._offsets)-1
+        self._table = state['table']
+        self._hashed = self._n
+        self._pending = {}
+
+################################################################
+    def _find(self,vertex_id):
+        #index of a single ID, -1 if it is unknown: probe the hash table like _lookup_packed, for one hash
+        i = self._pending.get(vertex_id)
+        if i is not None:
+            return i
+        mask = len(self._table)-1
+        slot = _hash_one(vertex_id)&mask
+        while True:
+            i = int(self._table[slot])
+            if i==_EMPTY or self._pool[self._offsets[i]:self._offsets[i+1]].tostring()==vertex_id:
+                return i
+            slot = (slot+1)&mask
+
+    def _hash_added(self):
+        #insert the IDs added one by one since the last batch operation into the hash table, all at once
+        if self._hashed==self._n:
+            return
+        if 2*self._n>len(self._table):
+            self._rehash(_table_size(self._n))
+            return
+        offsets = self._offsets[self._hashed:self._n+1]
+        data = self._pool[offsets[0]:offsets[-1]]
+        self._insert(numpy.arange(self._hashed,self._n),_hash_packed(data,offsets-offsets[0]))
+        self._hashed = self._n
+        self._pending = {}
+
+    def _append(self,vertex_id):
+        start = int(self._offsets[self._n])
+        if self._n+2>len(self._offsets) or not self._offsets.flags.writeable:
+            self._offsets = _grow(self._offsets,self._n+2)
+        if start+len(vertex_id)>len(self._pool) or not self._pool.flags.writeable:
+            self._pool = _grow(self._pool,start+len(vertex_id))
+        self._pool[start:start+len(vertex_id)] = numpy.frombuffer(vertex_id,dtype='uint8')
+        self._offsets[self._n+1] = start+len(vertex_id)
+        self._n += 1
+        return self._n-1
+
+    def _lookup_packed(self,data,offsets,hashes):
+        self._hash_added()
+        result = numpy.zeros(len(hashes),dtype='int64')+_EMPTY
+        mask = len(self._table)-1
+        slots = (hashes&numpy.uint64(mask)).astype('int64')
+        pending = numpy.arange(len(hashes))
+        while len(pending)>0:
+            candidates = self._table[slots[pending]].astype('int64')
+            occupied = candidates!=_EMPTY
+            pending = pending[occupied]
+            candidates = candidates[occupied]
+            found = _equal(data,offsets,pending,self._pool,self._offsets,candidates)
+            result[pending[found]] = candidates[found]
+            pending = pending[~found]
+            slots[pending] = (slots[pending]+1)&mask
+        return result
+
+    def _add_packed(self,data,offsets):
+        hashes = _hash_packed(data,offsets)
+        result = self._lookup_packed(data,offsets,hashes)
+        missing = numpy.flatnonzero(result==_EMPTY)
+        if len(missing)==0:
+            return result
+
+        #one representative per distinct new ID: the first with the same hash, unless the strings differ (hash collision)
+        order = missing[numpy.lexsort((missing,hashes[missing]))]
+        leader = numpy.concatenate(([True],hashes[order[1:]]!=hashes[order[:-1]]))
+        leader_of = order[numpy.flatnonzero(leader)[numpy.cumsum(leader)-1]]
+        same = _equal(data,offsets,order,data,offsets,leader_of)
+        representative = numpy.zeros(len(hashes),dtype='int64')
+        representative[order] = leader_of
+        if not same.all():
+            first = {}
+            for k in order[~same].tolist():
+                representative[k] = first.setdefault(data[offsets[k]:offsets[k+1]].tostring(),k)
+        new = numpy.unique(representative[missing])
+
+        #append the new IDs in order of first appearance and insert them into the hash table
+        if 2*(self._n+len(new))>len(self._table):
+            self._rehash(_table_size(self._n+len(new)))
+        new_index = numpy.zeros(len(hashes),dtype='int64')
+        new_index[new] = self._n+numpy.arange(len(new))
+        lengths = offsets[new+1]-offsets[new]
+        positions = _segment_positions(offsets,new)
+        start = int(self._offsets[self._n])
+        if self._n+len(new)+1>len(self._offsets) or not self._offsets.flags.writeable:
+            self._offsets = _grow(self._offsets,self._n+len(new)+1)
+        if start+len(positions)>len(self._pool) or not self._pool.flags.writeable:
+            self._pool = _grow(self._pool,start+len(positions))
+        self._pool[start:start+len(positions)] = data[positions]
+        self._offsets[self._n+1:self._n+len(new)+1] = start+numpy.cumsum(lengths)
+        self._n += len(new)
+        self._insert(new_index[new],hashes[new])
+        self._hashed = self._n
+
+        result[missing] = new_index[representative[missing]]
+        return result
+
+    def _insert(self,indices,hashes):
+        self._writable_table()
+        mask = len(self._table)-1
+        slots = (hashes&numpy.uint64(mask)).astype('int64')
+        pending = numpy.arange(len(indices))
+        while len(pending)>0:
+            free = numpy.flatnonzero(self._table[slots[pending]]==_EMPTY)
+            claimed,first = numpy.unique(slots[pending[free]],return_index=True)
+            self._table[claimed] = indices[pending[free[first]]]
+            placed = numpy.zeros(len(pending),dtype=bool)
+            placed[free[first]] = True
+            pending = pending[~placed]
+            slots[pending] = (slots[pending]+1)&mask
+
+    def _rehash(self,size):
+        self._table = numpy.zeros(size,dtype='int32' if size<2**31 else 'int64')+_EMPTY
+        for lo in xrange(0,self._n,self.chunk_size):
+            hi = min(lo+self.chunk_size,self._n)
+            offsets = self._offsets[lo:hi+1]
+            data = self._pool[offsets[0]:offsets[-1]]
+            self._insert(numpy.arange(lo,hi),_hash_packed(data,offsets-offsets[0]))
+        self._hashed = self._n
+        self._pending = {}
+
+    def _writable_table(self):
+        if not self._table.flags.writeable:
+            self._table = numpy.array(self._table)
+
+
+################################################################
+    ##
+#Functions to work with IDs packed into a byte pool
+def pack(ids):
+    '''Returns (data, offsets): the bytes of ids (a list of strings or a numpy array of byte strings) in one uint8 array, ID k being data[offsets[k]:offsets[k+1]].'''
+    if isinstance(ids,numpy.ndarray):
+        return _pack_array(ids)
+    return _pack(ids)
+
+def hash_packed(data,offsets):
+    '''Returns the uint64 hashes of packed IDs, as used by the hash table of IdIndex.'''
+    return _hash_packed(data,offsets)
+
+
+#################################################
+#helper functions
+
+_powers = numpy.ones(1,dtype='uint64')
+_power_list = [pow(_BASE,k,2**64) for k in xrange(64)] #the same powers as python ints, for single IDs
+
+def _extend_powers(n):
+    global _powers
+    if n>len(_powers):
+        _powers = numpy.array([pow(_BASE,k,2**64) for k in xrange(max(n,2*len(_powers)))],dtype='uint64')
+
+def _hash_packed(data,offsets):
+    #polynomial hash of the bytes modulo 2**64, followed by a bit mixer
+    lengths = numpy.diff(offsets)
+    hashes = numpy.zeros(len(lengths),dtype='uint64')
+    if len(data)>0:
+        _extend_powers(int(lengths.max()))
+        weighted = data.astype('uint64')*_powers[numpy.arange(len(data))-numpy.repeat(offsets[:-1],lengths)]
+        nonempty = lengths>0
+        hashes[nonempty] = numpy.add.reduceat(weighted,offsets[:-1][nonempty])
+    hashes ^= hashes>>numpy.uint64(31)
+    hashes *= numpy.uint64(_MIX)
+    hashes ^= hashes>>numpy.uint64(29)
+    return hashes
+
+def _hash_one(vertex_id):
+    #_hash_packed of a single string, as a python int
+    if len(vertex_id)>len(_power_list):
+        _power_list.extend(pow(_BASE,k,2**64) for k in xrange(len(_power_list),max(len(vertex_id),2*len(_power_list))))
+    h = sum(itertools.imap(operator.mul,bytearray(vertex_id),_power_list))&0xFFFFFFFFFFFFFFFF
+    h ^= h>>31
+    h = (h*_MIX)&0xFFFFFFFFFFFFFFFF
+    h ^= h>>29
+    return h
+
+def _pack(ids):
+    #byte pool and offsets of a list of strings
+    lengths = numpy.fromiter(itertools.imap(len,ids),dtype='int64',count=len(ids))
+    offsets = numpy.zeros(len(ids)+1,dtype='int64')
+    numpy.cumsum(lengths,out=offsets[1:])
+    return numpy.frombuffer(''.join(ids),dtype='uint8'),offsets
+
+def _pack_array(ids):
+    #fixed width byte strings, without the trailing NUL padding
+    ids = numpy.ascontiguousarray(ids,dtype='S')
+    width = ids.dtype.itemsize
+    data = ids.view('uint8').reshape(len(ids),width)
+    nonzero = data!=0
+    lengths = numpy.where(nonzero.any(axis=1),width-numpy.argmax(nonzero[:,::-1],axis=1),0)
+    offsets = numpy.zeros(len(ids)+1,dtype='int64')
+    numpy.cumsum(lengths,out=offsets[1:])
+    return data[numpy.arange(width)<lengths[:,None]],offsets
+
+def _segment_positions(offsets,segments):
+    lengths = offsets[segments+1]-offsets[segments]
+    return numpy.arange(lengths.sum())-numpy.repeat(numpy.cumsum(lengths)-lengths,lengths)+numpy.repeat(offsets[segments],lengths)
+
+def _equal(data_a,offsets_a,a,data_b,offsets_b,b):
+    #True where string a[k] of the first pool equals string b[k] of the second pool
+    same_length = (offsets_a[a+1]-offsets_a[a])==(offsets_b[b+1]-offsets_b[b])
+    candidates = numpy.flatnonzero(same_length)
+    lengths = offsets_a[a[candidates]+1]-offsets_a[a[candidates]]
+    differ = data_a[_segment_positions(offsets_a,a[candidates])]!=data_b[_segment_positions(offsets_b,b[candidates])]
+    owner = numpy.repeat(numpy.arange(len(candidates)),lengths)
+    same_length[candidates] = numpy.bincount(owner,weights=differ,minlength=len(candidates))==0
+    return same_length
+
+def _table_size(n):
+    size = 16
+    while size<2*n:
+        size *= 2
+    return size
+
+def _grow(array,n):
+    new = numpy.zeros(max(n,2*len(array)),dtype=array.dtype)
+    new[:len(array)] = array
+    return new
@@ -0,0 +1,311 @@
+#This module implements the paper-author incidence of a multiplex as compact integer arrays
+
+import numpy
+import array_utils
+
+class MultiplexIncidence(object):
+    'Paper-author incidence, stored as one CSR structure per direction plus an append buffer'
+
+################################################################
+    def __init__(self,index_dtype='int64',buffer_size=1000000):
+        self.index_dtype = numpy.dtype(index_dtype)
+        self.buffer_size = buffer_size
+        
+        #CSR structures paper->authors and author->papers, rows sorted by neighbour index
+        self._paper_offsets = numpy.zeros(1,dtype='int64')
+        self._paper_authors = numpy.zeros(0,dtype=self.index_dtype)
+        self._author_offsets = numpy.zeros(1,dtype='int64')
+        self._author_papers = numpy.zeros(0,dtype=self.index_dtype)
+        
+        #links added since the last flush, keyed by paper and by author
+        self._pending_by_paper = {}
+        self._pending_by_author = {}
+        self._n_pending = 0
+        
+        #degrees including pending links; capacity grows geometrically
+        self._paper_degree = numpy.zeros(0,dtype='int64')
+        self._author_degree = numpy.zeros(0,dtype='int64')
+        self.n_papers = 0
+        self.n_authors = 0
+        self.n_links = 0
+
+################################################################
+    ##
+    #Function to create an incidence from existing CSR arrays
+    @classmethod
+    def from_csr(cls,paper_offsets,paper_authors,author_offsets,author_papers,buffer_size=1000000):
+        '''Returns an incidence that uses the given CSR arrays (e.g. memory-mapped, read-only) without copying them.'''
+        incidence = cls(paper_authors.dtype,buffer_size)
+        incidence._paper_offsets = paper_offsets
+        incidence._paper_authors = paper_authors
+        incidence._author_offsets = author_offsets
+        incidence._author_papers = author_papers
+        incidence._paper_degree = numpy.diff(paper_offsets)
+        incidence._author_degree = numpy.diff(author_offsets)
+        incidence.n_papers = len(paper_offsets)-1
+        incidence.n_authors = len(author_offsets)-1
+        incidence.n_links = len(paper_authors)
+        return incidence
+
+################################################################
+    ##
+    #Function to make room for new vertices
+    def resize(self,n_papers,n_authors):
+        '''Make sure paper indices < n_papers and author indices < n_authors can be stored.'''
+        if n_papers>len(self._paper_degree):
+            self._paper_degree = _grow(self._paper_degree,n_papers)
+        if n_authors>len(self._author_degree):
+            self._author_degree = _grow(self._author_degree,n_authors)
+        self.n_papers = max(self.n_papers,n_papers)
+        self.n_authors = max(self.n_authors,n_authors)
+
+################################################################
+    ##
+    #Function to add one paper-author link
+    def add(self,paper,author):
+        '''Add a link between paper and author (vertex indices). Returns False if the link existed already.'''
+        paper = int(paper)
+        author = int(author)
+        if self.has_link(paper,author):
+            return False
+        self.resize(paper+1,author+1)
+        self._pending_by_paper.setdefault(paper,[]).append(author)
+        self._pending_by_author.setdefault(author,[]).append(paper)
+        self._n_pending += 1
+        self._paper_degree[paper] += 1
+        self._author_degree[author] += 1
+        self.n_links += 1
+        if self._n_pending>=self.buffer_size:
+            self.flush()
+        return True
+
+################################################################
+    ##
+    #Function to add many paper-author links at once
+    def add_many(self,papers,authors):
+        '''Add links between the papers and authors in the two aligned index arrays; duplicates are ignored. Only the new links are sorted, they are merged into the sorted rows of the CSR structures together with the pending links.'''
+        papers = numpy.asarray(papers,dtype='int64')
+        authors = numpy.asarray(authors,dtype='int64')
+        if len(papers)==0:
+            return
+        self.resize(int(papers.max())+1,int(authors.max())+1)
+
+        #distinct links that are neither stored nor pending
+        n = max(self.n_authors,1)
+        keys = numpy.unique(papers*n+authors)
+        papers = keys//n
+        authors = keys%n
+        new = ~_in_rows(self._paper_offsets,self._paper_authors,papers,authors)
+        pending_papers,pending_authors = self._pending_pairs()
+        if len(pending_papers)>0:
+            new &= ~array_utils.in_sorted(keys,numpy.sort(pending_papers*n+pending_authors))
+        papers = papers[new]
+        authors = authors[new]
+
+        self._paper_degree += numpy.bincount(papers,minlength=len(self._paper_degree))
+        self._author_degree += numpy.bincount(authors,minlength=len(self._author_degree))
+        self.n_links += len(papers)
+        self._merge(numpy.concatenate((pending_papers,papers)),numpy.concatenate((pending_authors,authors)))
+
+################################################################
+    ##
+    #Function to check for a link
+    def has_link(self,paper,author):
+        '''Returns True if paper and author are linked.'''
+        if author in self._pending_by_paper.get(paper,()):
+            return True
+        if paper+1>=len(self._paper_offsets):
+            return False
+        row = self._paper_authors[self._paper_offsets[paper]:self._paper_offsets[paper+1]]
+        i = numpy.searchsorted(row,author)
+        return i<len(row) and row[i]==author
+
+################################################################
+    ##
+    #Functions to query the incidence of single vertices
+    def authors_of(self,paper):
+        '''Returns an index array of the authors of paper.'''
+        return _row(self._paper_offsets,self._paper_authors,self._pending_by_paper,int(paper))
+    
+    def papers_by(self,author):
+        '''Returns an index array of the papers of author.'''
+        return _row(self._author_offsets,self._author_papers,self._pending_by_author,int(author))
+    
+    def paper_degree(self,paper):
+        '''Returns the number of authors of paper.'''
+        if paper>=self.n_papers:
+            return 0
+        return int(self._paper_degree[paper])
+    
+    def author_degree(self,author):
+        '''Returns the number of papers of author.'''
+        if author>=self.n_authors:
+            return 0
+        return int(self._author_degree[author])
+
+################################################################
+    ##
+    #Functions to query the incidence of many vertices at once
+    def authors_of_many(self,papers):
+        '''Returns (offsets, author indices): the authors of the paper index array papers as a CSR structure, row k being papers[k].'''
+        offsets,authors = self.paper_csr()
+        return _gather_rows(offsets,authors,papers)
+    
+    def papers_by_many(self,authors):
+        '''Returns (offsets, paper indices): the papers of the author index array authors as a CSR structure, row k being authors[k].'''
+        offsets,papers = self.author_csr()
+        return _gather_rows(offsets,papers,authors)
+
+################################################################
+    ##
+    #Functions to query the whole incidence
+    def paper_degrees(self,n=None):
+        '''Returns an array with the number of authors of every paper, padded with zeros to length n.'''
+        return _padded(self._paper_degree[:self.n_papers],n)
+    
+    def author_degrees(self,n=None):
+        '''Returns an array with the number of papers of every author, padded with zeros to length n.'''
+        return _padded(self._author_degree[:self.n_authors],n)
+    
+    def paper_csr(self,n=None):
+        '''Returns (offsets, author indices) of the paper->author CSR structure, offsets padded to n papers.'''
+        self.flush()
+        return _padded_offsets(self._paper_offsets,n), self._paper_authors
+    
+    def author_csr(self,n=None):
+        '''Returns (offsets, paper indices) of the author->paper CSR structure, offsets padded to n authors.'''
+        self.flush()
+        return _padded_offsets(self._author_offsets,n), self._author_papers
+    
+    def pairs(self):
+        '''Returns aligned arrays (papers, authors) of all links, sorted by paper.'''
+        offsets,authors = self.paper_csr()
+        return array_utils.csr_rows(offsets), authors.astype('int64')
+    
+    def multiplex_neighbours(self,vertex,layer):
+        '''Returns the vertices of layer ('citation' or 'collab') linked to vertex over one vertex of the other layer.'''
+        if layer=='collab':
+            return _concat([self.authors_of(p) for p in self.papers_by(vertex)])
+        if layer=='citation':
+            return _concat([self.papers_by(a) for a in self.authors_of(vertex)])
+
+################################################################
+    ##
+    #Functions to change and measure the storage
+    def set_index_dtype(self,index_dtype):
+        '''Store the neighbour indices of the CSR structures as index_dtype from now on (e.g. 'int32' to halve them).'''
+        self.flush()
+        self.index_dtype = numpy.dtype(index_dtype)
+        self._paper_authors = self._paper_authors.astype(self.index_dtype,copy=False)
+        self._author_papers = self._author_papers.astype(self.index_dtype,copy=False)
+
+    def nbytes(self):
+        '''Returns the number of bytes of the CSR structures and degrees, plus an estimate for the pending links.'''
+        arrays = (self._paper_offsets,self._paper_authors,self._author_offsets,self._author_papers,self._paper_degree,self._author_degree)
+        return sum(array.nbytes for array in arrays)+_PENDING_LINK_BYTES*self._n_pending
+
+################################################################
+    ##
+    #Function to merge the append buffer into the CSR structures
+    def flush(self):
+        '''Merge pending links into the CSR arrays. Only the pending links are sorted; the stored rows stay sorted and are shifted to make room.'''
+        if self._n_pending==0:
+            return
+        self._merge(*self._pending_pairs())
+
+################################################################
+    def _pending_pairs(self):
+        #aligned arrays (papers, authors) of the pending links
+        papers = numpy.zeros(self._n_pending,dtype='int64')
+        authors = numpy.zeros(self._n_pending,dtype='int64')
+        k = 0
+        for paper,paper_authors in self._pending_by_paper.iteritems():
+            papers[k:k+len(paper_authors)] = paper
+            authors[k:k+len(paper_authors)] = paper_authors
+            k += len(paper_authors)
+        return papers,authors
+
+    def _merge(self,papers,authors):
+        #insert links that are not stored yet into both CSR structures
+        self._paper_offsets,self._paper_authors = _insert_into_rows(self._paper_offsets,self._paper_authors,papers,authors,self.n_papers,self.index_dtype)
+        self._author_offsets,self._author_papers = _insert_into_rows(self._author_offsets,self._author_papers,authors,papers,self.n_authors,self.index_dtype)
+        self._pending_by_paper = {}
+        self._pending_by_author = {}
+        self._n_pending = 0
+
+#################################################
+#helper functions
+
+_PENDING_LINK_BYTES = 2*(8+24) #a list entry and an int object in both directions
+
+def _grow(array,n):
+    new = numpy.zeros(max(n,2*len(array)),dtype=array.dtype)
+    new[:len(array)] = array
+    return new
+
+def _row_positions(offsets,indices,rows,values):
+    #position of the first entry >= value in each (sorted) row, by a binary search in all rows at once
+    lo = numpy.array(offsets[rows],dtype='int64') #writable copies, also of memory-mapped offsets
+    hi = numpy.array(offsets[rows+1],dtype='int64')
+    active = numpy.flatnonzero(lo<hi)
+    while len(active)>0:
+        mid = (lo[active]+hi[active])//2
+        smaller = indices[mid]<values[active]
+        lo[active[smaller]] = mid[smaller]+1
+        hi[active[~smaller]] = mid[~smaller]
+        active = active[lo[active]<hi[active]]
+    return lo
+
+def _in_rows(offsets,indices,rows,values):
+    #True where value is stored in row
+    offsets = _padded_offsets(offsets,int(rows.max())+1)
+    positions = _row_positions(offsets,indices,rows,values)
+    found = positions<offsets[rows+1]
+    found[found] = indices[positions[found]]==values[found]
+    return found
+
+def _insert_into_rows(offsets,indices,rows,values,n_rows,index_dtype):
+    #CSR structure with the new (row, value) pairs inserted, rows kept sorted; O(stored+new) apart from sorting the new pairs
+    offsets = _padded_offsets(offsets,n_rows)
+    order = numpy.lexsort((values,rows))
+    rows = rows[order]
+    values = values[order]
+    positions = _row_positions(offsets,indices,rows,values)
+    new_offsets = numpy.array(offsets,dtype='int64')
+    new_offsets[1:] += numpy.cumsum(numpy.bincount(rows,minlength=len(offsets)-1))
+    return new_offsets,numpy.insert(indices.astype(index_dtype,copy=False),positions,values.astype(index_dtype))
+
+def _row(offsets,indices,pending,i):
+    if i+1<len(offsets):
+        row = indices[offsets[i]:offsets[i+1]]
+    else:
+        row = indices[:0]
+    if i in pending:
+        return numpy.concatenate((row,numpy.array(pending[i],dtype=indices.dtype)))
+    return row
+
+def _gather_rows(offsets,indices,rows):
+    #rows beyond the stored ones are empty
+    rows = numpy.asarray(rows,dtype='int64')
+    if len(rows)>0:
+        offsets = _padded_offsets(offsets,int(rows.max())+1)
+    row_offsets = numpy.zeros(len(rows)+1,dtype='int64')
+    numpy.cumsum(offsets[rows+1]-offsets[rows],out=row_offsets[1:])
+    return row_offsets,array_utils.csr_gather(offsets,indices,rows)[1]
+
+def _concat(arrays):
+    if arrays:
+        return numpy.concatenate(arrays)
+    return numpy.zeros(0,dtype='int64')
+
+def _padded(array,n):
+    if n is None or n<=len(array):
+        return array.copy()
+    padded = numpy.zeros(n,dtype=array.dtype)
+    padded[:len(array)] = array
+    return padded
+
+def _padded_offsets(offsets,n):
+    if n is None or n<len(offsets):
+        return offsets
+    return numpy.concatenate((offsets,numpy.repeat(offsets[-1],n+1-len(offsets))))
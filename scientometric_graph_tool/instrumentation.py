@@ -0,0 +1,207 @@
+#This module implements the instrumentation of the package: progress of the readers, timers of processing stages,
+#counters (lines parsed, duplicates skipped, cuts in the shuffle, ...) and messages. Events go to a sink, which is
+#None by default, so the package is silent and an event costs one global lookup. An optional profile hook runs the
+#outermost call of every public method under cProfile.
+
+import cProfile
+import logging
+import os
+import resource
+import threading
+import time
+
+_sink = None
+_profile_hook = None
+_nesting = threading.local() #.depth: nesting of instrumented public method calls in this thread; only the outermost call is timed and profiled
+
+class Sink(object):
+    'Receiver of instrumentation events; the base class ignores them'
+
+    def progress(self,task,done,total=None):
+        '''done units (e.g. lines) of task are finished, out of total if known.'''
+        pass
+
+    def timing(self,stage,seconds):
+        '''stage took seconds.'''
+        pass
+
+    def count(self,counter,n):
+        '''counter increased by n.'''
+        pass
+
+    def message(self,text,level=logging.INFO):
+        '''A message for the user (level as in logging).'''
+        pass
+
+
+class LoggingSink(Sink):
+    'Forwards instrumentation events to a logging.Logger'
+
+    def __init__(self,logger=None,level=logging.INFO):
+        if logger is None:
+            logger = logging.getLogger('scientometric_graph_tool')
+        self.logger = logger
+        self.level = level
+
+    def progress(self,task,done,total=None):
+        if total is None:
+            self.logger.log(self.level,'%s: %d done',task,done)
+        else:
+            self.logger.log(self.level,'%s: %d of %d done',task,done,total)
+
+    def timing(self,stage,seconds):
+        self.logger.log(self.level,'%s: %.3f s',stage,seconds)
+
+    def count(self,counter,n):
+        self.logger.log(self.level,'%s: +%d',counter,n)
+
+    def message(self,text,level=logging.INFO):
+        self.logger.log(level,text)
+
+
+class CollectingSink(Sink):
+    'Keeps the events: total seconds per stage, totals per counter, last progress per task and the messages'
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+        self.progresses = {}
+        self.messages = []
+
+    def progress(self,task,done,total=None):
+        self.progresses[task] = (done,total)
+
+    def timing(self,stage,seconds):
+        self.timings[stage] = self.timings.get(stage,0.)+seconds
+
+    def count(self,counter,n):
+        self.counters[counter] = self.counters.get(counter,0)+n
+
+    def message(self,text,level=logging.INFO):
+        self.messages.append((level,text))
+
+
+class ProfileDumper(object):
+    'Profile hook writing the cProfile statistics of every call to directory/<method>_<number>.prof'
+
+    def __init__(self,directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.calls = 0
+
+    def __call__(self,name,profile,peak_rss_growth_kb):
+        self.calls += 1
+        profile.dump_stats(os.path.join(self.directory,'%s_%d.prof'%(name,self.calls)))
+
+
+################################################################
+    ##
+#Functions to switch instrumentation on and off
+def set_sink(sink):
+    '''Send events to sink (a Sink); None switches instrumentation off. Returns the previous sink.'''
+    global _sink
+    previous = _sink
+    _sink = sink
+    return previous
+
+def get_sink():
+    '''Returns the current sink (None if instrumentation is off).'''
+    return _sink
+
+def log_to(logger=None,level=logging.INFO):
+    '''Send events to logger (default: the 'scientometric_graph_tool' logger) at level. Returns the previous sink.'''
+    return set_sink(LoggingSink(logger,level))
+
+def set_profile_hook(hook):
+    '''Run the outermost call of every public method under cProfile and call hook(method name, cProfile.Profile, peak RSS growth in kB) afterwards (e.g. a ProfileDumper); None switches profiling off. Returns the previous hook.'''
+    global _profile_hook
+    previous = _profile_hook
+    _profile_hook = hook
+    return previous
+
+
+################################################################
+    ##
+#Functions to send events
+def progress(task,done,total=None):
+    if _sink is not None:
+        _sink.progress(task,done,total)
+
+def count(counter,n=1):
+    if _sink is not None:
+        _sink.count(counter,n)
+
+def message(text,level=logging.INFO):
+    if _sink is not None:
+        _sink.message(text,level)
+
+def timer(stage):
+    '''Returns a context manager that sends the time spent in its block as timing of stage.'''
+    if _sink is None:
+        return _NO_TIMER
+    return _Timer(stage)
+
+
+################################################################
+    ##
+#Function to instrument the methods of a class
+def instrument_methods(cls,names=None):
+    '''Wraps the methods names (default: all public methods defined by cls), so that their outermost calls are timed (if a sink is set) and profiled (if a profile hook is set).'''
+    if names is None:
+        names = [name for name,attribute in cls.__dict__.items() if not name.startswith('_') and callable(attribute)]
+    for name in names:
+        setattr(cls,name,_instrumented(cls.__dict__[name],cls.__name__+'.'+name))
+    return cls
+
+
+#################################################
+#helper functions
+
+class _NoTimer(object):
+    def __enter__(self):
+        return self
+    def __exit__(self,exc_type,exc_value,traceback):
+        return False
+
+_NO_TIMER = _NoTimer()
+
+class _Timer(object):
+    def __init__(self,stage):
+        self.stage = stage
+    def __enter__(self):
+        self.t0 = time.time()
+        return self
+    def __exit__(self,exc_type,exc_value,traceback):
+        if _sink is not None:
+            _sink.timing(self.stage,time.time()-self.t0)
+        return False
+
+def _instrumented(method,name):
+    def wrapper(*args,**kwargs):
+        if (_sink is None and _profile_hook is None) or getattr(_nesting,'depth',0)>0:
+            return method(*args,**kwargs)
+        _nesting.depth = 1
+        try:
+            if _profile_hook is None:
+                t0 = time.time()
+                result = method(*args,**kwargs)
+                _sink.timing(name,time.time()-t0)
+                return result
+            hook = _profile_hook
+            rss = _peak_rss_kb()
+            profile = cProfile.Profile()
+            t0 = time.time()
+            result = profile.runcall(method,*args,**kwargs)
+            if _sink is not None:
+                _sink.timing(name,time.time()-t0)
+            hook(name,profile,_peak_rss_kb()-rss)
+            return result
+        finally:
+            _nesting.depth = 0
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+def _peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
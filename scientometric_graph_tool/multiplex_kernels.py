@@ -0,0 +1,334 @@
+#This module implements array kernels for statistics of paper-author multiplexes.
+#The kernels work on plain numpy arrays (CSR structures by vertex index), so they can run on shared or memory-mapped data.
+
+import numpy
+import array_utils
+
+################################################################
+    ##
+#Function to count citations, self citations and socially biased citations
+def socially_biased_counts(citation_offsets,citation_targets,paper_years,author_offsets,authors,collab_offsets,collab_neighbours,collab_years,n_authors,first_paper=0,last_paper=None,max_block_work=2**24):
+    '''Returns an array with one row [citations, self citations, socially biased citations] per paper first_paper..last_paper-1.
+    
+    citation_offsets/citation_targets: CSR of cited paper -> citing papers
+    author_offsets/authors: CSR of paper -> authors
+    collab_offsets/collab_neighbours/collab_years: CSR of author -> collaborators (both directions) with first_year_collaborated
+    
+    A citation is a self citation if citing and cited paper share an author. Otherwise it is socially biased if an author of
+    the citing paper collaborated with an author of the cited paper before the cited paper was published.'''
+    if last_paper is None:
+        last_paper = len(citation_offsets)-1
+    n_authors = max(int(n_authors),1)
+    counts = numpy.zeros((last_paper-first_paper,3),dtype='int64')
+    
+    #size of the temporary arrays needed per paper, used to process papers in blocks of bounded memory
+    citation_slice = slice(citation_offsets[first_paper],citation_offsets[last_paper])
+    author_slice = slice(author_offsets[first_paper],author_offsets[last_paper])
+    work = numpy.diff(citation_offsets[first_paper:last_paper+1])
+    citing = citation_targets[citation_slice]
+    work = work+array_utils.segment_sums(citation_offsets[first_paper:last_paper+1],author_offsets[citing+1]-author_offsets[citing])
+    paper_authors = authors[author_slice]
+    work = work+array_utils.segment_sums(author_offsets[first_paper:last_paper+1],collab_offsets[paper_authors+1]-collab_offsets[paper_authors])
+    del citing,paper_authors
+    
+    bounds = array_utils.work_blocks(work,max_block_work)
+    for lo,hi in zip(bounds[:-1],bounds[1:]):
+        counts[lo:hi] = _socially_biased_block(citation_offsets,citation_targets,paper_years,author_offsets,authors,
+                                               collab_offsets,collab_neighbours,collab_years,n_authors,first_paper+lo,first_paper+hi)
+    return counts
+
+
+def _socially_biased_block(citation_offsets,citation_targets,paper_years,author_offsets,authors,collab_offsets,collab_neighbours,collab_years,n_authors,lo,hi):
+    papers = numpy.arange(lo,hi)
+    counts = numpy.zeros((hi-lo,3),dtype='int64')
+    counts[:,0] = numpy.diff(citation_offsets[lo:hi+1])
+    
+    #(paper, author) keys of the authors of the block's papers
+    owner,paper_authors = array_utils.csr_gather(author_offsets,authors,papers)
+    author_keys = numpy.unique(owner*n_authors+paper_authors)
+    
+    #(paper, collaborator) keys of all authors' collaborators from before the paper's year
+    collab_owner,collab_positions = array_utils.csr_positions(collab_offsets,paper_authors)
+    collab_paper = owner[collab_owner]
+    earlier = collab_years[collab_positions]<paper_years[lo+collab_paper]
+    collaborator_keys = numpy.unique(collab_paper[earlier]*n_authors+collab_neighbours[collab_positions[earlier]])
+    del collab_owner,collab_positions,collab_paper,earlier,owner,paper_authors
+    
+    #(paper, citing author) keys for every citation of the block's papers
+    cited,citing = array_utils.csr_gather(citation_offsets,citation_targets,papers)
+    citation_owner,citing_authors = array_utils.csr_gather(author_offsets,authors,citing)
+    citing_keys = cited[citation_owner]*n_authors+citing_authors
+    
+    is_self = numpy.bincount(citation_owner,weights=array_utils.in_sorted(citing_keys,author_keys),minlength=len(citing))>0
+    is_biased = numpy.bincount(citation_owner,weights=array_utils.in_sorted(citing_keys,collaborator_keys),minlength=len(citing))>0
+    is_biased &= ~is_self #a self citation is never counted as socially biased
+    counts[:,1] = numpy.bincount(cited,weights=is_self,minlength=hi-lo)
+    counts[:,2] = numpy.bincount(cited,weights=is_biased,minlength=hi-lo)
+    return counts
+
+
+################################################################
+    ##
+#Function to flag self citations
+def self_citations(citation_offsets,citation_targets,author_offsets,authors,n_authors,max_block_work=2**24):
+    '''Returns a bool array aligned with citation_targets[:citation_offsets[-1]], True for the citations whose citing and cited paper share an author.'''
+    n_authors = max(int(n_authors),1)
+    is_self = numpy.zeros(citation_offsets[-1],dtype=bool)
+    citing = citation_targets[:citation_offsets[-1]]
+    work = numpy.diff(citation_offsets)+array_utils.segment_sums(citation_offsets,author_offsets[citing+1]-author_offsets[citing])
+    del citing
+    
+    bounds = array_utils.work_blocks(work,max_block_work)
+    for lo,hi in zip(bounds[:-1],bounds[1:]):
+        papers = numpy.arange(lo,hi)
+        owner,paper_authors = array_utils.csr_gather(author_offsets,authors,papers)
+        author_keys = numpy.unique(owner*n_authors+paper_authors)
+        cited,citing = array_utils.csr_gather(citation_offsets,citation_targets,papers)
+        citation_owner,citing_authors = array_utils.csr_gather(author_offsets,authors,citing)
+        shared = array_utils.in_sorted(cited[citation_owner]*n_authors+citing_authors,author_keys)
+        is_self[citation_offsets[lo]:citation_offsets[hi]] = numpy.bincount(citation_owner,weights=shared,minlength=len(citing))>0
+    return is_self
+
+
+################################################################
+    ##
+#Function to aggregate paper citation counts per author
+def author_impact(paper_citations,author_offsets,author_papers,paper_mask=None):
+    '''Returns arrays (papers, citations, h-index, g-index) of every author of the author->paper CSR, from the citation count of every paper. Only papers with paper_mask True count, if given.
+    
+    The h-index is the largest h such that h papers have at least h citations each, the g-index the largest g such that the g most cited papers have at least g**2 citations together (at most the number of papers).'''
+    n_authors = len(author_offsets)-1
+    owner = array_utils.csr_rows(author_offsets)
+    papers = author_papers[:author_offsets[-1]]
+    if paper_mask is not None:
+        counted = paper_mask[papers]
+        owner = owner[counted]
+        papers = papers[counted]
+        del counted
+    n_papers = numpy.bincount(owner,minlength=n_authors)
+    
+    #citation counts of every author's papers, most cited first, with their rank within the author's papers
+    citations = numpy.asarray(paper_citations,dtype='int64')[papers]
+    order = numpy.lexsort((-citations,owner))
+    owner = owner[order]
+    citations = citations[order]
+    del order,papers
+    starts = numpy.concatenate(([0],numpy.cumsum(n_papers)))
+    rank = numpy.arange(len(owner))-starts[owner]+1
+    total = numpy.bincount(owner,weights=citations,minlength=n_authors).astype('int64')
+    
+    #citations are sorted decreasingly, so both conditions hold for a prefix of every author's papers
+    h_index = numpy.bincount(owner,weights=citations>=rank,minlength=n_authors).astype('int64')
+    cumulative = numpy.cumsum(citations)-numpy.repeat(numpy.cumsum(total)-total,n_papers)
+    g_index = numpy.bincount(owner,weights=cumulative>=rank*rank,minlength=n_authors).astype('int64')
+    return n_papers,total,h_index,g_index
+
+
+################################################################
+    ##
+#Function to find the collaborations formed by paper-author rows
+def first_collaborations(papers,authors,years,linked_papers,linked_authors,max_block_work=2**24):
+    '''Returns arrays (sources, targets, first_years, reset) of the author pairs that collaborate when the paper-author rows
+    (papers, authors, years) are added one after the other, the author of each row collaborating with all authors linked
+    to the paper before.
+    
+    linked_papers/linked_authors: paper-author links that exist before the first row
+    
+    Pairs are ordered by the row that forms them; the source is the author of that row. first_years is the minimum year of
+    the rows contributing to a pair, except that a row with year 0 resets it, so that only later rows count; reset is True
+    for the pairs with such a row.'''
+    papers = numpy.asarray(papers,dtype='int64')
+    authors = numpy.asarray(authors,dtype='int64')
+    years = numpy.asarray(years,dtype='int64')
+    linked_papers = numpy.asarray(linked_papers,dtype='int64')
+    linked_authors = numpy.asarray(linked_authors,dtype='int64')
+    n_rows = len(papers)
+    if n_rows==0:
+        empty = numpy.zeros(0,dtype='int64')
+        return empty,empty.copy(),empty.copy(),numpy.zeros(0,dtype=bool)
+    n_authors = int(max(authors.max(),linked_authors.max() if len(linked_authors)>0 else 0))+1
+    
+    #rows grouped by (paper, author), in row order within each group
+    entry_rows = numpy.lexsort((numpy.arange(n_rows),authors,papers))
+    entry_years = years[entry_rows]
+    entry_keys = papers[entry_rows]*n_authors+authors[entry_rows]
+    seg_start = numpy.flatnonzero(numpy.concatenate(([True],entry_keys[1:]!=entry_keys[:-1])))
+    seg_end = numpy.append(seg_start[1:],n_rows)
+    seg_keys = entry_keys[seg_start]
+    seg = {'start':seg_start,'end':seg_end,'first_row':entry_rows[seg_start],
+           'last_zero':numpy.maximum.reduceat(numpy.where(entry_years==0,entry_rows,-1),seg_start),
+           'suffix_min':_segment_suffix_min(entry_years,seg_start),
+           'entry_keys':numpy.repeat(numpy.arange(len(seg_start)),seg_end-seg_start)*(n_rows+1)+entry_rows,
+           'n_rows':n_rows}
+    del entry_keys
+    
+    #members of every paper with the row of their first link (-1 for links that exist already), ordered by it
+    linked_keys = numpy.unique(linked_papers*n_authors+linked_authors)
+    linked_keys = linked_keys[numpy.in1d(linked_keys//n_authors,papers)]
+    first = entry_rows[seg_start]
+    first[array_utils.in_sorted(seg_keys,linked_keys)] = -1
+    only_linked = linked_keys[~array_utils.in_sorted(linked_keys,seg_keys)]
+    member_keys = numpy.concatenate((seg_keys,only_linked))
+    members = {'first':numpy.concatenate((first,-numpy.ones(len(only_linked),dtype='int64'))),
+               'seg':numpy.concatenate((numpy.arange(len(seg_keys)),-numpy.ones(len(only_linked),dtype='int64'))),
+               'paper':member_keys//n_authors,'author':member_keys%n_authors}
+    order = numpy.lexsort((members['author'],members['first'],members['paper']))
+    for name in members:
+        members[name] = members[name][order]
+    del order,first,member_keys
+    group_start = numpy.flatnonzero(numpy.concatenate(([True],members['paper'][1:]!=members['paper'][:-1])))
+    group_size = numpy.diff(numpy.append(group_start,len(members['paper'])))
+    bounds = array_utils.work_blocks(group_size*(group_size-1)//2,max_block_work)
+    blocks = [(group_start[lo],group_start[hi] if hi<len(group_start) else len(members['paper'])) for lo,hi in zip(bounds[:-1],bounds[1:])]
+    
+    #pairs of all blocks, reduced to one entry per author pair: first forming row, last reset row and minimum year
+    pairs = _reduce_pairs([_reduce_pairs([_collaboration_block(members,seg,n_authors,lo,hi,None)]) for lo,hi in blocks])
+    if (years==0).any():
+        #a reset anywhere drops the earlier rows of the pair in all papers, so recount the minima with the final resets
+        resets = (pairs['keys'],pairs['last_zero'])
+        pairs['min'] = _reduce_pairs([_reduce_pairs([_collaboration_block(members,seg,n_authors,lo,hi,resets)]) for lo,hi in blocks])['min']
+    
+    order = numpy.lexsort((pairs['position'],pairs['first']))
+    no_year = pairs['min'][order]==_NO_YEAR
+    return pairs['sources'][order],pairs['targets'][order],numpy.where(no_year,0,pairs['min'][order]),pairs['last_zero'][order]>=0
+
+
+_NO_YEAR = numpy.iinfo('int64').max
+
+def _collaboration_block(members,seg,n_authors,lo,hi,resets):
+    #all pairs (i, j) of members of the same paper, j linked not before i
+    position = numpy.arange(lo,hi)
+    group_end = numpy.searchsorted(members['paper'],members['paper'][lo:hi],side='right')
+    counts = group_end-position-1
+    i = numpy.repeat(position,counts)
+    j = i+1+numpy.arange(len(i))-numpy.repeat(numpy.cumsum(counts)-counts,counts)
+    
+    #rows of j contribute after i was linked and vice versa; the first contributing row forms the pair
+    first_row_i = numpy.where(members['seg'][i]>=0,seg['first_row'][members['seg'][i]],_NO_YEAR)
+    first_row_j = numpy.where(members['seg'][j]>=0,seg['first_row'][members['seg'][j]],_NO_YEAR)
+    by_i = (members['first'][j]<0)&(first_row_i<first_row_j) #only if both were linked already
+    formed = numpy.where(by_i,first_row_i,first_row_j)
+    keep = formed<_NO_YEAR
+    i = i[keep]
+    j = j[keep]
+    by_i = by_i[keep]
+    formed = formed[keep]
+    
+    sources = numpy.where(by_i,members['author'][i],members['author'][j])
+    targets = numpy.where(by_i,members['author'][j],members['author'][i])
+    keys = numpy.minimum(sources,targets)*n_authors+numpy.maximum(sources,targets)
+    last_zero = numpy.maximum(_last_zero_after(seg,members['seg'][j],members['first'][i]),_last_zero_after(seg,members['seg'][i],members['first'][j]))
+    if resets is None:
+        after = -numpy.ones(len(keys),dtype='int64')
+    else:
+        after = resets[1][numpy.searchsorted(resets[0],keys)]
+    minimum = numpy.minimum(_suffix_min_after(seg,members['seg'][j],numpy.maximum(members['first'][i],after)),
+                            _suffix_min_after(seg,members['seg'][i],numpy.maximum(members['first'][j],after)))
+    return {'keys':keys,'first':formed,'position':numpy.where(by_i,j,i),'sources':sources,'targets':targets,'last_zero':last_zero,'min':minimum}
+
+def _reduce_pairs(blocks):
+    pairs = dict((name,numpy.concatenate([block[name] for block in blocks])) for name in blocks[0])
+    order = numpy.lexsort((pairs['first'],pairs['keys']))
+    for name in pairs:
+        pairs[name] = pairs[name][order]
+    if len(order)==0:
+        return pairs
+    starts = numpy.flatnonzero(numpy.concatenate(([True],pairs['keys'][1:]!=pairs['keys'][:-1])))
+    reduced = dict((name,pairs[name][starts]) for name in ('keys','first','position','sources','targets'))
+    reduced['last_zero'] = numpy.maximum.reduceat(pairs['last_zero'],starts)
+    reduced['min'] = numpy.minimum.reduceat(pairs['min'],starts)
+    return reduced
+
+def _suffix_min_after(seg,segments,rows):
+    #minimum year of the rows of each segment after the given row, _NO_YEAR if there are none
+    result = numpy.zeros(len(segments),dtype='int64')+_NO_YEAR
+    has_rows = segments>=0
+    segments = segments[has_rows]
+    p = numpy.searchsorted(seg['entry_keys'],segments*(seg['n_rows']+1)+rows[has_rows],side='right')
+    valid = p<seg['end'][segments]
+    result[numpy.flatnonzero(has_rows)[valid]] = seg['suffix_min'][p[valid]]
+    return result
+
+def _last_zero_after(seg,segments,rows):
+    #last row with year 0 of each segment, if it is after the given row, else -1
+    last_zero = numpy.where(segments>=0,seg['last_zero'][segments],-1)
+    return numpy.where(last_zero>rows,last_zero,-1)
+
+def _segment_suffix_min(values,starts):
+    #minimum of values[k:end of segment] for every k; shifting later segments up makes one accumulate restart per segment
+    segment = numpy.repeat(numpy.arange(len(starts)),numpy.diff(numpy.append(starts,len(values))))
+    shift = segment*(int(values.max())-int(values.min())+1)
+    return numpy.minimum.accumulate((values+shift)[::-1])[::-1]-shift
+
+
+################################################################
+    ##
+#Function to project the paper-author incidence onto one of its sides
+def co_incidence(row_offsets,row_items,item_offsets,item_rows,row_mask=None,item_mask=None,threshold=1,top_k=None,max_block_work=2**24):
+    '''Returns (offsets, columns, weights), the CSR structure of the product of the incidence with its transpose, without the diagonal:
+    weights[k] is the number of items shared by row i and row columns[k], for offsets[i] <= k < offsets[i+1].
+    
+    row_offsets/row_items: CSR of row -> items (e.g. author -> papers)
+    item_offsets/item_rows: CSR of item -> rows (e.g. paper -> authors)
+    row_mask/item_mask: bool arrays of the rows and items to use (None: all)
+    
+    Only weights >= threshold are kept and, with top_k, the top_k largest weights of each row (ties by column index);
+    columns are sorted within each row. Rows are processed in blocks of bounded memory.'''
+    n_rows = len(row_offsets)-1
+    
+    #size of the temporary arrays needed per row, used to process rows in blocks of bounded memory
+    item_degrees = numpy.diff(item_offsets)
+    work = array_utils.segment_sums(row_offsets,item_degrees[row_items[row_offsets[0]:row_offsets[-1]]])
+    
+    offsets = numpy.zeros(n_rows+1,dtype='int64')
+    columns = []
+    weights = []
+    bounds = array_utils.work_blocks(work,max_block_work)
+    for lo,hi in zip(bounds[:-1],bounds[1:]):
+        block_rows,block_columns,block_weights = _co_incidence_block(row_offsets,row_items,item_offsets,item_rows,row_mask,item_mask,threshold,top_k,lo,hi)
+        offsets[lo+1:hi+1] = numpy.bincount(block_rows-lo,minlength=hi-lo)
+        columns.append(block_columns)
+        weights.append(block_weights)
+    numpy.cumsum(offsets,out=offsets)
+    if not columns:
+        return offsets,numpy.zeros(0,dtype='int64'),numpy.zeros(0,dtype='int64')
+    return offsets,numpy.concatenate(columns),numpy.concatenate(weights)
+
+
+def _co_incidence_block(row_offsets,row_items,item_offsets,item_rows,row_mask,item_mask,threshold,top_k,lo,hi):
+    rows = numpy.arange(lo,hi)
+    if row_mask is not None:
+        rows = rows[row_mask[lo:hi]]
+    owner,items = array_utils.csr_gather(row_offsets,row_items,rows)
+    if item_mask is not None:
+        owner,items = owner[item_mask[items]],items[item_mask[items]]
+    
+    #(row, other row) key for every item the two share
+    item_owner,others = array_utils.csr_gather(item_offsets,item_rows,items)
+    pair_rows = rows[owner[item_owner]]
+    keep = others!=pair_rows
+    if row_mask is not None:
+        keep &= row_mask[others]
+    n = len(row_offsets)-1
+    keys = numpy.sort(pair_rows[keep]*n+others[keep])
+    del owner,items,item_owner,others,pair_rows,keep
+    
+    if len(keys)==0:
+        empty = numpy.zeros(0,dtype='int64')
+        return empty,empty.copy(),empty.copy()
+    starts = numpy.flatnonzero(numpy.concatenate(([True],keys[1:]!=keys[:-1])))
+    weights = numpy.diff(numpy.append(starts,len(keys)))
+    keys = keys[starts]
+    heavy = weights>=threshold
+    keys,weights = keys[heavy],weights[heavy]
+    
+    if top_k is not None:
+        #rank within each row by decreasing weight, then by column
+        order = numpy.lexsort((keys%n,-weights,keys//n))
+        keys,weights = keys[order],weights[order]
+        row_start = numpy.searchsorted(keys//n,keys//n)
+        top = numpy.arange(len(keys))-row_start<top_k
+        keys,weights = keys[top],weights[top]
+        order = numpy.argsort(keys)
+        keys,weights = keys[order],weights[order]
+    return keys//n,keys%n,weights
@@ -8,9 +8,23 @@ import csv
 import itertools
 import random
 import numpy
-import time
+import logging
 import pickle
 import copy
+import collections
+import os
+import shutil
+import tempfile
+import threading
+import incidence
+import array_utils
+import multiplex_kernels
+import parallel
+import id_index
+import snapshot
+import temporal
+import result_cache
+import instrumentation
 
 class PaperAuthorMultiplex():
     'Paper Citation and Author Collaboration Multiplex Structure'
@@ -23,18 +37,35 @@ class PaperAuthorMultiplex():
         self.collab = gt.Graph(directed=False)
         self.citation = gt.Graph(directed=True)
         self.citation.vertex_properties['year']=self.citation.new_vertex_property('int')
-        self.citation.vertex_properties['_graphml_vertex_id']=self.citation.new_vertex_property('string')
         self.citation.edge_properties['year']=self.citation.new_edge_property('int')
 #        self.collab.vertex_properties['year']=self.collab.new_vertex_property('int')
-        self.collab.vertex_properties['_graphml_vertex_id']=self.collab.new_vertex_property('string')
         self.collab.edge_properties['first_year_collaborated']=self.collab.new_edge_property('int')
         
     
-        self._multiplex_collab = self.collab.new_vertex_property('object')
-        self._multiplex_citation = self.citation.new_vertex_property('object')
+        #paper-author links, stored by vertex index in both directions
+        self._multiplex = incidence.MultiplexIncidence()
         
-        self._collab_graphml_vertex_id_to_gt_id = {}
-        self._citation_graphml_vertex_id_to_gt_id = {}
+        #vertex id strings by vertex index, with lookup of the vertex index of an id
+        self._collab_graphml_vertex_id_to_gt_id = id_index.IdIndex()
+        self._citation_graphml_vertex_id_to_gt_id = id_index.IdIndex()
+        
+        #per-paper [citations, self citations, socially biased citations], if kept up to date incrementally
+        self._incremental_counts = None
+        
+        #memory-mapped snapshot the multiplex was loaded from, if any
+        self._snapshot = None
+        
+        #year-sorted papers, citations and collaborations with cached year-window views, built on first use
+        self._temporal = None
+        
+        #number of changes so far; cached results are only valid for the version they were computed at
+        self.version = 0
+        self._snapshot_version = None
+        self._result_cache = None
+        self._result_cache_on_disk = False
+        
+        #int16 years, no stored citation year and int32 indices, see enable_compact_mode
+        self._compact = False
     
     
 ################################################################
@@ -42,6 +73,7 @@ class PaperAuthorMultiplex():
     #Function to add new papers, incl. collaborations
     def add_paper(self,paper_id,year,author_list,update_collaborations=True):
         '''Add a paper with paper_id (str), publication year (int) and authors specified in author_list (list<str>) to the multiplex. Collaborations are automatically updated, unless otherwise specified.'''
+        self.version+=1
         
         #try whether paper exists already in citation network
         try:
@@ -52,10 +84,12 @@ class PaperAuthorMultiplex():
         
         #add new paper to citation network and additional data structures
         new_paper=self.citation.add_vertex()
-        self._citation_graphml_vertex_id_to_gt_id[paper_id]=self.citation.vertex_index[new_paper]
-        self.citation.vertex_properties['_graphml_vertex_id'][new_paper]=paper_id
+        self._citation_graphml_vertex_id_to_gt_id.add(paper_id)
         self.citation.vertex_properties['year'][new_paper]=int(year)
-        self._multiplex_citation[new_paper]={}
+        if self._incremental_counts is not None:
+            self._incremental_resize()
+        if self._temporal is not None:
+            self._temporal.paper(new_paper,int(year))
         
         
         #add collaborations between authors on collab network
@@ -66,22 +100,26 @@ class PaperAuthorMultiplex():
                     new_author=self.collab.vertex(self._collab_graphml_vertex_id_to_gt_id[author])
                 except KeyError:
                     new_author = self.collab.add_vertex()
-                    self._collab_graphml_vertex_id_to_gt_id[author]=self.collab.vertex_index[new_author]
-                    self.collab.vertex_properties['_graphml_vertex_id'][new_author]=author
-                    self._multiplex_collab[new_author]={}
+                    self._collab_graphml_vertex_id_to_gt_id.add(author)
                 #add multiplex information
-                self._multiplex_collab[new_author][new_paper]=True
-                self._multiplex_citation[new_paper][new_author]=True
+                self._multiplex.add(self.citation.vertex_index[new_paper],self.collab.vertex_index[new_author])
                 
             #add collaborations, if older, registered collaborations do not exist
             for author_comb in itertools.combinations(author_list,2):
                 a1_gt_id = self._collab_graphml_vertex_id_to_gt_id[author_comb[0]]
                 a2_gt_id = self._collab_graphml_vertex_id_to_gt_id[author_comb[1]]
                 e = self.collab.edge(a1_gt_id,a2_gt_id)
-                if e == None:
+                new_collaboration = e == None
+                if new_collaboration:
                     e = self.collab.add_edge(a1_gt_id,a2_gt_id)
-                if self.collab.edge_properties['first_year_collaborated'][e]>int(year) or self.collab.edge_properties['first_year_collaborated'][e]==0:
-                    self.collab.edge_properties['first_year_collaborated'][e]=int(year)        
+                    self.collab.edge_properties['first_year_collaborated'][e]=0 #the edge may reuse the index of a removed one
+                previous_year = self.collab.edge_properties['first_year_collaborated'][e]
+                if previous_year>int(year) or previous_year==0:
+                    self.collab.edge_properties['first_year_collaborated'][e]=int(year)
+                    if self._incremental_counts is not None:
+                        self._incremental_collaboration(a1_gt_id,a2_gt_id,previous_year,int(year),new_collaboration)
+                    if self._temporal is not None:
+                        self._temporal.collaboration_edge(e,int(year),None if new_collaboration else previous_year)
 
         return new_paper
 
@@ -89,28 +127,28 @@ class PaperAuthorMultiplex():
     ##
     #Funtion to add multiplex interconnection
     def add_multiplex(self,paper_id,author_id,year):
+        self.version+=1
         try:
             new_paper=self.citation.vertex(self._citation_graphml_vertex_id_to_gt_id[paper_id])
         except KeyError:
             new_paper=self.citation.add_vertex()
-            self._citation_graphml_vertex_id_to_gt_id[paper_id]=self.citation.vertex_index[new_paper]
-            self.citation.vertex_properties['_graphml_vertex_id'][new_paper]=paper_id
+            self._citation_graphml_vertex_id_to_gt_id.add(paper_id)
             self.citation.vertex_properties['year'][new_paper]=int(year)
-            self._multiplex_citation[new_paper]={}            
+            if self._incremental_counts is not None:
+                self._incremental_resize()
+            if self._temporal is not None:
+                self._temporal.paper(new_paper,int(year))
         
         try:
             new_author=self.collab.vertex(self._collab_graphml_vertex_id_to_gt_id[author_id])
         except KeyError:
             new_author = self.collab.add_vertex()
-            self._collab_graphml_vertex_id_to_gt_id[author_id]=self.collab.vertex_index[new_author]
-            self.collab.vertex_properties['_graphml_vertex_id'][new_author]=author_id
-            self._multiplex_collab[new_author]={}
+            self._collab_graphml_vertex_id_to_gt_id.add(author_id)
         
         #add multiplex information
-        self._multiplex_collab[new_author][new_paper]=True
-        self._multiplex_citation[new_paper][new_author]=True
-
-        
+        if self._multiplex.add(self.citation.vertex_index[new_paper],self.collab.vertex_index[new_author]):
+            if self._incremental_counts is not None:
+                self._incremental_link(self.citation.vertex_index[new_paper])
 
 
 ################################################################
@@ -118,6 +156,7 @@ class PaperAuthorMultiplex():
     #Funtion to add citation to citation network
     def add_citation(self,cited_paper,citing_paper):
         '''Add citation between two paper in citation network.'''
+        self.version+=1
         try:
             cited_paper_gt=self._citation_graphml_vertex_id_to_gt_id[cited_paper]
         except KeyError:
@@ -130,7 +169,13 @@ class PaperAuthorMultiplex():
 
         if self.citation.edge(cited_paper_gt,citing_paper_gt)==None:
             new_citation=self.citation.add_edge(cited_paper_gt,citing_paper_gt)
-            self.citation.edge_properties['year'][new_citation]=self.citation.vertex_properties['year'][self.citation.vertex(citing_paper_gt)]
+            year=self.citation.vertex_properties['year'][self.citation.vertex(citing_paper_gt)]
+            if 'year' in self.citation.edge_properties: #not stored in compact mode
+                self.citation.edge_properties['year'][new_citation]=year
+            if self._incremental_counts is not None:
+                self._incremental_citation(cited_paper_gt,citing_paper_gt)
+            if self._temporal is not None:
+                self._temporal.citation_edge(new_citation,year)
         else:
             raise CitationExistsAlreadyError()
                  
@@ -140,15 +185,14 @@ class PaperAuthorMultiplex():
     #Function to add plain new collaboration, independent of papers, from other sources
     def add_collaboration(self,author1, author2, year):
         '''Add collaboration between two authors'''
+        self.version+=1
         
         if author1==author2: #simply add the author to the network, if not existing
             try:
                 new_author=self._collab_graphml_vertex_id_to_gt_id[author1]
             except KeyError:
                 new_author = self.collab.add_vertex()
-                self._collab_graphml_vertex_id_to_gt_id[author]=self.collab.vertex_index[new_author]
-                self.collab.vertex_properties['_graphml_vertex_id'][new_author]=author1
-                self._multiplex_collab[new_author]={}    
+                self._collab_graphml_vertex_id_to_gt_id.add(author1)
             
         else: 
             for author in [author1,author2]:
@@ -156,42 +200,52 @@ class PaperAuthorMultiplex():
                     new_author=self._collab_graphml_vertex_id_to_gt_id[author]
                 except KeyError:
                     new_author = self.collab.add_vertex()
-                    self._collab_graphml_vertex_id_to_gt_id[author]=self.collab.vertex_index[new_author]
-                    self.collab.vertex_properties['_graphml_vertex_id'][new_author]=author
-                    self._multiplex_collab[new_author]={}
+                    self._collab_graphml_vertex_id_to_gt_id.add(author)
                             
             #add collaborations, if older, registered collaborations do not exist
             a1_gt_id = self._collab_graphml_vertex_id_to_gt_id[author1]
             a2_gt_id = self._collab_graphml_vertex_id_to_gt_id[author2]
             e = self.collab.edge(a1_gt_id,a2_gt_id)
-            if e == None:
+            new_collaboration = e == None
+            if new_collaboration:
                 e = self.collab.add_edge(a1_gt_id,a2_gt_id)
-            if self.collab.edge_properties['first_year_collaborated'][e]>int(year) or self.collab.edge_properties['first_year_collaborated'][e]==0:
+                self.collab.edge_properties['first_year_collaborated'][e]=0 #the edge may reuse the index of a removed one
+            previous_year = self.collab.edge_properties['first_year_collaborated'][e]
+            if previous_year>int(year) or previous_year==0:
                 self.collab.edge_properties['first_year_collaborated'][e]=int(year)
+                if self._incremental_counts is not None:
+                    self._incremental_collaboration(a1_gt_id,a2_gt_id,previous_year,int(year),new_collaboration)
+                if self._temporal is not None:
+                    self._temporal.collaboration_edge(e,int(year),None if new_collaboration else previous_year)
 
 ################################################################        
     ##
     #Function to read collab from meat-file
-    def read_meta_create_collab(self,meta_file, header=True,paper_column=0,author_column=1,delimiter=' '):
-        '''Reads meta data file, adds these infos to the citation network and builds the collaboration network.'''
+    def read_meta_create_collab(self,meta_file, header=True,paper_column=0,author_column=1,delimiter=' ',bulk=False,chunk_size=1000000):
+        '''Reads meta data file, adds these infos to the citation network and builds the collaboration network. With bulk=True the file is read into integer columns and the collaborations are built with array operations (same result).'''
+        self.version+=1
+        incremental=self._incremental_counts is not None
+        self._incremental_counts=None #recount once at the end instead of after every line
+        self._temporal=None #rebuilt on next use
+        
+        if bulk==True:
+            self._read_meta_create_collab_bulk(meta_file,header,paper_column,author_column,delimiter,chunk_size)
+            if incremental:
+                self.enable_incremental_citation_counts()
+            return
+        
         with open(meta_file,'r') as f:
             
             if header==True:
                 f.readline()
             
             cou=0
-            t_prev=time.time()
-            t_cum=0
             
             for line in f:
                 
                 cou+=1
                 if cou-10000*(cou/10000)==0:
-                    print 'Lines read: '+str(cou)
-                    t=time.time()
-                    t_cum+=t-t_prev
-                    t_prev=t
-                    print 'Time passed: '+str(t_cum)
+                    instrumentation.progress('read_meta_create_collab',cou)
                 
                 tmp=line.split(delimiter)
                 author_id=tmp[author_column]
@@ -207,30 +261,106 @@ class PaperAuthorMultiplex():
                 
                 
                 
-                coauth = self._multiplex_citation[paper].keys()
+                coauth = self._multiplex.authors_of(self.citation.vertex_index[paper])
                 for i in coauth:
-                    coauthor_id=self.collab.vertex_properties['_graphml_vertex_id'][i]
+                    coauthor_id=self._collab_graphml_vertex_id_to_gt_id.id_of(int(i))
                     self.add_collaboration(author_id,coauthor_id,year)
                 self.add_multiplex(paper_id,author_id,year)
+        instrumentation.count('read_meta_create_collab.lines',cou)
+        
+        if incremental:
+            self.enable_incremental_citation_counts()
+
+    def _read_meta_create_collab_bulk(self,meta_file,header,paper_column,author_column,delimiter,chunk_size):
+        #the result is the same as adding the lines one by one: papers and authors are numbered in order of first appearance,
+        #a paper gets the year of its last line, and every line's author collaborates with the paper's earlier authors
+        paper_codes = []
+        author_codes = []
+        years = []
+        n_papers = self.citation.num_vertices()
+        n_authors = self.collab.num_vertices()
+        
+        with open(meta_file,'r') as f, instrumentation.timer('read_meta_create_collab.parse'):
+            if header==True:
+                f.readline()
+            cou=0
+            while True:
+                lines = list(itertools.islice(f,chunk_size))
+                if not lines:
+                    break
+                cou+=len(lines)
+                
+                rows = [line.split(delimiter) for line in lines]
+                del lines
+                paper_codes.append(self._citation_graphml_vertex_id_to_gt_id.add_many([tmp[paper_column] for tmp in rows]))
+                author_codes.append(self._collab_graphml_vertex_id_to_gt_id.add_many([tmp[author_column] for tmp in rows]))
+                years.append(numpy.array([int(tmp[2].rstrip()) for tmp in rows],dtype='int64'))
+                del rows
+                
+                instrumentation.progress('read_meta_create_collab',cou)
+        instrumentation.count('read_meta_create_collab.lines',cou)
+        
+        if not years:
+            return
+        papers = numpy.concatenate(paper_codes)
+        authors = numpy.concatenate(author_codes)
+        years = numpy.concatenate(years)
+        del paper_codes,author_codes
+        
+        #new vertices, numbered like their ids
+        if len(self._citation_graphml_vertex_id_to_gt_id)>n_papers:
+            self.citation.add_vertex(len(self._citation_graphml_vertex_id_to_gt_id)-n_papers)
+        if len(self._collab_graphml_vertex_id_to_gt_id)>n_authors:
+            self.collab.add_vertex(len(self._collab_graphml_vertex_id_to_gt_id)-n_authors)
+        
+        #publication year of the last line of each paper
+        last = len(papers)-1-numpy.unique(papers[::-1],return_index=True)[1]
+        self.citation.vertex_properties['year'].a[papers[last]] = years[last]
+        
+        #collaborations, given the authors the papers of the file had before
+        old_papers = numpy.unique(papers[papers<n_papers])
+        offsets,linked_authors = self._multiplex.paper_csr(n_papers)
+        owner,linked_authors = array_utils.csr_gather(offsets,linked_authors,old_papers)
+        with instrumentation.timer('read_meta_create_collab.collaborations'):
+            sources,targets,first_years,reset = multiplex_kernels.first_collaborations(papers,authors,years,old_papers[owner],linked_authors)
+        
+        #update existing collaborations and add the new ones in order of formation
+        fcy = self.collab.edge_properties['first_year_collaborated']
+        n_all = self.collab.num_vertices()
+        keys = numpy.minimum(sources,targets)*n_all+numpy.maximum(sources,targets)
+        s,t,idx = array_utils.edge_arrays(self.collab)
+        edge_keys = numpy.minimum(s,t)*n_all+numpy.maximum(s,t)
+        edge_order = numpy.argsort(edge_keys,kind='mergesort')
+        exists = array_utils.in_sorted(keys,edge_keys[edge_order])
+        existing = idx[edge_order[numpy.searchsorted(edge_keys[edge_order],keys[exists])]]
+        previous = fcy.a[existing]
+        fcy.a[existing] = numpy.where(reset[exists]|(previous==0),first_years[exists],numpy.minimum(previous,first_years[exists]))
+        
+        instrumentation.count('read_meta_create_collab.new_collaborations',int((~exists).sum()))
+        if (~exists).any():
+            new_edges = array_utils.add_edges(self.collab,sources[~exists],targets[~exists])
+            fcy.a[new_edges] = first_years[~exists]
+        
+        self._multiplex.add_many(papers,authors)
 
 ################################################################        
     ##
     #Function to read citation graphml file
     def read_citation_graphml(self,citation_file):
         '''Reads a citation graphml file and writes the citation layer.'''
+        self.version+=1
         self.citation = gt.load_graph(citation_file)
         
         self.citation.vertex_properties['year']=self.citation.new_vertex_property('int')
-        
-        for v in self.citation.vertices():
-            self._multiplex_citation[v]={}
-
-        #since I do not know how to address a node in graph_tool using his properties, create a dictionary to have this info:
-        self._citation_graphml_vertex_id_to_gt_id = {}
 
-        for v in self.citation.vertices(): 
-            self._citation_graphml_vertex_id_to_gt_id[self.citation.vertex_properties['_graphml_vertex_id'][v]]=int(self.citation.vertex_index[v])
+        #since I do not know how to address a node in graph_tool using his properties, create an index to have this info:
+        self._citation_graphml_vertex_id_to_gt_id = _graphml_id_index(self.citation)
+        self._temporal = None
+        if self._compact:
+            self._compact_structures()
         
+        if self._incremental_counts is not None:
+            self.enable_incremental_citation_counts()
 
 ################################################################        
     ##
@@ -246,28 +376,19 @@ class PaperAuthorMultiplex():
         f.close()
 
         #read data
+        self.version+=1
+        self._temporal = None
         self.collab = gt.load_graph(collab_file)
         self.citation = gt.load_graph(citation_file)
         self.citation.vertex_properties['year']=self.citation.new_vertex_property('int')
 
-        #create the multiplex structure, implemented with property maps
-        self._multiplex_collab = self.collab.new_vertex_property('object')
-        self._multiplex_citation = self.citation.new_vertex_property('object')
-
-        for v in self.collab.vertices():
-            self._multiplex_collab[v]={}
-        for v in self.citation.vertices():
-            self._multiplex_citation[v]={}
+        #create the multiplex structure
+        self._multiplex = incidence.MultiplexIncidence()
+        self._multiplex.resize(self.citation.num_vertices(),self.collab.num_vertices())
 
-        #since I do not know how to address a node in graph_tool using his properties, create a dictionary to have this info:
-        self._collab_graphml_vertex_id_to_gt_id = {}
-        self._citation_graphml_vertex_id_to_gt_id = {}
-
-        for v in self.collab.vertices(): 
-            self._collab_graphml_vertex_id_to_gt_id[self.collab.vertex_properties['_graphml_vertex_id'][v]]=int(self.collab.vertex_index[v])
-
-        for v in self.citation.vertices(): 
-            self._citation_graphml_vertex_id_to_gt_id[self.citation.vertex_properties['_graphml_vertex_id'][v]]=int(self.citation.vertex_index[v])
+        #since I do not know how to address a node in graph_tool using his properties, create an index to have this info:
+        self._collab_graphml_vertex_id_to_gt_id = _graphml_id_index(self.collab)
+        self._citation_graphml_vertex_id_to_gt_id = _graphml_id_index(self.citation)
 
         #fill the multiplex
         with open(mult_file,'r') as f:
@@ -277,6 +398,8 @@ class PaperAuthorMultiplex():
             multiplex_edge_property_name = header[2].rstrip()
 
             #write multiplex edges with multiplex edge property (year)
+            link_papers = []
+            link_authors = []
             for line in f:
                 tmp = line.split(csv_delimiter)
                 paper_tmp = tmp[0]
@@ -286,23 +409,25 @@ class PaperAuthorMultiplex():
                 try:
                     paper_obj = self.citation.vertex(self._citation_graphml_vertex_id_to_gt_id[paper_tmp])
                 except KeyError:
-                    v=self.citation.add_vertex()
-                    self.citation.vertex_properties['_graphml_vertex_id'][v]=paper_tmp
-                    self._multiplex_citation[v]={}
                     paper_obj = self.add_paper(paper_tmp,year,author_tmp,update_collaborations=False)
 
                 try:
                     author_obj = self.collab.vertex(self._collab_graphml_vertex_id_to_gt_id[author_tmp])
                 except KeyError:
-                    v=self.collab.add_vertex()
-                    self.collab.vertex_properties['_graphml_vertex_id'][v]=author_tmp
-                    self._multiplex_collab[v]={}
-                    author_obj = v
+                    author_obj = self.collab.add_vertex()
+                    self._collab_graphml_vertex_id_to_gt_id.add(author_tmp)
                     
                 self.citation.vertex_properties['year'][paper_obj]=year
 
-                self._multiplex_collab[author_obj][paper_obj] = True
-                self._multiplex_citation[paper_obj][author_obj] = True
+                link_papers.append(int(self.citation.vertex_index[paper_obj]))
+                link_authors.append(int(self.collab.vertex_index[author_obj]))
+            
+            self._multiplex.add_many(link_papers,link_authors)
+        if self._compact:
+            self._compact_structures()
+        
+        if self._incremental_counts is not None:
+            self.enable_incremental_citation_counts()
 
 ################################################################
     ##
@@ -310,10 +435,10 @@ class PaperAuthorMultiplex():
     def papers_by(self,author_id):
         '''Returns a list of paper (citation) vertex objects that specified author has (co)authored.'''
         try:
-            author=self.collab.vertex(self._collab_graphml_vertex_id_to_gt_id[author_id])
-            return self._multiplex_collab[author].keys()
+            author=self._collab_graphml_vertex_id_to_gt_id[author_id]
         except KeyError:
             raise NoSuchAuthorError()
+        return [self.citation.vertex(int(p)) for p in self._multiplex.papers_by(author)]
         
 ################################################################
     ##
@@ -321,10 +446,10 @@ class PaperAuthorMultiplex():
     def authors_of(self,paper_id):
         '''Returns a list of author (collaboration) vertex objects that have (co)authored the specified paper.'''
         try:
-            paper=self.citation.vertex(self._citation_graphml_vertex_id_to_gt_id[paper_id])
-            return self._multiplex_citation[paper].keys()
+            paper=self._citation_graphml_vertex_id_to_gt_id[paper_id]
         except KeyError:
             raise NoSuchPaperError()
+        return [self.collab.vertex(int(a)) for a in self._multiplex.authors_of(paper)]
             
 ################################################################
     ##
@@ -333,7 +458,7 @@ class PaperAuthorMultiplex():
         '''Returns a list of the number of authors for the papers specified in the iterator'''
         number_authors=[]
         for v in paper_vertex_iterator:
-            number_authors.append(len(self._multiplex_citation[v].keys()))
+            number_authors.append(self._multiplex.paper_degree(int(v)))
         return number_authors
         
 
@@ -344,21 +469,35 @@ class PaperAuthorMultiplex():
         '''Returns a list of the number of papers for the authors specified in the iterator'''
         number_papers=[]
         for v in author_vertex_iterator:
-            number_papers.append(len(self._multiplex_collab[v].keys()))
+            number_papers.append(self._multiplex.author_degree(int(v)))
         return number_papers
     
+################################################################
+    ##
+    #Degree property map of one layer
+    def degree_property_map(self,layer,deg):
+        '''Returns the degree property map ('in', 'out' or 'total', as in graph-tool) of layer ('citation' or 'collab').'''
+        if layer=='citation':
+            return self.citation.degree_property_map(deg)
+        if layer=='collab':
+            return self.collab.degree_property_map(deg)
+        raise UnknownLayerError(layer)
+
 ################################################################
     ##
     #Function to multiplex-map proeprty maps, eventually aggregating and aggregation function
-    def multiplex_property_mapping(self,origin_layer_iterator,origin_layer_property,target_layer_property,direction=None,aggregation_function=None):
-        '''Returns list of collaboration net properties for selection of nodes and their according multiplex-mapped property, aggregated using aggregation_function.'''
+    def multiplex_property_mapping(self,origin_layer_iterator,origin_layer_property,target_layer_property,direction=None,aggregation_function=None,as_arrays=False):
+        '''Returns list of collaboration net properties for selection of nodes and their according multiplex-mapped property, aggregated using aggregation_function (a function of a list, or one of 'sum', 'mean', 'max', 'min', 'count', 'median'). With as_arrays=True returns numpy arrays (origin vertex indices, origin values, target values); origin_layer_iterator may then also be a bool vertex mask or an index array.'''
     
         if direction == None:
-            print "###################################"
-            print "Specify direction of mapping first!"
-            print "USE direction='collab_to_citation' OR direction='citation_to_collab'"
-            print "####################################"
+            instrumentation.message("multiplex_property_mapping: specify direction of mapping first! USE direction='collab_to_citation' OR direction='citation_to_collab'",logging.WARNING)
             return
+        
+        if as_arrays==True or isinstance(aggregation_function,basestring):
+            origins,origin_values,target_values = self._multiplex_property_arrays(origin_layer_iterator,origin_layer_property,target_layer_property,direction,aggregation_function)
+            if as_arrays==True:
+                return origins,origin_values,target_values
+            return origin_values.tolist(),target_values.tolist()
     
         if direction == 'collab_to_citation':
     
@@ -367,15 +506,11 @@ class PaperAuthorMultiplex():
     
             if aggregation_function==None:
             
-                print "##############################"
-                print "Assuming one-to-one multiplex!"
-                print "Consider checking this assumption using check_one_to_one()!"
-                print "Otherwise, specify aggregation function!"
-                print "##############################"
+                instrumentation.message('multiplex_property_mapping: assuming one-to-one multiplex! Consider checking this assumption using check_one_to_one(), otherwise specify aggregation function!',logging.WARNING)
             
                 for v in origin_layer_iterator:
                     try:
-                        target_vertex = self._multiplex_collab[v].keys()[0]
+                        target_vertex = self.citation.vertex(int(self._multiplex.papers_by(int(v))[0]))
                         origin_layer_property_values.append(origin_layer_property[v])
                         target_layer_property_values.append(target_layer_property[target_vertex])
                     except IndexError: #if there is no target vertex, simply don't consider it
@@ -383,11 +518,12 @@ class PaperAuthorMultiplex():
             else:
                 for v in origin_layer_iterator:
                     try:
-                        target_vertex = self._multiplex_collab[v].keys()[0]
+                        target_vertices = self._multiplex.papers_by(int(v))
+                        target_vertices[0]
                         origin_layer_property_values.append(origin_layer_property[v])
                         target_layer_property_values_TMP=[]
-                        for target_vs in self._multiplex_collab[v].keys():
-                            target_layer_property_values_TMP.append(target_layer_property[target_vs])
+                        for target_vs in target_vertices:
+                            target_layer_property_values_TMP.append(target_layer_property[self.citation.vertex(int(target_vs))])
                         target_layer_property_values.append(aggregation_function(target_layer_property_values_TMP))
                     except IndexError: #if there is no target vertex, simply don't consider it
                         pass
@@ -400,12 +536,10 @@ class PaperAuthorMultiplex():
             target_layer_property_values=[]
     
             if aggregation_function==None:
-                print "Assuming one-to-one multiplex!"
-                print "Consider checking this assumption using check_one_to_one()!"
-                print "Otherwise, specify aggregation function!"
+                instrumentation.message('multiplex_property_mapping: assuming one-to-one multiplex! Consider checking this assumption using check_one_to_one(), otherwise specify aggregation function!',logging.WARNING)
                 for v in origin_layer_iterator:
                     try:
-                        target_vertex = self._multiplex_citation[v].keys()[0]
+                        target_vertex = self.collab.vertex(int(self._multiplex.authors_of(int(v))[0]))
                         origin_layer_property_values.append(origin_layer_property[v])
                         target_layer_property_values.append(target_layer_property[target_vertex])
                     except IndexError: #if there is no target vertex, simply don't consider it
@@ -413,17 +547,59 @@ class PaperAuthorMultiplex():
             else:
                 for v in origin_layer_iterator:
                     try:
-                        self._multiplex_citation[v].keys()[0]
+                        target_vertices = self._multiplex.authors_of(int(v))
+                        target_vertices[0]
                         origin_layer_property_values.append(origin_layer_property[v])
                         target_layer_property_values_TMP=[]
-                        for target_vs in self._multiplex_citation[v].keys():
-                            target_layer_property_values_TMP.append(target_layer_property[target_vs])
+                        for target_vs in target_vertices:
+                            target_layer_property_values_TMP.append(target_layer_property[self.collab.vertex(int(target_vs))])
                         target_layer_property_values.append(aggregation_function(target_layer_property_values_TMP))
                     except IndexError: #if there is no target vertex, simply don't consider it
                         continue
                 
             return origin_layer_property_values, target_layer_property_values
 
+    def _multiplex_property_arrays(self,origin_layer_iterator,origin_layer_property,target_layer_property,direction,aggregation_function):
+        #target values are gathered through the incidence CSR of the origin layer, one segment per origin vertex
+        if direction == 'collab_to_citation':
+            n_origin = self.collab.num_vertices()
+            offsets,targets = self._multiplex.author_csr(n_origin)
+        elif direction == 'citation_to_collab':
+            n_origin = self.citation.num_vertices()
+            offsets,targets = self._multiplex.paper_csr(n_origin)
+        else:
+            raise UnknownDirectionError(direction)
+        if aggregation_function is not None and not callable(aggregation_function) and aggregation_function not in array_utils.SEGMENT_REDUCTIONS:
+            raise UnknownAggregationError(aggregation_function)
+        
+        origins = array_utils.vertex_selection(origin_layer_iterator,n_origin)
+        origins = origins[offsets[origins+1]>offsets[origins]] #if there is no target vertex, simply don't consider it
+        owner,positions = array_utils.csr_positions(offsets,origins)
+        segments = numpy.zeros(len(origins)+1,dtype='int64')
+        numpy.cumsum(offsets[origins+1]-offsets[origins],out=segments[1:])
+        values = _property_array(target_layer_property)[targets[positions]]
+        
+        if aggregation_function is None: #one-to-one multiplex: value of the first target vertex
+            target_values = values[segments[:-1]]
+        elif callable(aggregation_function):
+            target_values = numpy.array([aggregation_function(values[lo:hi].tolist()) for lo,hi in itertools.izip(segments[:-1].tolist(),segments[1:].tolist())])
+        else:
+            target_values = array_utils.segment_reduce(segments,values,aggregation_function)
+        return origins,_property_array(origin_layer_property)[origins],target_values
+
+
+
+################################################################
+    ##
+    #Function to get the temporal index of the multiplex
+    def temporal_index(self):
+        '''Returns the TemporalIndex (module temporal) of the multiplex: papers, citations and collaborations sorted by year, with cached GraphView windows. Built on first use and kept up to date by the add_* methods.'''
+        if self._temporal is None:
+            if self._compact:
+                self._temporal = temporal.TemporalIndex(self,'int32','int16')
+            else:
+                self._temporal = temporal.TemporalIndex(self)
+        return self._temporal
 
 
 ################################################################
@@ -433,33 +609,89 @@ class PaperAuthorMultiplex():
         '''Calculate shortest path at time of first collaboration'''
     
         shortest_distances={}
-    
-        mask_collab = self.collab.new_edge_property('bool')
-
-        for year in [new_collab_year]:
-            print year
-            new_collabs=gt.graph_tool.util.find_edge(self.collab,self.collab.edge_properties['first_year_collaborated'],year)
-            #set filter of collabs younger than year
-            mask_collab.a = False
-            for e in gt.graph_tool.util.find_edge_range(self.collab,self.collab.edge_properties['first_year_collaborated'],[1892,year-1]):
-                mask_collab[e] = True
-        
-            #Set filters for analysis
-            self.collab.set_edge_filter(mask_collab)
-        
-            #calculate shortest distance for all first-time-collabs of year
-            for e in new_collabs:
-                source = e.source()
-                target = e.target()
-                shortest_distances[e] = gt.graph_tool.topology.shortest_distance(self.collab,source,target)
-            
-            #reset graph filters
-            self.collab.set_edge_filter(None)
-            self.collab.set_vertex_filter(None)
+        
+        instrumentation.message('shortest_path_collab_formation: year '+str(new_collab_year))
+        #first-time-collabs of year, from the temporal index
+        sources,targets,idx = self.temporal_index().collaboration_edges(new_collab_year,new_collab_year)
+        
+        #collab network of the collabs younger than year, as a cached view of the temporal index
+        view = self.temporal_index().collab_view(1892,new_collab_year-1)
+        
+        #calculate shortest distance for all first-time-collabs of year
+        for s,t in itertools.izip(sources.tolist(),targets.tolist()):
+            e = self.collab.edge(s,t)
+            shortest_distances[e] = gt.graph_tool.topology.shortest_distance(view,view.vertex(s),view.vertex(t))
     
         return shortest_distances
 
 
+################################################################
+    ##
+    #Function to calculate shortest path distributions at collaboration formation for all years in one sweep
+    def shortest_path_collab_formation_sweep(self,years=None,min_year=1892):
+        '''For every year in years (default: all years with new collaborations), returns {year:{distance:number of new collaborations}}, where distance is the shortest path between the new collaborators in the collab network of collaborations from min_year to year-1 (2147483647 if unconnected).'''
+        unconnected=numpy.iinfo('int32').max
+        
+        #collaborations in first_year_collaborated order, from the temporal index
+        s,t,idx=array_utils.edge_arrays(self.collab)
+        position=numpy.zeros(self.collab.edge_index_range,dtype='int64')
+        position[idx]=numpy.arange(len(idx))
+        collaborations=self.temporal_index().collaborations
+        order=position[collaborations.items()]
+        s,t,idx=s[order],t[order],idx[order]
+        first_years=self.collab.edge_properties['first_year_collaborated'].a[idx]
+        if years is None:
+            years=collaborations.years()
+            years=years[years>=min_year]
+        years=sorted(int(y) for y in years)
+        
+        #collaborations are switched on in the edge filter of the view year by year, and tracked in a union-find structure
+        mask=self.collab.new_edge_property('bool')
+        mask.a=False
+        view=gt.GraphView(self.collab,efilt=mask)
+        parent=range(self.collab.num_vertices())
+        def find(v):
+            while parent[v]!=v:
+                parent[v]=parent[parent[v]]
+                v=parent[v]
+            return v
+        
+        added=numpy.searchsorted(first_years,min_year)
+        distributions={}
+        for done,year in enumerate(years):
+            until=numpy.searchsorted(first_years,year) #collaborations up to year-1
+            if until>added:
+                mask.a[idx[added:until]]=True
+                for a,b in zip(s[added:until].tolist(),t[added:until].tolist()):
+                    parent[find(a)]=find(b)
+                added=until
+            
+            #new collaborations of year, grouped by source, so that one search serves all targets of a source
+            new_end=numpy.searchsorted(first_years,year,side='right')
+            new_s=s[until:new_end]
+            new_t=t[until:new_end]
+            by_source=numpy.argsort(new_s,kind='mergesort')
+            new_s,new_t=new_s[by_source],new_t[by_source]
+            bounds=numpy.flatnonzero(numpy.diff(new_s))+1
+            
+            distribution={}
+            for lo,hi in zip(numpy.concatenate(([0],bounds)).tolist(),numpy.concatenate((bounds,[len(new_s)])).tolist()):
+                source=int(new_s[lo])
+                root=find(source)
+                targets=[int(v) for v in new_t[lo:hi] if find(int(v))==root]
+                n_unconnected=hi-lo-len(targets)
+                if n_unconnected>0:
+                    distribution[unconnected]=distribution.get(unconnected,0)+n_unconnected
+                if targets:
+                    distances=gt.shortest_distance(view,view.vertex(source),target=targets)
+                    for d in numpy.atleast_1d(distances).tolist():
+                        distribution[d]=distribution.get(d,0)+1
+            distributions[year]=distribution
+            instrumentation.progress('shortest_path_collab_formation_sweep',done+1,len(years))
+        
+        return distributions
+
+
 ################################################################
     ##
     #Function to calculate multiplex neighbourhood of v in layer 1. 
@@ -468,30 +700,64 @@ class PaperAuthorMultiplex():
         'Returns an iterator of vertices in layer, that are multiplex neighbours of vertex_object.'
         
         
-        #define helper functions, necessary as using a lambda function would disabkle pickling of objects later ...
-        def ret_multiplex_citation_key(x):
-            return self._multiplex_citation[x].keys()
-        
-        def ret_multiplex_collab_key(x):
-            return self._multiplex_collab[x].keys()
-        
-        
         if layer==None:
-            print "###################################"
-            print "Specify start_layer of mapping first!"
-            print "USE layer='collab' OR layer='citation'"
-            print "####################################"
+            instrumentation.message("multiplex_neighbours: specify start_layer of mapping first! USE layer='collab' OR layer='citation'",logging.WARNING)
             return
                 
         if layer=='collab':
-            multiplex_neighbours_TMP=itertools.imap(ret_multiplex_citation_key,self._multiplex_collab[vertex_object].keys())
-            multiplex_neighbours=itertools.chain.from_iterable(multiplex_neighbours_TMP)
-            return multiplex_neighbours
+            multiplex_neighbours=self._multiplex.multiplex_neighbours(int(vertex_object),'collab')
+            return itertools.imap(self.collab.vertex,multiplex_neighbours.tolist())
         
         if layer=='citation':
-            multiplex_neighbours_TMP=itertools.imap(ret_multiplex_collab_key,self._multiplex_citation[vertex_object].keys())
-            multiplex_neighbours=itertools.chain.from_iterable(multiplex_neighbours_TMP)
-            return multiplex_neighbours
+            multiplex_neighbours=self._multiplex.multiplex_neighbours(int(vertex_object),'citation')
+            return itertools.imap(self.citation.vertex,multiplex_neighbours.tolist())
+
+
+################################################################
+    ##
+    #Function to calculate the multiplex projections of all vertices of one layer at once
+    def projection(self,layer,threshold=1,top_k=None,year_cutoff=None,output='csr',max_block_work=2**24):
+        '''Returns the projection of the multiplex links onto layer: for layer='collab' the number of papers in common of every pair of authors, for layer='citation' the number of authors in common of every pair of papers. Only papers published up to year_cutoff are used, only weights >= threshold and the top_k largest weights per vertex are kept. output='csr' returns arrays (offsets, columns, weights) by vertex index, output='scipy' a scipy.sparse.csr_matrix, output='graph' a graph-tool graph with an int edge property 'weight'.'''
+        n_papers = self.citation.num_vertices()
+        n_authors = self.collab.num_vertices()
+        paper_offsets,paper_authors = self._multiplex.paper_csr(n_papers)
+        author_offsets,author_papers = self._multiplex.author_csr(n_authors)
+        paper_mask = None
+        if year_cutoff is not None:
+            paper_mask = self.citation.vertex_properties['year'].a[:n_papers]<=year_cutoff
+        
+        if layer=='collab':
+            n = n_authors
+            offsets,columns,weights = multiplex_kernels.co_incidence(author_offsets[:n+1],author_papers,paper_offsets,paper_authors,item_mask=paper_mask,
+                                                                     threshold=threshold,top_k=top_k,max_block_work=max_block_work)
+        elif layer=='citation':
+            n = n_papers
+            offsets,columns,weights = multiplex_kernels.co_incidence(paper_offsets[:n+1],paper_authors,author_offsets,author_papers,row_mask=paper_mask,
+                                                                     threshold=threshold,top_k=top_k,max_block_work=max_block_work)
+        else:
+            raise UnknownLayerError(layer)
+        
+        if output=='csr':
+            return offsets,columns,weights
+        if output=='scipy':
+            import scipy.sparse
+            return scipy.sparse.csr_matrix((weights,columns,offsets),shape=(n,n))
+        if output=='graph':
+            #without top_k the projection is symmetric and every pair becomes one undirected edge
+            rows = array_utils.csr_rows(offsets)
+            directed = top_k is not None
+            if not directed:
+                upper = rows<columns
+                rows,columns,weights = rows[upper],columns[upper],weights[upper]
+            graph = gt.Graph(directed=directed)
+            if n>0:
+                graph.add_vertex(n)
+            graph.edge_properties['weight'] = graph.new_edge_property('int')
+            if len(rows)>0:
+                graph.add_edge_list(numpy.column_stack((rows,columns)))
+                graph.edge_properties['weight'].a[:len(rows)] = weights
+            return graph
+        raise UnknownOutputError(output)
 
 
 ################################################################
@@ -502,17 +768,14 @@ class PaperAuthorMultiplex():
     
         #define helper functions, necessary as using a lambda function would disabkle pickling of objects later ...
         def ret_collab_vertex_prop(x):
-            return self.collab.vertex_properties['_graphml_vertex_id'][x]
+            return self._collab_graphml_vertex_id_to_gt_id.id_of(int(x))
             
         def ret_citation_vertex_prop(x):
-            return self.citation.vertex_properties['_graphml_vertex_id'][x]
+            return self._citation_graphml_vertex_id_to_gt_id.id_of(int(x))
         
         
         if layer==None:
-            print "###################################"
-            print "Specify layer of vertex origin!"
-            print "USE layer='collab' OR layer='citation'"
-            print "####################################"
+            instrumentation.message("vertex_id: specify layer of vertex origin! USE layer='collab' OR layer='citation'",logging.WARNING)
             return
         
         if layer=='collab':
@@ -521,45 +784,203 @@ class PaperAuthorMultiplex():
         if layer=='citation':
             return itertools.imap(ret_citation_vertex_prop,iterable_of_vertices)
 
+################################################################
+    ##
+    #Functions to convert between vertices and ids of many vertices at once
+    def vertex_ids(self,vertices,layer):
+        '''Returns (data, offsets): the id strings of the vertices of layer ('citation' or 'collab') packed into one byte array, the id of the k-th vertex being data[offsets[k]:offsets[k+1]]. vertices may be a bool vertex mask (property map or array), an index array or an iterable of vertex objects.'''
+        return self._layer_ids(layer).ids_packed(array_utils.vertex_selection(vertices,self._num_vertices(layer)))
+
+    def write_vertex_ids(self,vertices,filename,layer,separator='\n'):
+        '''Writes the id strings of the vertices of layer (selected as in vertex_ids) to filename (or a file object), each followed by separator.'''
+        self._layer_ids(layer).write_ids(filename,array_utils.vertex_selection(vertices,self._num_vertices(layer)),separator)
+
+    def vertex_indices(self,ids,layer):
+        '''Returns (indices, missing): the vertex indices of the id strings ids (a list or a numpy array of byte strings) in layer, -1 where missing is True.'''
+        indices = self._layer_ids(layer).lookup(ids)
+        return indices,indices<0
+
+    def papers_by_many(self,authors):
+        '''Returns (offsets, paper indices) of the papers of the authors (selected as in vertex_ids) as a CSR structure: the papers of the k-th author are papers[offsets[k]:offsets[k+1]].'''
+        return self._multiplex.papers_by_many(array_utils.vertex_selection(authors,self._num_vertices('collab')))
+
+    def authors_of_many(self,papers):
+        '''Returns (offsets, author indices) of the authors of the papers (selected as in vertex_ids) as a CSR structure: the authors of the k-th paper are authors[offsets[k]:offsets[k+1]].'''
+        return self._multiplex.authors_of_many(array_utils.vertex_selection(papers,self._num_vertices('citation')))
+
+    def _layer_ids(self,layer):
+        if layer=='citation':
+            return self._citation_graphml_vertex_id_to_gt_id
+        if layer=='collab':
+            return self._collab_graphml_vertex_id_to_gt_id
+        raise UnknownLayerError(layer)
+
 ################################################################
     ##
     #Function to calculate socially biased citations
-    def socially_biased_citations(self):
-        '''Calculate number of socially-biased citations'''
-        print 'Calculating socially biased citation statistics...'
-        print '--------------'
-        print 'Consider executing check_citation_causality() first!'
-        citation_dictionary={}
-        for paper in self.citation.vertices():
-            year = self.citation.vertex_properties['year'][paper]
-            biased_citations=0
-            self_citations=0
-            citations=0
-            authors = self._multiplex_citation[paper].keys()
-            earlier_collaborators = []
+    def socially_biased_citations(self,as_arrays=False,processes=1):
+        '''Calculate number of socially-biased citations. With processes>1 (None: all cores), papers are split into shards that are processed in parallel.'''
+        if as_arrays==False:
+            instrumentation.message('Calculating socially biased citation statistics... Consider executing check_citation_causality() first!')
+        
+        if self._incremental_counts is not None:
+            counts=self._incremental_counts[:self.citation.num_vertices()].copy()
+        else:
+            with instrumentation.timer('socially_biased_citations.arrays'):
+                arrays=self._socially_biased_arrays()
+            with instrumentation.timer('socially_biased_citations.counts'):
+                if processes==1:
+                    counts=multiplex_kernels.socially_biased_counts(*arrays)
+                else:
+                    counts=parallel.sharded_socially_biased_counts(dict(zip(parallel.SOCIALLY_BIASED_ARRAYS,arrays[:-1])),arrays[-1],processes)
+            del arrays
+        if as_arrays==True:
+            return counts[:,0],counts[:,1],counts[:,2]
+        
+        citation_dictionary=dict(itertools.izip(self._citation_graphml_vertex_id_to_gt_id.ids(),counts.tolist()))
+        instrumentation.message('Output Format: {paper:[citations,self citations, socially biased citations],... }')
+        return citation_dictionary
 
-            for a in authors:
-                for n in a.all_neighbours():
-                    if self.collab.edge_properties['first_year_collaborated'][self.collab.edge(a,n)]< year:
-                        earlier_collaborators.append(n)
-                
-            for citing_paper in paper.out_neighbours():
+    def _socially_biased_arrays(self):
+        #arguments of multiplex_kernels.socially_biased_counts, by vertex index
+        n_papers=self._num_vertices('citation')
+        n_authors=self._num_vertices('collab')
+        citation_offsets,citation_targets=self._citation_csr()
+        author_offsets,authors=self._multiplex.paper_csr(n_papers)
+        collab_offsets,collab_neighbours,collab_years=self._collab_adjacency()
+        paper_years=self._paper_years()
+        return citation_offsets,citation_targets,paper_years,author_offsets,authors,collab_offsets,collab_neighbours,collab_years,n_authors
+
+################################################################
+    ##
+    #Function to calculate citation impact metrics of all authors at once
+    def author_metrics(self,window=None,exclude_self_citations=False,first_year=None,last_year=None):
+        '''Returns a dict of arrays indexed by collaboration vertex index: 'papers', 'citations', 'h_index', 'g_index' and, with window (years), 'window_citations': the citations received by the author's papers from papers published at most window years later. Only papers published in first_year..last_year (None: unbounded) count; with exclude_self_citations=True, citations from papers sharing an author with the cited paper are not counted.'''
+        n_papers=self._num_vertices('citation')
+        n_authors=self._num_vertices('collab')
+        citation_offsets,citation_targets=self._citation_csr()
+        author_offsets,author_papers=self._multiplex.author_csr(n_authors)
+        author_offsets=author_offsets[:n_authors+1]
+        
+        #citations of every paper from its out-degree, without the flagged citations
+        counted=None
+        if exclude_self_citations==True:
+            paper_offsets,authors=self._multiplex.paper_csr(n_papers)
+            counted=~multiplex_kernels.self_citations(citation_offsets,citation_targets,paper_offsets,authors,n_authors)
+        if counted is None:
+            paper_citations=numpy.diff(citation_offsets)
+        else:
+            paper_citations=array_utils.segment_sums(citation_offsets,counted)
+        
+        paper_mask=None
+        if first_year is not None or last_year is not None:
+            paper_mask=numpy.zeros(n_papers,dtype=bool)
+            paper_mask[self.temporal_index().papers.items(first_year,last_year)]=True
+        
+        metrics={}
+        metrics['papers'],metrics['citations'],metrics['h_index'],metrics['g_index']=multiplex_kernels.author_impact(paper_citations,author_offsets,author_papers,paper_mask)
+        if window is not None:
+            years=self._paper_years()[:n_papers].astype('int64')
+            cited=array_utils.csr_rows(citation_offsets)
+            lag=years[citation_targets[:citation_offsets[-1]]]-years[cited]
+            in_window=(lag>=0)&(lag<=window)
+            if counted is not None:
+                in_window&=counted
+            window_citations=array_utils.segment_sums(citation_offsets,in_window)
+            metrics['window_citations']=multiplex_kernels.author_impact(window_citations,author_offsets,author_papers,paper_mask)[1]
+        return metrics
+
+################################################################
+    ##
+    #Functions to keep socially biased citation counts up to date while the multiplex grows
+    def enable_incremental_citation_counts(self):
+        '''Keep [citations, self citations, socially biased citations] of every paper up to date in add_paper, add_citation, add_collaboration and add_multiplex; socially_biased_citations then returns them without recomputation.'''
+        self._incremental_counts=None
+        citations,self_citations,biased_citations=self.socially_biased_citations(as_arrays=True)
+        self._incremental_counts=numpy.column_stack((citations,self_citations,biased_citations))
+    
+    def disable_incremental_citation_counts(self):
+        '''Stop keeping citation counts up to date.'''
+        self._incremental_counts=None
+    
+    def _incremental_resize(self):
+        n=self.citation.num_vertices()
+        if n>len(self._incremental_counts):
+            counts=numpy.zeros((max(n,2*len(self._incremental_counts)),3),dtype='int64')
+            counts[:len(self._incremental_counts)]=self._incremental_counts
+            self._incremental_counts=counts
+    
+    def _incremental_citation(self,cited,citing):
+        #a new citation only changes the counts of the cited paper
+        authors=set(self._multiplex.authors_of(cited).tolist())
+        citing_authors=set(self._multiplex.authors_of(citing).tolist())
+        self._incremental_counts[cited,0]+=1
+        if authors & citing_authors:
+            self._incremental_counts[cited,1]+=1
+        elif self._earlier_collaborators(cited,authors) & citing_authors:
+            self._incremental_counts[cited,2]+=1
+    
+    def _incremental_link(self,paper):
+        #new author of paper: changes the counts of paper itself and of all papers it cites
+        self._incremental_recount([paper])
+        self._incremental_recount([int(v) for v in self.citation.vertex(paper).in_neighbours()])
+    
+    def _incremental_collaboration(self,author1,author2,previous_year,year,new=False):
+        #collaboration first registered in year instead of previous_year: changes papers of both authors published in between.
+        #A new collaboration changes all papers after year; an existing one of year 0 counted for all papers after year 0.
+        papers=numpy.union1d(self._multiplex.papers_by(author1),self._multiplex.papers_by(author2))
+        paper_years=self.citation.vertex_properties['year'].a[papers]
+        if new:
+            affected=paper_years>year
+        else:
+            affected=(paper_years>min(previous_year,year))&(paper_years<=max(previous_year,year))
+        self._incremental_recount(papers[affected].tolist())
+    
+    def _incremental_recount(self,papers):
+        for paper in papers:
+            authors=set(self._multiplex.authors_of(paper).tolist())
+            earlier_collaborators=self._earlier_collaborators(paper,authors)
+            citations=0
+            self_citations=0
+            biased_citations=0
+            for citing_paper in self.citation.vertex(paper).out_neighbours():
                 citations+=1
-                citing_authors = self._multiplex_citation[citing_paper].keys()
-                if set(authors).intersection(set(citing_authors)): #count self-citations
+                citing_authors=set(self._multiplex.authors_of(int(citing_paper)).tolist())
+                if authors & citing_authors:
                     self_citations+=1
-                    continue #if continue is not given, the three citation counts are not additive, i.e. a self-citation can additionally be a  socially biased citation
-                if earlier_collaborators and set(earlier_collaborators).intersection(set(citing_authors)).difference(authors): #add biased citation if citing author is former coauthor of at least one of the authors; exclude self-citations here
+                elif earlier_collaborators & citing_authors:
                     biased_citations+=1
-            citation_dictionary[self.citation.vertex_properties['_graphml_vertex_id'][paper]]=[citations,self_citations,biased_citations]
-
-            # print '--------------'
-            # print 'paper: '+self.citation.vertex_properties['_graphml_vertex_id'][paper]
-            # print 'citations: '+str(citations)
-            # print 'self citation: '+str(self_citations)
-            # print 'socially biased citations: '+str(biased_citations)
-        print 'Output Format: {paper:[citations,self citations, socially biased citations],... }'
-        return citation_dictionary
+            self._incremental_counts[paper]=[citations,self_citations,biased_citations]
+    
+    def _earlier_collaborators(self,paper,authors):
+        #collaborators of the authors of paper from before the publication year of paper
+        year=self.citation.vertex_properties['year'].a[paper]
+        first_year_collaborated=self.collab.edge_properties['first_year_collaborated']
+        earlier_collaborators=set()
+        for a in authors:
+            for e in self.collab.vertex(a).all_edges():
+                if first_year_collaborated[e]<year:
+                    s=int(e.source())
+                    earlier_collaborators.add(int(e.target()) if s==a else s)
+        return earlier_collaborators
+
+################################################################
+    ##
+    #Functions to get the layers as CSR arrays by vertex index
+    def _citation_csr(self):
+        #cited paper -> citing papers
+        if self._snapshot_layer('citation') and self._snapshot.csr('citation') is not None:
+            return self._snapshot.csr('citation')
+        s,t,idx=array_utils.edge_arrays(self.citation)
+        return array_utils.csr_from_pairs(s,t,self.citation.num_vertices())
+
+    def _collab_adjacency(self):
+        #author -> collaborators, both directions, with first_year_collaborated
+        if self._snapshot_layer('collab') and self._snapshot.csr('collab') is not None:
+            return self._snapshot.csr('collab')
+        s,t,idx=array_utils.edge_arrays(self.collab)
+        years=self.collab.edge_properties['first_year_collaborated'].a[idx]
+        return array_utils.csr_from_pairs(numpy.concatenate((s,t)),numpy.concatenate((t,s)),self.collab.num_vertices(),values=numpy.concatenate((years,years)))
 
 
  
@@ -567,53 +988,44 @@ class PaperAuthorMultiplex():
     ##
     #Function to calculate citations of papers in years yr after yd years
     def citation_success(self,yr,yd,perc):
+        '''Returns (citations received within yd years after publication, bool whether this exceeds the perc percentile of the paper's publication year, list of percentile cuts) for the papers published in the years yr.'''
         #create property map
         citation_success=self.citation.new_vertex_property("double")
-        citation_success_perc=self.citation.new_vertex_property("bool")    
-        perc_cuts=[]
-            
-        for y in yr:
-            print y,'...'
-            #find vertices
-            y1_vertices = gt.find_vertex(self.citation,self.citation.vertex_properties['year'],y)
-            y1yd_vertices = gt.find_vertex_range(self.citation,self.citation.vertex_properties['year'],[y,y+yd])
-    
-            #set vertex filter property
-            print 'Set filter prop...'
-            y1yd_filter_prop=self.citation.new_vertex_property("bool")
-            y1_filter_prop=self.citation.new_vertex_property("bool")
-            y1yd_filter_prop.a=False
-            y1_filter_prop.a=False
-            for v in y1yd_vertices:
-                y1yd_filter_prop[v]=True
-            for v in y1_vertices:
-                y1_filter_prop[v]=True
-    
-            #calculate graph_view of the subgraph of y,y+yd
-            print 'Calc graph view ...'
-            sub_cite_degree = self.citation.new_vertex_property("double")
-            self.citation.set_vertex_filter(y1yd_filter_prop)
-            sub_cite_degree.fa = self.citation.degree_property_map('out').fa
-            #there are a lot of zeros ... so the percentile percentage has to be quite high
-            self.citation.set_vertex_filter(None)
-            self.citation.set_vertex_filter(y1_filter_prop)
-            tmp = sub_cite_degree.fa
-            percentile_cut = numpy.percentile(tmp,perc)
-            perc_cuts.append(percentile_cut)
-            print 'Percentile cut is ',percentile_cut
-            self.citation.set_vertex_filter(None)
-
-        
-            print 'Write success ...'
-
-            #write number of citations and success bool after yd years
-            self.citation.set_vertex_filter(y1_filter_prop)
-            citation_success.fa = tmp.copy()
-            print 'There are ',numpy.count_nonzero(tmp>percentile_cut),' nodes exceeding the percentile cut.'
-            citation_success_perc.fa = (tmp > percentile_cut).copy()
-            self.citation.set_vertex_filter(None)
-        
-            
+        citation_success_perc=self.citation.new_vertex_property("bool")
+        yr=numpy.asarray(list(yr),dtype='int64')
+
+        #citations from papers published in [year,year+yd] of the cited paper
+        years=self.citation.vertex_properties['year'].a.astype('int64')
+        s,t,idx=array_utils.edge_arrays(self.citation)
+        in_window=(years[t]>=years[s])&(years[t]<=years[s]+yd)
+        counts=numpy.bincount(s[in_window],minlength=len(years))
+
+        #papers of the requested years from the temporal index, sorted by (year, citations)
+        papers=self.temporal_index().papers
+        cohort=numpy.concatenate([papers.items(y,y) for y in numpy.unique(yr).tolist()]+[numpy.zeros(0,dtype='int64')])
+        cohort=cohort[numpy.lexsort((counts[cohort],years[cohort]))]
+        cohort_years=years[cohort]
+        starts=numpy.searchsorted(cohort_years,yr,side='left')
+        sizes=numpy.searchsorted(cohort_years,yr,side='right')-starts
+
+        #percentile cut of every year, interpolated linearly like numpy.percentile
+        sorted_counts=counts[cohort].astype('float64')
+        rank=perc/100.*numpy.maximum(sizes-1,0)
+        below=numpy.floor(rank).astype('int64')
+        above=numpy.ceil(rank).astype('int64')
+        cuts=numpy.zeros(len(yr))*numpy.nan
+        has_papers=sizes>0
+        lower=sorted_counts[(starts+below)[has_papers]]
+        upper=sorted_counts[(starts+above)[has_papers]]
+        cuts[has_papers]=lower+(upper-lower)*(rank-below)[has_papers]
+        perc_cuts=cuts.tolist()
+
+        #write number of citations and success bool after yd years
+        order=numpy.argsort(yr,kind='mergesort')
+        year_cuts=cuts[order[numpy.searchsorted(yr[order],cohort_years)]]
+        citation_success.a[cohort]=counts[cohort]
+        citation_success_perc.a[cohort]=counts[cohort]>year_cuts
+
         return citation_success, citation_success_perc,perc_cuts
         
         
@@ -644,9 +1056,8 @@ class PaperAuthorMultiplex():
         for v in self.citation.vertices():
             v_id=self.citation.vertex_index[v]
             tmp[v_id]={}
-            for w in self._multiplex_citation[v].keys():
-                if self._multiplex_citation[v][w]==True:
-                    tmp[v_id][self.collab.vertex_index[w]]=True
+            for w in self._multiplex.authors_of(v_id):
+                tmp[v_id][int(w)]=True
         pickle.dump(tmp,f)
         f.close()
 
@@ -656,9 +1067,8 @@ class PaperAuthorMultiplex():
         for v in self.collab.vertices():
             v_id=self.collab.vertex_index[v]
             tmp[v_id]={}
-            for w in self._multiplex_collab[v].keys():
-                if self._multiplex_collab[v][w]==True:
-                    tmp[v_id][self.citation.vertex_index[w]]=True
+            for w in self._multiplex.papers_by(v_id):
+                tmp[v_id][int(w)]=True
         pickle.dump(tmp,f)
         f.close()
 
@@ -676,41 +1086,295 @@ class PaperAuthorMultiplex():
         f.close()
 
         f = open(filename+'_citation_ids.pickle','r')
-        self._citation_graphml_vertex_id_to_gt_id=pickle.load(f)
+        self._citation_graphml_vertex_id_to_gt_id=_as_id_index(pickle.load(f),self.citation)
         f.close()
 
         f = open(filename+'_collab_ids.pickle','r')
-        self._collab_graphml_vertex_id_to_gt_id=pickle.load(f)
+        self._collab_graphml_vertex_id_to_gt_id=_as_id_index(pickle.load(f),self.collab)
         f.close()
     
+        self._multiplex = incidence.MultiplexIncidence()
+        self._multiplex.resize(self.citation.num_vertices(),self.collab.num_vertices())
+        link_papers=[]
+        link_authors=[]
+        
         f = open(filename+'_citation_multiplex.pickle','r')
         tmp=pickle.load(f)
         for v_id in tmp.keys():
-            v=self.citation.vertex(v_id)
-            self._multiplex_citation[v]={}
             for w_id in tmp[v_id].keys():
                 if tmp[v_id][w_id]==True:
-                    w=self.collab.vertex(w_id)
-                    self._multiplex_citation[v][w]=True
+                    link_papers.append(v_id)
+                    link_authors.append(w_id)
         f.close()
 
 
         f = open(filename+'_collab_multiplex.pickle','r')
         tmp=pickle.load(f)
         for v_id in tmp.keys():
-            v=self.collab.vertex(v_id)
-            self._multiplex_collab[v]={}
             for w_id in tmp[v_id].keys():
                 if tmp[v_id][w_id]==True:
-                    w=self.citation.vertex(w_id)
-                    self._multiplex_collab[v][w]=True
+                    link_papers.append(w_id)
+                    link_authors.append(v_id)
         f.close()
+        
+        self._multiplex.add_many(link_papers,link_authors)
+        self._temporal = None
+        self.version+=1
+        if self._compact:
+            self._compact_structures()
+        
+        if self._incremental_counts is not None:
+            self.enable_incremental_citation_counts()
+
+
+################################################################
+    ##
+    #Functions to cache derived results while the multiplex is unchanged
+    def enable_result_cache(self,max_entries=32,disk=True):
+        '''Keep the results of socially_biased_citations, citation_success, distribution_authors, distribution_papers, degree_property_map and author_metrics by arguments in an LRU cache of max_entries results. Every add_*/read_* call increases .version and thereby invalidates them. With disk=True and a multiplex loaded by load_snapshot, results that are plain data are also written next to the snapshot and reused by later sessions as long as the multiplex is unchanged. Cached results are handed out as copies.'''
+        self._result_cache=result_cache.ResultCache(max_entries)
+        self._result_cache_on_disk=disk==True
+        if self._result_cache_on_disk and self._snapshot is not None:
+            self._attach_result_cache_directory()
+
+    def disable_result_cache(self):
+        '''Stop caching results.'''
+        self._result_cache=None
+
+    def _attach_result_cache_directory(self):
+        self._result_cache.attach_directory(self._snapshot.result_cache_directory(),self._snapshot_version)
+
+
+################################################################
+    ##
+    #Functions to switch to a compact representation
+    def enable_compact_mode(self):
+        '''Store the years as int16 (vertex property 'year' of the citation layer, edge property 'first_year_collaborated' of the collaboration layer), drop the edge property 'year' of the citation layer (see citation_years) and keep the vertex indices of the paper-author incidence and of the temporal index as int32. The readers keep the multiplex compact. Raises CompactModeError if a year does not fit into int16 or a layer has 2**31 vertices or more.'''
+        if max(self._num_vertices('citation'),self._num_vertices('collab'))>=2**31:
+            raise CompactModeError('too many vertices for int32 indices')
+        self._compact=True
+        try:
+            self._compact_structures()
+        except CompactModeError:
+            self.disable_compact_mode()
+            raise
+
+    def disable_compact_mode(self):
+        '''Go back to int years, a stored citation year and int64 indices.'''
+        self._compact=False
+        self._compact_structures()
+
+    def citation_years(self):
+        '''Returns the year of every citation (the year of the citing paper) by edge index: the edge property 'year' of the citation layer, or derived from the paper years in compact mode.'''
+        if 'year' in self.citation.edge_properties:
+            return self.citation.edge_properties['year'].a
+        s,t,idx=array_utils.edge_arrays(self.citation)
+        paper_years=self.citation.vertex_properties['year'].a
+        years=numpy.zeros(self.citation.edge_index_range,dtype=paper_years.dtype)
+        years[idx]=paper_years[t]
+        return years
+
+    def _compact_structures(self):
+        #layers of a loaded snapshot that are not built yet are converted when they are built
+        for layer in ('citation','collab'):
+            if layer in self.__dict__:
+                self._compact_layer(layer)
+        self._multiplex.set_index_dtype('int32' if self._compact else 'int64')
+        self._temporal=None
+
+    def _compact_layer(self,layer,graph=None):
+        year_type='int16_t' if self._compact else 'int'
+        if graph is None:
+            graph=getattr(self,layer)
+        if layer=='citation':
+            graph.vertex_properties['year']=_converted_property(graph.vertex_properties['year'],year_type,graph.new_vertex_property)
+            if self._compact and 'year' in graph.edge_properties:
+                del graph.edge_properties['year']
+            elif not self._compact and 'year' not in graph.edge_properties:
+                years=self.citation_years()
+                graph.edge_properties['year']=graph.new_edge_property('int')
+                graph.edge_properties['year'].a[:len(years)]=years
+        else:
+            graph.edge_properties['first_year_collaborated']=_converted_property(graph.edge_properties['first_year_collaborated'],year_type,graph.new_edge_property)
+
+################################################################
+    ##
+    #Function to report the memory used by the multiplex
+    def memory_report(self):
+        '''Returns an ordered dict of the bytes used by the parts of the multiplex: the graph of each layer (estimated from graph-tool's adjacency lists), each of its property maps, the ID indices, the paper-author incidence, the temporal index and the incremental counts, if any, and their 'total'. Layers of a loaded snapshot that are not built yet are left out; memory-mapped arrays count with their full size.'''
+        report=collections.OrderedDict()
+        for layer in ('citation','collab'):
+            if layer in self.__dict__:
+                graph=getattr(self,layer)
+                report[layer+'.graph']=_graph_nbytes(graph)
+                for name,prop in sorted(graph.vertex_properties.items()):
+                    report[layer+'.vertex_properties.'+name]=_property_nbytes(prop,graph.vertices)
+                for name,prop in sorted(graph.edge_properties.items()):
+                    report[layer+'.edge_properties.'+name]=_property_nbytes(prop,graph.edges)
+            report[layer+'.ids']=self._layer_ids(layer).nbytes()
+        report['incidence']=self._multiplex.nbytes()
+        if self._temporal is not None:
+            report['temporal_index']=self._temporal.nbytes()
+        if self._incremental_counts is not None:
+            report['incremental_counts']=self._incremental_counts.nbytes
+        report['total']=sum(report.values())
+        return report
+
+################################################################
+    ##
+    #Save the multiplex structure as a memory-mappable snapshot
+    def save_snapshot(self,directory):
+        '''Write the multiplex to directory in the columnar snapshot format (see snapshot.py).'''
+        snapshot.save_snapshot(self,directory)
+
+################################################################
+    ##
+    #Load a snapshot of the multiplex structure
+    def load_snapshot(self,directory):
+        '''Load a snapshot written by save_snapshot. Columns are memory-mapped; the layer graphs and ID tables are built on first access.'''
+        self._snapshot = snapshot.Snapshot(directory)
+        for attribute in self._snapshot.lazy_attributes:
+            self.__dict__.pop(attribute,None)
+        self._multiplex = self._snapshot.incidence()
+        if self._compact:
+            self._multiplex.set_index_dtype('int32')
+        self._temporal = None
+        self.version+=1
+        self._snapshot_version = self.version
+        if self._result_cache is not None and self._result_cache_on_disk:
+            self._attach_result_cache_directory()
+
+        if self._incremental_counts is not None:
+            self.enable_incremental_citation_counts()
+
+    def _snapshot_layer(self,layer):
+        #whether layer is as saved in the loaded snapshot: its graph is not built yet, or nothing changed since loading
+        return self._snapshot is not None and (layer not in self.__dict__ or self.version==self._snapshot_version)
+
+    def _num_vertices(self,layer):
+        #without building the graph of a loaded snapshot
+        if self._snapshot is not None and layer not in self.__dict__:
+            return self._snapshot.manifest['layers'][layer]['n_vertices']
+        return getattr(self,layer).num_vertices()
+
+    def _paper_years(self):
+        #publication years by paper index, without building the citation graph of a loaded snapshot
+        if self._snapshot is not None and 'citation' not in self.__dict__:
+            return self._snapshot.column('citation_vp_year')
+        return self.citation.vertex_properties['year'].a
+
+################################################################
+    ##
+    #Function to share the multiplex read-only with worker processes
+    def export_shared(self,directory=None):
+        '''Freezes the multiplex into a snapshot (with the CSR arrays of both layers) in a new directory in directory (default: /dev/shm, if it exists) and returns its SharedMultiplex handle. Workers attach to it without copying the arrays; call release() on the handle when done.'''
+        if directory is None:
+            directory=parallel.shared_memory_dir()
+        directory=tempfile.mkdtemp(prefix='sgt_shared_',dir=directory)
+        snapshot.save_snapshot(self,directory,with_csr=True)
+        return SharedMultiplex(directory,owner=True)
+
+    def __getattr__(self,name):
+        #only called for attributes that are not set, i.e. the not yet materialized parts of a loaded snapshot
+        loaded_snapshot = self.__dict__.get('_snapshot')
+        if loaded_snapshot is None or name not in loaded_snapshot.lazy_attributes:
+            raise AttributeError(name)
+        #threads (e.g. of the query server) build every part once, and only see it when it is complete
+        with _materialize_lock:
+            if name in self.__dict__:
+                return self.__dict__[name]
+            value = loaded_snapshot.materialize(name)
+            if self._compact and name in ('citation','collab'):
+                self._compact_layer(name,value)
+            setattr(self,name,value)
+        return value
     
         
                         
+class SharedMultiplex(object):
+    'Handle of a multiplex frozen by export_shared; it pickles as its directory, so it is cheap to pass to worker processes'
+
+    def __init__(self,directory,owner=False):
+        self.directory = directory
+        #only the exporting process removes the snapshot, not its forked children
+        self._owner_pid = os.getpid() if owner else None
+
+    def attach(self):
+        '''Returns the multiplex of the shared snapshot, loaded once per process. Its columns are memory-mapped read-only, so all processes share one copy: ID lookups, vertex_ids, vertex_indices, papers_by_many, authors_of_many, socially_biased_citations and author_metrics run on them directly. Methods that return vertex objects or property maps build the layer graph in the calling process on first use. Changes stay local to the process.'''
+        multiplex = _attached_multiplexes.get(self.directory)
+        if multiplex is None:
+            multiplex = PaperAuthorMultiplex()
+            multiplex.load_snapshot(self.directory)
+            _attached_multiplexes[self.directory] = multiplex
+        return multiplex
+
+    def release(self):
+        '''Detach in this process; in the exporting process, also remove the shared snapshot.'''
+        _attached_multiplexes.pop(self.directory,None)
+        if self._owner_pid==os.getpid():
+            shutil.rmtree(self.directory,ignore_errors=True)
+            self._owner_pid = None
+
+    def __getstate__(self):
+        return {'directory':self.directory,'_owner_pid':None}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.release()
+        return False
+
+_attached_multiplexes = {} #directory -> multiplex attached in this process
+_materialize_lock = threading.RLock() #guards building the parts of loaded snapshots
+
+
 ##################################################################################################################
 #Define module-wide functions
 
+def _property_array(prop):
+    #values of a numeric property map by vertex index; arrays are taken as they are
+    if hasattr(prop,'a'):
+        return prop.a
+    return numpy.asarray(prop)
+
+def _graphml_id_index(graph):
+    #id index of a graph read from graphml; the ids are only kept in the index, not as a string property
+    index = id_index.IdIndex([graph.vertex_properties['_graphml_vertex_id'][v] for v in graph.vertices()])
+    del graph.vertex_properties['_graphml_vertex_id']
+    return index
+
+def _converted_property(prop,value_type,new_property):
+    #copy of a numeric property map with another value type
+    values=prop.a
+    if value_type=='int16_t' and len(values)>0 and (values.min()<-2**15 or values.max()>=2**15):
+        raise CompactModeError('year out of the int16 range')
+    converted=new_property(value_type)
+    converted.a[:len(values)]=values
+    return converted
+
+def _graph_nbytes(graph):
+    #graph-tool keeps (size_t, vector) per vertex and a (neighbour, edge index) pair of size_t at both ends of every edge
+    return 32*graph.num_vertices()+32*graph.num_edges()
+
+def _property_nbytes(prop,keys):
+    #numeric property maps by their array; strings, vectors and objects estimated from their lengths
+    if prop.a is not None:
+        return prop.a.nbytes
+    n=0
+    for key in keys():
+        value=prop[key]
+        n+=32+(8*len(value) if hasattr(value,'__len__') else 0)
+    return n
+
+def _as_id_index(ids,graph):
+    #ids pickled before the id index was introduced are dicts, and the graphs carry them as string property
+    if '_graphml_vertex_id' in graph.vertex_properties:
+        del graph.vertex_properties['_graphml_vertex_id']
+    if isinstance(ids,dict):
+        return id_index.IdIndex.from_dict(ids)
+    return ids
+
 ################################################################
     ##
 #Function to check whether multiplex is one-to-one
@@ -720,20 +1384,16 @@ def check_one_to_one(multiplex):
     print '#####################'
     
     multiplex_citation_is_OneToOne=True
-    for v in multiplex.citation.vertices():
-        if len(multiplex._multiplex_citation[v].keys())>1:
-            multiplex_citation_is_OneToOne=False
-            print 'citation->collaboration is NOT one-to-one!'
-            break
+    if len(multiplex._multiplex.paper_degrees())>0 and multiplex._multiplex.paper_degrees().max()>1:
+        multiplex_citation_is_OneToOne=False
+        print 'citation->collaboration is NOT one-to-one!'
     if multiplex_citation_is_OneToOne==True:
         print 'citation->collaboration is one-to-one.'
             
     multiplex_collab_is_OneToOne=True
-    for v in multiplex.collab.vertices():
-        if len(multiplex._multiplex_collab[v].keys())>1:
-            multiplex_collab_is_OneToOne=False
-            print 'collaboration->citation is NOT one-to-one!'
-            break
+    if len(multiplex._multiplex.author_degrees())>0 and multiplex._multiplex.author_degrees().max()>1:
+        multiplex_collab_is_OneToOne=False
+        print 'collaboration->citation is NOT one-to-one!'
     if multiplex_collab_is_OneToOne==True:
         print 'collaboration->citation is one-to-one.'
     print '#####################'
@@ -756,3 +1416,22 @@ class CitationExistsAlreadyError(Exception):
 
 class NotOneToOneError(Exception):
     pass
+
+class UnknownDirectionError(Exception):
+    pass
+
+class UnknownAggregationError(Exception):
+    pass
+
+class UnknownLayerError(Exception):
+    pass
+
+class UnknownOutputError(Exception):
+    pass
+
+class CompactModeError(Exception):
+    pass
+
+
+result_cache.cache_methods(PaperAuthorMultiplex,['socially_biased_citations','citation_success','distribution_authors','distribution_papers','degree_property_map','author_metrics'])
+instrumentation.instrument_methods(PaperAuthorMultiplex)
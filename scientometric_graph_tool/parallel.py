@@ -0,0 +1,92 @@
+#This module implements multi-process execution of the multiplex kernels.
+#Input arrays are written once to memory-mapped files (in shared memory, if available) that all workers map read-only,
+#so they are neither pickled to the workers nor copied per worker.
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import numpy
+import array_utils
+import multiplex_kernels
+
+SOCIALLY_BIASED_ARRAYS = ('citation_offsets','citation_targets','paper_years','author_offsets','authors','collab_offsets','collab_neighbours','collab_years')
+
+################################################################
+    ##
+#Function to write arrays to memory-mappable files
+def share_arrays(arrays,directory=None):
+    '''Writes the arrays of dict arrays to .npy files in directory (a new directory in shared memory by default). Returns dict name -> path.'''
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix='scientometric_',dir=shared_memory_dir())
+    paths = {}
+    for name,array in arrays.iteritems():
+        paths[name] = os.path.join(directory,name+'.npy')
+        numpy.save(paths[name],numpy.ascontiguousarray(array))
+    return paths
+
+################################################################
+    ##
+#Function to map shared arrays into the current process
+def attach_arrays(paths):
+    '''Returns dict name -> read-only memory-mapped array for the files written by share_arrays.'''
+    arrays = {}
+    for name,path in paths.iteritems():
+        arrays[name] = numpy.load(path,mmap_mode='r')
+    return arrays
+
+################################################################
+    ##
+#Function to count socially biased citations in parallel
+def sharded_socially_biased_counts(arrays,n_authors,processes=None,n_shards=None,directory=None):
+    '''Runs multiplex_kernels.socially_biased_counts on shards of consecutive papers in a pool of processes. arrays is a dict with the keys in SOCIALLY_BIASED_ARRAYS. Returns the merged counts array.'''
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if n_shards is None:
+        n_shards = 4*processes #more shards than workers, to balance uneven papers
+
+    n_papers = len(arrays['citation_offsets'])-1
+    work = numpy.diff(arrays['citation_offsets'])+numpy.diff(arrays['author_offsets'])
+    bounds = array_utils.work_blocks(work,max(int(work.sum())//n_shards,1))
+    shards = zip(bounds[:-1],bounds[1:])
+    del work
+
+    own_directory = directory is None
+    paths = share_arrays(dict((name,arrays[name]) for name in SOCIALLY_BIASED_ARRAYS),directory)
+    counts = numpy.zeros((n_papers,3),dtype='int64')
+    pool = multiprocessing.Pool(processes,_attach_worker,(paths,n_authors))
+    try:
+        for lo,hi,shard_counts in pool.imap_unordered(_socially_biased_shard,shards):
+            counts[lo:hi] = shard_counts
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        if own_directory:
+            shutil.rmtree(os.path.dirname(paths.values()[0]),ignore_errors=True)
+    return counts
+
+################################################################
+    ##
+#Function to find the shared memory file system
+def shared_memory_dir():
+    '''Returns /dev/shm if it exists, else None (the system temp directory).'''
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return None
+
+#################################################
+#helper functions
+
+_worker_state = {}
+
+def _attach_worker(paths,n_authors):
+    _worker_state['arrays'] = attach_arrays(paths)
+    _worker_state['n_authors'] = n_authors
+
+def _socially_biased_shard(shard):
+    lo,hi = shard
+    arrays = _worker_state['arrays']
+    counts = multiplex_kernels.socially_biased_counts(*[arrays[name] for name in SOCIALLY_BIASED_ARRAYS],
+                                                      n_authors=_worker_state['n_authors'],first_paper=lo,last_paper=hi)
+    return lo,hi,counts
@@ -0,0 +1,208 @@
+#This module implements a cache of derived results (statistics, distributions, degree maps) of networks that are not
+#changed between calls. Networks count their mutations in a version counter; cached results are kept by (method,
+#arguments) in a size-limited LRU and dropped as soon as the version changes. Results computed on an unchanged
+#snapshot can also be kept as pickle files next to the snapshot, for later sessions. Results are handed out as
+#copies, so callers can change them without changing the cache.
+
+import collections
+import copy
+import cPickle
+import hashlib
+import logging
+import numbers
+import os
+import numpy
+import instrumentation
+
+class ResultCache(object):
+    'LRU cache of method results of one network version, with an optional on-disk tier'
+
+    def __init__(self,max_entries=32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict() #key -> result, least recently used first
+        self._version = None
+        self._directory = None
+        self._disk_version = None
+
+################################################################
+    ##
+    #Functions to look up and store results
+    def get(self,key,version):
+        '''Returns a copy of the result stored for key at version; raises KeyError if there is none.'''
+        self._check_version(version)
+        if key in self._entries:
+            value = self._entries.pop(key)
+            self._entries[key] = value
+            self.hits += 1
+            instrumentation.count('result_cache.hits')
+            return _copied(value)
+        if self._directory is not None and version==self._disk_version:
+            try:
+                with open(self._file(key),'rb') as f:
+                    value = cPickle.load(f)
+            except (IOError,EOFError,cPickle.UnpicklingError):
+                pass
+            else:
+                self._store(key,value)
+                self.hits += 1
+                instrumentation.count('result_cache.disk_hits')
+                return _copied(value)
+        self.misses += 1
+        instrumentation.count('result_cache.misses')
+        raise KeyError(key)
+
+    def put(self,key,version,value):
+        '''Store (a copy of) the result of key at version.'''
+        self._check_version(version)
+        self._store(key,_copied(value))
+        if self._directory is not None and version==self._disk_version and _picklable_data(value):
+            path = self._file(key)
+            try:
+                with open(path+'.tmp','wb') as f:
+                    cPickle.dump(value,f,cPickle.HIGHEST_PROTOCOL)
+                os.rename(path+'.tmp',path)
+            except (IOError,OSError) as error:
+                instrumentation.message('result cache: cannot write to '+self._directory+' ('+str(error)+'), disk tier disabled',logging.WARNING)
+                self._directory = None
+
+    def clear(self):
+        '''Drop all results kept in memory.'''
+        self._entries.clear()
+
+################################################################
+    ##
+    #Function to keep results on disk
+    def attach_directory(self,directory,version):
+        '''Keep the results computed at version also as pickle files in directory.'''
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        except OSError as error:
+            instrumentation.message('result cache: cannot use '+directory+' ('+str(error)+'), disk tier disabled',logging.WARNING)
+            return
+        self._directory = directory
+        self._disk_version = version
+
+    def detach_directory(self):
+        '''Stop keeping results on disk; the files are kept.'''
+        self._directory = None
+        self._disk_version = None
+
+################################################################
+    def _check_version(self,version):
+        #the network changed since the results were computed
+        if version!=self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _store(self,key,value):
+        self._entries[key] = value
+        while len(self._entries)>self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _file(self,key):
+        return os.path.join(self._directory,hashlib.sha1(repr(key)).hexdigest()+'.pickle')
+
+
+################################################################
+    ##
+#Function to cache the results of methods of a class
+def cache_methods(cls,names):
+    '''Wraps the methods names of cls, so that their results are taken from the ResultCache of the instance (attribute _result_cache, caching is off if it is None) while its attribute version is unchanged.'''
+    for name in names:
+        setattr(cls,name,_cached(cls.__dict__[name],name))
+    return cls
+
+
+#################################################
+#helper functions
+
+def _cached(method,name):
+    def wrapper(self,*args,**kwargs):
+        cache = self.__dict__.get('_result_cache')
+        if cache is None:
+            return method(self,*args,**kwargs)
+        try:
+            key,args,kwargs = _call_key(name,args,kwargs)
+        except _Uncacheable:
+            return method(self,*args,**kwargs)
+        version = self.version
+        try:
+            return cache.get(key,version)
+        except KeyError:
+            pass
+        result = method(self,*args,**kwargs)
+        cache.put(key,version,result)
+        return result
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+def _call_key(name,args,kwargs):
+    #key of a call, and the arguments to pass on (iterators are consumed by the key, so they are passed on as lists)
+    frozen = [_freeze(value) for value in args]
+    frozen_kwargs = dict((keyword,_freeze(value)) for keyword,value in kwargs.iteritems())
+    key = (name,tuple(k for k,v in frozen),tuple(sorted((keyword,k) for keyword,(k,v) in frozen_kwargs.iteritems())))
+    return key,[v for k,v in frozen],dict((keyword,v) for keyword,(k,v) in frozen_kwargs.iteritems())
+
+def _freeze(value):
+    if value is None or isinstance(value,(bool,basestring)):
+        return value,value
+    if isinstance(value,numbers.Integral):
+        return int(value),value
+    if isinstance(value,numbers.Real):
+        return float(value),value
+    if isinstance(value,numpy.ndarray):
+        return _array_key(value),value
+    if hasattr(value,'a'):
+        #property map, keyed by its values
+        if not isinstance(value.a,numpy.ndarray):
+            raise _Uncacheable()
+        return ('property',)+_array_key(value.a),value
+    if hasattr(value,'__int__'):
+        #vertex object
+        return ('vertex',int(value)),value
+    if isinstance(value,dict) or callable(value) or not hasattr(value,'__iter__'):
+        raise _Uncacheable()
+    items = value if isinstance(value,(list,tuple)) else list(value)
+    if all(_is_index(item) for item in items):
+        return ('indices',)+_array_key(numpy.fromiter((int(item) for item in items),dtype='int64',count=len(items))),items
+    return ('items',tuple(_freeze(item)[0] for item in items)),items
+
+def _is_index(item):
+    return isinstance(item,numbers.Integral) or (hasattr(item,'__int__') and not isinstance(item,(numbers.Real,basestring)))
+
+def _array_key(array):
+    array = numpy.ascontiguousarray(array)
+    return ('array',array.dtype.str,array.shape,hashlib.sha1(array.view('uint8') if array.ndim>0 else array.tostring()).hexdigest())
+
+def _copied(value):
+    #containers are copied down to their items; arrays, property maps and sets by their own copy method
+    if isinstance(value,dict):
+        value = copy.copy(value)
+        for key,item in value.iteritems():
+            value[key] = _copied(item)
+        return value
+    if isinstance(value,list):
+        return [_copied(item) for item in value]
+    if type(value) is tuple:
+        return tuple(_copied(item) for item in value)
+    if hasattr(value,'copy') and not isinstance(value,basestring):
+        return value.copy()
+    return value
+
+def _picklable_data(value):
+    #only plain data goes to disk; property maps would drag their whole graph along
+    if value is None or isinstance(value,(bool,basestring,numbers.Number,numpy.ndarray)):
+        return True
+    if isinstance(value,(list,tuple)):
+        return all(_picklable_data(item) for item in value)
+    if isinstance(value,dict):
+        return all(_picklable_data(item) for item in value.itervalues())
+    return False
+
+
+class _Uncacheable(Exception):
+    pass
@@ -0,0 +1,374 @@
+#This module implements a resident query server for a PaperAuthorMultiplex. The multiplex is loaded once (from a
+#snapshot or a pickle) and answers batches of queries by paper and author ID over a Unix socket or a localhost TCP
+#port, so analysis jobs do not pay the load time. Messages are JSON, preceded by their length; connections are
+#served by threads, the socially biased citation counts are computed once by a pool of worker processes.
+#
+#usage: python -m scientometric_graph_tool.server (--snapshot DIR | --pickle FILE) (--socket PATH | --port PORT)
+
+import argparse
+import json
+import os
+import socket
+import SocketServer
+import stat
+import struct
+import threading
+import numpy
+import instrumentation
+import multiplex_structures
+
+HEADER = struct.Struct('!I') #length of the JSON body that follows
+MAX_MESSAGE_BYTES = 64*2**20 #longest batch of queries a server reads; the connection is closed after a longer one
+LAYERS = ('citation','collab')
+DEGREES = ('in','out','total','multiplex') #'multiplex': number of authors of a paper, number of papers of an author
+
+class QueryServer(object):
+    'Answers batches of queries on one PaperAuthorMultiplex, on a Unix socket (address is a path) or TCP (address is (host, port))'
+
+    def __init__(self,multiplex,address,processes=1):
+        self.multiplex = multiplex
+        self.processes = processes
+        self._lock = threading.Lock() #one batch at a time
+        self._derived_lock = threading.Lock() #guards the memo of derived arrays only
+        self._derived = {}
+        self._computing = {}
+        self._queries = {'indices':self._indices,'ids':self._ids,'papers_by':self._papers_by,'authors_of':self._authors_of,
+                         'multiplex_neighbours':self._multiplex_neighbours,'degrees':self._degrees,
+                         'socially_biased_citations':self._socially_biased_citations,'info':self._info}
+        #build the ID tables of a loaded snapshot and merge pending links before the first query
+        for layer in LAYERS:
+            multiplex._layer_ids(layer)
+        multiplex._multiplex.flush()
+
+        if isinstance(address,basestring):
+            if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+                os.remove(address)
+            self._server = _UnixServer(address,_Handler)
+        else:
+            self._server = _TCPServer(tuple(address),_Handler)
+        self._server.query_server = self
+        self.address = self._server.server_address
+
+################################################################
+    ##
+    #Functions to run the server
+    def serve_forever(self):
+        '''Answer connections until shutdown is called (from another thread).'''
+        self._server.serve_forever()
+
+    def shutdown(self):
+        '''Stop serve_forever.'''
+        self._server.shutdown()
+
+    def close(self):
+        '''Close the listening socket and remove the Unix socket file.'''
+        self._server.server_close()
+        if isinstance(self.address,basestring) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def precompute(self):
+        '''Compute the socially biased citation counts and degrees now instead of at the first query that needs them.'''
+        self._socially_biased_counts()
+        for layer in LAYERS:
+            for deg in DEGREES:
+                self._degree_array(layer,deg)
+
+################################################################
+    ##
+    #Function to answer a batch of queries
+    def answer(self,queries):
+        '''Returns the responses to the list of queries (dicts with key 'op' and its arguments) in order: {'result': ...} or {'error': exception name, 'message': ...}. Queries are answered one batch at a time; derived arrays (counts, degrees) are computed before, so other batches are answered meanwhile.'''
+        for query in queries:
+            self._prepare(query)
+        responses = []
+        with self._lock:
+            for query in queries:
+                try:
+                    if not isinstance(query,dict):
+                        raise ValueError('a query is a JSON object')
+                    if query.get('op') not in self._queries:
+                        raise ValueError('unknown op '+repr(query.get('op')))
+                    responses.append({'result':self._queries[query['op']](query)})
+                except Exception as error:
+                    responses.append({'error':type(error).__name__,'message':str(error)})
+        return responses
+
+################################################################
+    ##
+    #Queries; ids are paper IDs in layer 'citation' and author IDs in layer 'collab', unknown IDs give null
+    def _indices(self,query):
+        vertices,found = self._lookup(query['layer'],query['ids'])
+        return _by_id(vertices[found].tolist(),found)
+
+    def _ids(self,query):
+        index = self.multiplex._layer_ids(query['layer'])
+        return index.ids(numpy.asarray(query['indices'],dtype='int64'))
+
+    def _papers_by(self,query):
+        authors,found = self._lookup('collab',query['ids'])
+        offsets,papers = self.multiplex.papers_by_many(authors[found])
+        return self._rows('citation',offsets,papers,found)
+
+    def _authors_of(self,query):
+        papers,found = self._lookup('citation',query['ids'])
+        offsets,authors = self.multiplex.authors_of_many(papers[found])
+        return self._rows('collab',offsets,authors,found)
+
+    def _multiplex_neighbours(self,query):
+        #vertices of the layer linked over one vertex of the other layer, as multiplex_neighbours
+        layer = query['layer']
+        vertices,found = self._lookup(layer,query['ids'])
+        if layer=='collab':
+            offsets,papers = self.multiplex.papers_by_many(vertices[found])
+            inner_offsets,neighbours = self.multiplex.authors_of_many(papers)
+        else:
+            offsets,authors = self.multiplex.authors_of_many(vertices[found])
+            inner_offsets,neighbours = self.multiplex.papers_by_many(authors)
+        return self._rows(layer,inner_offsets[offsets],neighbours,found)
+
+    def _degrees(self,query):
+        vertices,found = self._lookup(query['layer'],query['ids'])
+        return _by_id(self._degree_array(query['layer'],query['deg'])[vertices[found]].tolist(),found)
+
+    def _socially_biased_citations(self,query):
+        papers,found = self._lookup('citation',query['ids'])
+        return _by_id(self._socially_biased_counts()[papers[found]].tolist(),found)
+
+    def _info(self,query):
+        return {'papers':self.multiplex.citation.num_vertices(),'authors':self.multiplex.collab.num_vertices(),
+                'citations':self.multiplex.citation.num_edges(),'collaborations':self.multiplex.collab.num_edges()}
+
+################################################################
+    def _lookup(self,layer,ids):
+        index = self.multiplex._layer_ids(layer)
+        ids = [vertex_id.encode('utf-8') if isinstance(vertex_id,unicode) else vertex_id for vertex_id in ids]
+        vertices = index.lookup(ids) if ids else numpy.zeros(0,dtype='int64')
+        return vertices,vertices>=0
+
+    def _rows(self,layer,offsets,vertices,found):
+        #ID lists of the CSR rows, one per found ID
+        index = self.multiplex._layer_ids(layer)
+        ids = index.ids(vertices)
+        offsets = offsets.tolist()
+        return _by_id([ids[a:b] for a,b in zip(offsets[:-1],offsets[1:])],found)
+
+    def _prepare(self,query):
+        #compute the derived array a query needs outside the request lock; errors are reported when it is answered
+        try:
+            if query.get('op')=='socially_biased_citations':
+                self._socially_biased_counts()
+            elif query.get('op')=='degrees':
+                self._degree_array(query['layer'],query['deg'])
+        except Exception:
+            pass
+
+    def _memo(self,key,compute):
+        #compute a derived array once; batches that need the same array wait for it, the others do not
+        with self._derived_lock:
+            if key in self._derived:
+                return self._derived[key]
+            computing = self._computing.setdefault(key,threading.Lock())
+        with computing:
+            with self._derived_lock:
+                if key in self._derived:
+                    return self._derived[key]
+            value = compute()
+            with self._derived_lock:
+                self._derived[key] = value
+                del self._computing[key]
+        return value
+
+    def _degree_array(self,layer,deg):
+        if deg not in DEGREES:
+            raise ValueError('unknown degree '+repr(deg))
+        if layer not in LAYERS:
+            raise multiplex_structures.UnknownLayerError(layer)
+        return self._memo(('degrees',layer,deg),lambda: self._compute_degrees(layer,deg))
+
+    def _compute_degrees(self,layer,deg):
+        if deg!='multiplex':
+            return self.multiplex.degree_property_map(layer,deg).a.copy()
+        elif layer=='citation':
+            return self.multiplex._multiplex.paper_degrees(self.multiplex._num_vertices('citation'))
+        return self.multiplex._multiplex.author_degrees(self.multiplex._num_vertices('collab'))
+
+    def _socially_biased_counts(self):
+        #[citations, self citations, socially biased citations] of every paper
+        return self._memo('socially_biased',self._compute_socially_biased_counts)
+
+    def _compute_socially_biased_counts(self):
+        with instrumentation.timer('server.socially_biased_citations'):
+            counts = self.multiplex.socially_biased_citations(as_arrays=True,processes=self.processes)
+        return numpy.column_stack(counts)
+
+
+class QueryClient(object):
+    'Connection to a QueryServer'
+
+    def __init__(self,address,timeout=None):
+        if isinstance(address,basestring):
+            self._socket = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        else:
+            address = tuple(address)
+            self._socket = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(address)
+        self._rfile = self._socket.makefile('rb')
+        self._wfile = self._socket.makefile('wb',0)
+
+################################################################
+    ##
+    #Function to send a batch of queries
+    def batch(self,queries):
+        '''Sends the list of queries (dicts with key 'op' and its arguments, see Documentation.md) in one message and returns the list of their results. Raises QueryError if a query failed.'''
+        _write_message(self._wfile,queries)
+        responses = _read_message(self._rfile)
+        if responses is None:
+            raise QueryError('connection closed by the server')
+        for response in responses:
+            if 'error' in response:
+                raise QueryError(response['error']+': '+response['message'])
+        return [response['result'] for response in responses]
+
+################################################################
+    ##
+    #Functions to send a single query
+    def indices(self,ids,layer):
+        '''Returns the vertex indices of the IDs in layer ('citation' or 'collab'), None for unknown IDs.'''
+        return self.batch([{'op':'indices','ids':ids,'layer':layer}])[0]
+
+    def ids(self,indices,layer):
+        '''Returns the IDs of the vertex indices of layer.'''
+        return self.batch([{'op':'ids','indices':indices,'layer':layer}])[0]
+
+    def papers_by(self,author_ids):
+        '''Returns the list of paper IDs of every author ID, None for unknown authors.'''
+        return self.batch([{'op':'papers_by','ids':author_ids}])[0]
+
+    def authors_of(self,paper_ids):
+        '''Returns the list of author IDs of every paper ID, None for unknown papers.'''
+        return self.batch([{'op':'authors_of','ids':paper_ids}])[0]
+
+    def multiplex_neighbours(self,ids,layer):
+        '''Returns the list of IDs of the multiplex neighbours in layer of every ID of layer, None for unknown IDs.'''
+        return self.batch([{'op':'multiplex_neighbours','ids':ids,'layer':layer}])[0]
+
+    def degrees(self,ids,layer,deg):
+        '''Returns the degree deg ('in', 'out', 'total' or 'multiplex') of every ID of layer, None for unknown IDs.'''
+        return self.batch([{'op':'degrees','ids':ids,'layer':layer,'deg':deg}])[0]
+
+    def socially_biased_citations(self,paper_ids):
+        '''Returns [citations, self citations, socially biased citations] of every paper ID, None for unknown papers.'''
+        return self.batch([{'op':'socially_biased_citations','ids':paper_ids}])[0]
+
+    def info(self):
+        '''Returns the numbers of papers, authors, citations and collaborations.'''
+        return self.batch([{'op':'info'}])[0]
+
+    def close(self):
+        self._rfile.close()
+        self._wfile.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.close()
+        return False
+
+
+################################################################
+    ##
+#Function to run a server from the command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve batched queries on a multiplex that is loaded once.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--snapshot',default=None,help='directory written by save_snapshot')
+    source.add_argument('--pickle',default=None,help='file written by pickle')
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument('--socket',default=None,help='path of the Unix socket')
+    address.add_argument('--port',type=int,default=None,help='TCP port on --host')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--processes',type=int,default=1,help='worker processes for the socially biased citation counts (0: all cores)')
+    parser.add_argument('--precompute',action='store_true',help='compute counts and degrees before serving')
+    args = parser.parse_args(argv)
+
+    instrumentation.log_to()
+    multiplex = multiplex_structures.PaperAuthorMultiplex()
+    if args.snapshot is not None:
+        multiplex.load_snapshot(args.snapshot)
+    else:
+        multiplex.unpickle(args.pickle)
+    server = QueryServer(multiplex,args.socket if args.socket is not None else (args.host,args.port),args.processes or None)
+    if args.precompute:
+        server.precompute()
+    instrumentation.message('serving on '+str(server.address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+#################################################
+#helper functions
+
+class _Handler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                queries = _read_message(self.rfile,MAX_MESSAGE_BYTES)
+            except ValueError as error:
+                _write_message(self.wfile,[{'error':'ValueError','message':str(error)}])
+                return
+            if queries is None:
+                return
+            if not isinstance(queries,list):
+                queries = [queries]
+            instrumentation.count('server.queries',len(queries))
+            with instrumentation.timer('server.batch'):
+                responses = self.server.query_server.answer(queries)
+            _write_message(self.wfile,responses)
+
+class _UnixServer(SocketServer.ThreadingMixIn,SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(SocketServer.ThreadingMixIn,SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def _read_message(f,max_length=None):
+    #None at the end of the stream
+    header = f.read(HEADER.size)
+    if len(header)<HEADER.size:
+        return None
+    length, = HEADER.unpack(header)
+    if max_length is not None and length>max_length:
+        raise ValueError('message of %d bytes is longer than %d bytes'%(length,max_length))
+    body = f.read(length)
+    if len(body)<length:
+        return None
+    return json.loads(body)
+
+def _write_message(f,value):
+    body = json.dumps(value,separators=(',',':'))
+    f.write(HEADER.pack(len(body))+body)
+
+def _by_id(values,found):
+    #values of the found IDs, None for the others
+    result = [None]*len(found)
+    for i,value in zip(numpy.flatnonzero(found).tolist(),values):
+        result[i] = value
+    return result
+
+
+#define Error Classes
+
+class QueryError(Exception):
+    pass
+
+
+if __name__=='__main__':
+    main()
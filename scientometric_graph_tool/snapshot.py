@@ -0,0 +1,184 @@
+#This module implements a columnar on-disk format for multiplexes: a directory with one .npy file per column
+#(edge lists, numeric vertex and edge properties, ID string tables, CSR paper-author incidence) and a manifest.
+#Loading memory-maps the columns, so only the columns that are actually used get read from disk.
+
+import json
+import os
+import shutil
+import uuid
+import numpy
+import graph_tool.all as gt
+import array_utils
+import incidence
+import id_index
+
+FORMAT_VERSION = 2 #version 1 did not store the hash tables of the id indices
+MANIFEST = 'manifest.json'
+RESULT_CACHE = 'result_cache' #subdirectory with cached results of methods, see result_cache.py
+LAYERS = (('citation',True,'_citation_graphml_vertex_id_to_gt_id'),('collab',False,'_collab_graphml_vertex_id_to_gt_id'))
+
+class Snapshot(object):
+    'Memory-mapped columns of a multiplex snapshot directory'
+
+    def __init__(self,directory):
+        self.directory = directory
+        with open(os.path.join(directory,MANIFEST),'r') as f:
+            self.manifest = json.load(f)
+        if self.manifest['format'] not in (1,FORMAT_VERSION):
+            raise SnapshotFormatError('unsupported snapshot format '+str(self.manifest['format']))
+        self._columns = {}
+        self.lazy_attributes = {}
+        for layer,directed,id_attribute in LAYERS:
+            self.lazy_attributes[layer] = ('graph',layer)
+            self.lazy_attributes[id_attribute] = ('id_map',layer)
+
+################################################################
+    ##
+    #Function to access a single column
+    def column(self,name):
+        '''Returns the read-only memory-mapped array of column name.'''
+        if name not in self._columns:
+            self._columns[name] = numpy.load(os.path.join(self.directory,name+'.npy'),mmap_mode='r')
+        return self._columns[name]
+
+################################################################
+    ##
+    #Functions to identify the saved state
+    def token(self):
+        '''Returns a string that changes whenever the snapshot is written again.'''
+        if 'id' in self.manifest:
+            return str(self.manifest['id'])
+        manifest = os.stat(os.path.join(self.directory,MANIFEST))
+        return 'mtime%d_%d'%(int(manifest.st_mtime*1000),manifest.st_size)
+
+    def result_cache_directory(self):
+        '''Returns the directory for cached results of the multiplex as saved.'''
+        return os.path.join(self.directory,RESULT_CACHE,self.token())
+
+################################################################
+    ##
+    #Function to build a multiplex attribute from the columns
+    def materialize(self,attribute):
+        '''Returns the value of the lazily loaded multiplex attribute (a layer graph or an ID table).'''
+        build,layer = self.lazy_attributes[attribute]
+        return getattr(self,build)(layer)
+
+    def id_map(self,layer):
+        '''Returns the IdIndex of layer, backed by the memory-mapped columns.'''
+        table = None
+        if self.manifest['format']>=2:
+            table = self.column(layer+'_id_table')
+        return id_index.IdIndex.from_arrays(self.column(layer+'_ids'),self.column(layer+'_id_offsets'),table)
+
+    def graph(self,layer):
+        '''Returns the graph-tool graph of layer, with its numeric properties.'''
+        info = self.manifest['layers'][layer]
+        graph = gt.Graph(directed=info['directed'])
+        if info['n_vertices']>0:
+            graph.add_vertex(info['n_vertices'])
+        if info['n_edges']>0:
+            graph.add_edge_list(numpy.asarray(self.column(layer+'_edges')))
+
+        for name,value_type in info['vertex_properties'].iteritems():
+            graph.vertex_properties[str(name)] = graph.new_vertex_property(str(value_type))
+            graph.vertex_properties[str(name)].a[:] = self.column(layer+'_vp_'+name)
+        for name,value_type in info['edge_properties'].iteritems():
+            graph.edge_properties[str(name)] = graph.new_edge_property(str(value_type))
+            graph.edge_properties[str(name)].a[:] = self.column(layer+'_ep_'+name)
+        return graph
+
+    def csr(self,layer):
+        '''Returns the memory-mapped CSR arrays of layer saved with with_csr=True (citation: offsets, citing papers; collab: offsets, collaborators, first_year_collaborated), None if there are none.'''
+        if not self.manifest.get('csr',False):
+            return None
+        if layer=='citation':
+            return self.column('citation_csr_offsets'),self.column('citation_csr_targets')
+        return self.column('collab_csr_offsets'),self.column('collab_csr_neighbours'),self.column('collab_csr_years')
+
+    def incidence(self):
+        '''Returns the paper-author incidence, backed by the memory-mapped CSR columns.'''
+        return incidence.MultiplexIncidence.from_csr(self.column('paper_offsets'),self.column('paper_authors'),
+                                                     self.column('author_offsets'),self.column('author_papers'))
+
+
+################################################################
+    ##
+#Function to write a multiplex snapshot
+def save_snapshot(multiplex,directory,with_csr=False):
+    '''Writes the layers, their numeric vertex and edge properties, the ID tables and the paper-author incidence of multiplex to directory. With with_csr=True, the CSR arrays of both layers that the kernels work on are written as well.'''
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    if os.path.exists(os.path.join(directory,MANIFEST)):
+        os.remove(os.path.join(directory,MANIFEST))
+    manifest = {'format':FORMAT_VERSION,'id':uuid.uuid4().hex,'layers':{}}
+
+    for layer,directed,id_attribute in LAYERS:
+        graph = getattr(multiplex,layer)
+        info = {'directed':directed,'n_vertices':graph.num_vertices(),'n_edges':graph.num_edges(),
+                'vertex_properties':{},'edge_properties':{}}
+        s,t,idx = array_utils.edge_arrays(graph)
+        _save_column(directory,layer+'_edges',numpy.column_stack((s,t)))
+
+        #ID strings as one byte pool plus offsets, by vertex index, and the hash table to look them up
+        pool,offsets,table = getattr(multiplex,id_attribute).arrays()
+        _save_column(directory,layer+'_ids',pool)
+        _save_column(directory,layer+'_id_offsets',offsets)
+        _save_column(directory,layer+'_id_table',table)
+
+        for name,prop in graph.vertex_properties.items():
+            if _is_numeric(prop):
+                info['vertex_properties'][name] = prop.value_type()
+                _save_column(directory,layer+'_vp_'+name,prop.a[:graph.num_vertices()])
+        for name,prop in graph.edge_properties.items():
+            if _is_numeric(prop):
+                info['edge_properties'][name] = prop.value_type()
+                _save_column(directory,layer+'_ep_'+name,prop.a[idx])
+        manifest['layers'][layer] = info
+
+    paper_offsets,paper_authors = multiplex._multiplex.paper_csr(multiplex.citation.num_vertices())
+    author_offsets,author_papers = multiplex._multiplex.author_csr(multiplex.collab.num_vertices())
+    _save_column(directory,'paper_offsets',paper_offsets)
+    _save_column(directory,'paper_authors',paper_authors)
+    _save_column(directory,'author_offsets',author_offsets)
+    _save_column(directory,'author_papers',author_papers)
+
+    if with_csr:
+        citation_offsets,citation_targets = multiplex._citation_csr()
+        _save_column(directory,'citation_csr_offsets',citation_offsets)
+        _save_column(directory,'citation_csr_targets',citation_targets)
+        collab_offsets,collab_neighbours,collab_years = multiplex._collab_adjacency()
+        _save_column(directory,'collab_csr_offsets',collab_offsets)
+        _save_column(directory,'collab_csr_neighbours',collab_neighbours)
+        _save_column(directory,'collab_csr_years',collab_years)
+        manifest['csr'] = True
+
+    #the manifest is written last, so an interrupted save does not leave a loadable snapshot
+    with open(os.path.join(directory,MANIFEST+'.tmp'),'w') as f:
+        json.dump(manifest,f,indent=1)
+    os.rename(os.path.join(directory,MANIFEST+'.tmp'),os.path.join(directory,MANIFEST))
+    _remove_result_caches(directory)
+
+
+#################################################
+#helper functions
+
+def _save_column(directory,name,array):
+    #write to a new file and rename it, so columns that are memory-mapped by a loaded snapshot stay valid
+    path = os.path.join(directory,name+'.npy')
+    with open(path+'.tmp','wb') as f:
+        numpy.save(f,numpy.ascontiguousarray(array))
+    os.rename(path+'.tmp',path)
+
+def _remove_result_caches(directory):
+    #cached results of earlier saves of the snapshot do not apply any more
+    results = os.path.join(directory,RESULT_CACHE)
+    if os.path.isdir(results):
+        shutil.rmtree(results,ignore_errors=True)
+
+def _is_numeric(prop):
+    value_type = prop.value_type()
+    return value_type!='string' and value_type!='python::object' and not value_type.startswith('vector')
+
+
+class SnapshotFormatError(Exception):
+    pass
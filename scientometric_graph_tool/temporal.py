@@ -0,0 +1,208 @@
+#This module implements temporal indices of multiplexes: vertices and edges sorted by year, with per-year offsets,
+#so that the papers, citations or collaborations of any range of years are one slice, and graph views of year
+#windows can be handed out without scanning the graphs. The views of the most recently used windows are cached.
+
+import collections
+import numpy
+import graph_tool.all as gt
+import array_utils
+
+class YearIndex(object):
+    'Items (vertex or edge indices) sorted by year, with the offset of every year'
+
+    def __init__(self,items,years,index_dtype='int64',year_dtype='int64'):
+        self._items = numpy.asarray(items,dtype=index_dtype)
+        self._years = numpy.asarray(years,dtype=year_dtype)
+        self._changed = {} #item -> (year, year it is stored with or None), for items added or changed since the last query
+        self._sort()
+
+################################################################
+    ##
+    #Function to get the items of a range of years
+    def items(self,first_year=None,last_year=None):
+        '''Returns the array of items with first_year <= year <= last_year (None: unbounded), sorted by year.'''
+        if self._changed:
+            self._merge_changes()
+        lo = self._offset(first_year,0)
+        hi = self._offset(last_year+1 if last_year is not None else None,len(self._items))
+        return self._items[lo:hi]
+
+    def years(self):
+        '''Returns the sorted array of distinct years.'''
+        if self._changed:
+            self._merge_changes()
+        return self._first_year+numpy.flatnonzero(numpy.diff(self._offsets)>0)
+
+################################################################
+    ##
+    #Function to add an item or change its year
+    def set(self,item,year,previous_year=None):
+        '''Record the year of item, which had previous_year before (None: item is new); the changes are merged into the sorted arrays on the next query.'''
+        item = int(item)
+        if item in self._changed:
+            previous_year = self._changed[item][1] #the year it is stored with
+        self._changed[item] = (int(year),previous_year)
+
+################################################################
+    def nbytes(self):
+        '''Returns the number of bytes of the arrays.'''
+        return self._items.nbytes+self._years.nbytes+self._offsets.nbytes
+
+################################################################
+    def _offset(self,year,default):
+        if year is None:
+            return default
+        i = min(max(year-self._first_year,0),len(self._offsets)-1)
+        return int(self._offsets[i])
+
+    def _sort(self):
+        order = numpy.lexsort((self._items,self._years))
+        self._items = self._items[order]
+        self._years = self._years[order]
+        self._set_offsets()
+
+    def _merge_changes(self):
+        #remove the stored entries of changed items and insert the sorted changes, without sorting the stored items again
+        changed = self._changed.items()
+        self._changed = {}
+        items = numpy.array([item for item,(year,previous_year) in changed],dtype='int64')
+        years = numpy.array([year for item,(year,previous_year) in changed],dtype='int64')
+        stored = numpy.array([previous_year is not None for item,(year,previous_year) in changed],dtype=bool)
+        if stored.any():
+            previous_years = numpy.array([previous_year for item,(year,previous_year) in changed if previous_year is not None],dtype='int64')
+            positions = _positions(self._years,self._items,previous_years,items[stored])
+            self._items = numpy.delete(self._items,positions)
+            self._years = numpy.delete(self._years,positions)
+        order = numpy.lexsort((items,years))
+        items = items[order]
+        years = years[order]
+        positions = _positions(self._years,self._items,years,items)
+        self._items = numpy.insert(self._items,positions,items.astype(self._items.dtype))
+        self._years = numpy.insert(self._years,positions,years.astype(self._years.dtype))
+        self._set_offsets()
+
+    def _set_offsets(self):
+        if len(self._years)==0:
+            self._first_year = 0
+            self._offsets = numpy.zeros(1,dtype='int64')
+            return
+        #offsets[y-first_year] is the position of the first item of year y
+        self._first_year = int(self._years[0])
+        self._offsets = numpy.searchsorted(self._years,numpy.arange(self._first_year,int(self._years[-1])+2))
+
+
+class TemporalIndex(object):
+    'Papers by year, citations by year and collaborations by first_year_collaborated of a multiplex, with cached GraphView windows'
+
+    def __init__(self,multiplex,index_dtype='int64',year_dtype='int64',max_views=8):
+        self.citation = multiplex.citation
+        self.collab = multiplex.collab
+        n_papers = self.citation.num_vertices()
+        self.papers = YearIndex(numpy.arange(n_papers),self.citation.vertex_properties['year'].a[:n_papers],index_dtype,year_dtype)
+        s,t,idx = array_utils.edge_arrays(self.citation)
+        self.citations = YearIndex(idx,multiplex.citation_years()[idx],index_dtype,year_dtype)
+        s,t,idx = array_utils.edge_arrays(self.collab)
+        self.collaborations = YearIndex(idx,self.collab.edge_properties['first_year_collaborated'].a[idx],index_dtype,year_dtype)
+        self._collaborators = numpy.zeros((self.collab.edge_index_range,2),dtype=index_dtype) #(source, target) by edge index
+        self._collaborators[idx,0] = s
+        self._collaborators[idx,1] = t
+        self.max_views = max_views
+        self._views = collections.OrderedDict() #(layer, first_year, last_year) -> (view, vertex mask, edge mask), least recently used first
+
+################################################################
+    ##
+    #Functions to get graph views of year windows
+    def citation_view(self,first_year=None,last_year=None):
+        '''Returns a GraphView of the citation layer with the papers published and citations made in first_year..last_year (None: unbounded).'''
+        return self._view('citation',first_year,last_year)
+
+    def collab_view(self,first_year=None,last_year=None):
+        '''Returns a GraphView of the collaboration layer (all authors) with the collaborations first formed in first_year..last_year (None: unbounded).'''
+        return self._view('collab',first_year,last_year)
+
+    def _view(self,layer,first_year,last_year):
+        key = (layer,first_year,last_year)
+        if key in self._views:
+            self._views[key] = self._views.pop(key)
+        else:
+            if layer=='citation':
+                vertex_mask = self.citation.new_vertex_property('bool')
+                vertex_mask.a[self.papers.items(first_year,last_year)] = True
+                edge_mask = self.citation.new_edge_property('bool')
+                edge_mask.a[self.citations.items(first_year,last_year)] = True
+                view = gt.GraphView(self.citation,vfilt=vertex_mask,efilt=edge_mask)
+            else:
+                vertex_mask = None
+                edge_mask = self.collab.new_edge_property('bool')
+                edge_mask.a[self.collaborations.items(first_year,last_year)] = True
+                view = gt.GraphView(self.collab,efilt=edge_mask)
+            self._views[key] = (view,vertex_mask,edge_mask)
+            while len(self._views)>self.max_views:
+                self._views.popitem(last=False)
+        return self._views[key][0]
+
+    def collaboration_edges(self,first_year=None,last_year=None):
+        '''Returns arrays (sources, targets, edge indices) of the collaborations first formed in first_year..last_year, in year order.'''
+        idx = self.collaborations.items(first_year,last_year)
+        return self._collaborators[idx,0].astype('int64'),self._collaborators[idx,1].astype('int64'),idx.astype('int64')
+
+    def clear_views(self):
+        '''Drop all cached views.'''
+        self._views.clear()
+
+    def nbytes(self):
+        '''Returns the number of bytes of the year indices and of the masks of the cached views.'''
+        n = self.papers.nbytes()+self.citations.nbytes()+self.collaborations.nbytes()+self._collaborators.nbytes
+        for view,vertex_mask,edge_mask in self._views.itervalues():
+            n += edge_mask.a.nbytes+(vertex_mask.a.nbytes if vertex_mask is not None else 0)
+        return n
+
+################################################################
+    ##
+    #Functions to update the index (and the cached views) in place when the multiplex grows
+    def paper(self,vertex,year):
+        '''Record that paper vertex was added or has a new year.'''
+        self.papers.set(int(vertex),year)
+        for (layer,first_year,last_year),(view,vertex_mask,edge_mask) in self._views.iteritems():
+            if layer=='citation':
+                vertex_mask[vertex] = _in_window(year,first_year,last_year)
+
+    def citation_edge(self,edge,year):
+        '''Record that citation edge was added.'''
+        self.citations.set(self.citation.edge_index[edge],year)
+        for (layer,first_year,last_year),(view,vertex_mask,edge_mask) in self._views.iteritems():
+            if layer=='citation':
+                edge_mask[edge] = _in_window(year,first_year,last_year)
+
+    def collaboration_edge(self,edge,year,previous_year=None):
+        '''Record that collaboration edge was added (previous_year None) or has a new first_year_collaborated (previous_year: the old one).'''
+        i = self.collab.edge_index[edge]
+        self.collaborations.set(i,year,previous_year)
+        if i>=len(self._collaborators):
+            grown = numpy.zeros((max(i+1,2*len(self._collaborators)),2),dtype=self._collaborators.dtype)
+            grown[:len(self._collaborators)] = self._collaborators
+            self._collaborators = grown
+        self._collaborators[i] = (int(edge.source()),int(edge.target()))
+        for (layer,first_year,last_year),(view,vertex_mask,edge_mask) in self._views.iteritems():
+            if layer=='collab':
+                edge_mask[edge] = _in_window(year,first_year,last_year)
+
+
+#################################################
+#helper functions
+
+def _positions(sorted_years,sorted_items,years,items):
+    #position of the first stored (year, item) >= each (year, item), by a binary search among the items of each year
+    lo = numpy.searchsorted(sorted_years,years,side='left').astype('int64')
+    hi = numpy.searchsorted(sorted_years,years,side='right').astype('int64')
+    active = numpy.flatnonzero(lo<hi)
+    while len(active)>0:
+        mid = (lo[active]+hi[active])//2
+        smaller = sorted_items[mid]<items[active]
+        lo[active[smaller]] = mid[smaller]+1
+        hi[active[~smaller]] = mid[~smaller]
+        active = active[lo[active]<hi[active]]
+    return lo
+
+def _in_window(year,first_year,last_year):
+    return (first_year is None or year>=first_year) and (last_year is None or year<=last_year)
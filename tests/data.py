@@ -0,0 +1,70 @@
+#Small synthetic networks for the tests, generated with the benchmark generator.
+#All of them are seeded, so every test sees the same networks.
+
+import shutil
+import tempfile
+import unittest
+from benchmarks import generator
+from scientometric_graph_tool import citation_net
+from scientometric_graph_tool import multiplex_structures
+
+N_PAPERS = 300
+
+class DataTestCase(unittest.TestCase):
+    'A TestCase with a generated multiplex (meta file and citation edge list) in self.directory'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp(prefix='sgt_test_')
+        generator.generate(cls.directory,N_PAPERS,seed=1,first_year=1990,last_year=2010,mean_references=4.)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory,ignore_errors=True)
+
+    def path(self,name):
+        return self.directory+'/'+name
+
+
+################################################################
+    ##
+#Functions to build the networks of a data directory
+def citation_network(directory,**read_edgelist_arguments):
+    '''Returns the PaperCitationNet of the citation edge list of directory, with the publication years of the generator.'''
+    net = citation_net.PaperCitationNet()
+    net.read_edgelist(directory+'/'+generator.CITATION_FILE,**read_edgelist_arguments)
+    years = dict(_meta_years(directory))
+    for v in net.graph.vertices():
+        net.graph.vertex_properties['year'][v] = years[net._citation_graphml_vertex_id_to_gt_id.id_of(int(v))]
+    return net
+
+def multiplex(directory,bulk=False):
+    '''Returns the PaperAuthorMultiplex of the meta file of directory, with the citations added one by one.'''
+    m = multiplex_structures.PaperAuthorMultiplex()
+    m.read_meta_create_collab(directory+'/'+generator.META_FILE,bulk=bulk)
+    for cited,citing in citations(directory):
+        m.add_citation(cited,citing)
+    return m
+
+def citations(directory):
+    '''Returns the list of (cited, citing) paper id pairs of the citation edge list of directory.'''
+    with open(directory+'/'+generator.CITATION_FILE) as f:
+        f.readline()
+        return [tuple(line.split()) for line in f]
+
+def edge_set(graph,years=None):
+    '''Returns the set of (source, target) edges of graph, or (source, target, year) with the edge property years.'''
+    if years is None:
+        return set((int(e.source()),int(e.target())) for e in graph.edges())
+    return set((int(e.source()),int(e.target()),int(years[e])) for e in graph.edges())
+
+
+#################################################
+#helper functions
+
+def _meta_years(directory):
+    with open(directory+'/'+generator.META_FILE) as f:
+        f.readline()
+        for line in f:
+            paper,author,year = line.split()
+            yield paper,int(year)
@@ -0,0 +1,72 @@
+import StringIO
+import unittest
+import numpy
+from scientometric_graph_tool import array_utils
+from scientometric_graph_tool import multiplex_structures
+from tests import data
+
+def unpacked(data_and_offsets):
+    values,offsets = data_and_offsets
+    return [values[a:b].tostring() for a,b in zip(offsets[:-1],offsets[1:])]
+
+def rows(offsets_and_indices):
+    offsets,indices = offsets_and_indices
+    return [sorted(indices[a:b].tolist()) for a,b in zip(offsets[:-1],offsets[1:])]
+
+class TestBatchQueries(data.DataTestCase):
+
+    def setUp(self):
+        self.m = data.multiplex(self.directory,bulk=True)
+        self.net = data.citation_network(self.directory,bulk=True)
+
+    def test_vertex_selections(self):
+        n = 10
+        expected = [1,4,7]
+        mask = numpy.zeros(n,dtype=bool)
+        mask[expected] = True
+        for selection in (mask,numpy.array(expected),expected,iter(expected)):
+            numpy.testing.assert_array_equal(array_utils.vertex_selection(selection,n),expected)
+        prop = self.m.citation.new_vertex_property('bool')
+        prop.a[expected] = True
+        numpy.testing.assert_array_equal(array_utils.vertex_selection(prop,self.m.citation.num_vertices()),expected)
+
+    def test_vertex_ids_like_vertex_id(self):
+        for layer,graph in (('citation',self.m.citation),('collab',self.m.collab)):
+            vertices = [graph.vertex(i) for i in xrange(0,graph.num_vertices(),3)]
+            expected = list(self.m.vertex_id(vertices,layer))
+            self.assertEqual(unpacked(self.m.vertex_ids(vertices,layer)),expected)
+            f = StringIO.StringIO()
+            self.m.write_vertex_ids(vertices,f,layer,separator=',')
+            self.assertEqual(f.getvalue(),''.join(x+',' for x in expected))
+            indices,missing = self.m.vertex_indices(expected+['unknown'],layer)
+            numpy.testing.assert_array_equal(indices,[int(v) for v in vertices]+[-1])
+            numpy.testing.assert_array_equal(missing,[False]*len(vertices)+[True])
+        self.assertRaises(multiplex_structures.UnknownLayerError,self.m.vertex_ids,[0],'journal')
+
+    def test_citation_net_ids(self):
+        vertices = list(self.net.graph.vertices())[::7]
+        expected = list(self.net.vertex_id(vertices))
+        self.assertEqual(unpacked(self.net.vertex_ids(vertices)),expected)
+        indices,missing = self.net.vertex_indices(numpy.array(expected))
+        numpy.testing.assert_array_equal(indices,[int(v) for v in vertices])
+        self.assertFalse(missing.any())
+
+    def test_incidence_rows_like_single_queries(self):
+        papers = numpy.arange(0,self.m.citation.num_vertices(),2)
+        self.assertEqual(rows(self.m.authors_of_many(papers)),[sorted(self.m._multiplex.authors_of(p).tolist()) for p in papers])
+        authors = numpy.arange(self.m.collab.num_vertices())[::-1]
+        self.assertEqual(rows(self.m.papers_by_many(authors)),[sorted(self.m._multiplex.papers_by(a).tolist()) for a in authors])
+        offsets,indices = self.m.authors_of_many([])
+        self.assertEqual((offsets.tolist(),len(indices)),([0],0))
+
+    def test_papers_by_ids(self):
+        ids = self.m._collab_graphml_vertex_id_to_gt_id.ids()[:5]
+        indices,missing = self.m.vertex_indices(ids,'collab')
+        self.assertFalse(missing.any())
+        papers = rows(self.m.papers_by_many(indices))
+        for author,paper_indices in zip(ids,papers):
+            self.assertEqual(paper_indices,sorted(int(p) for p in self.m.papers_by(author)))
+
+
+if __name__ == '__main__':
+    unittest.main()
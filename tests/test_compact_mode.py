@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from scientometric_graph_tool import array_utils
+from scientometric_graph_tool import multiplex_structures
+from tests import data
+
+def results(multiplex):
+    #results that must not depend on the representation, as plain lists
+    counts = multiplex.socially_biased_citations(as_arrays=True)
+    metrics = multiplex.author_metrics(window=3,exclude_self_citations=True)
+    success,success_perc,cuts = multiplex.citation_success(range(1990,2005),3,90)
+    index = multiplex.temporal_index()
+    return ([c.tolist() for c in counts],dict((k,v.tolist()) for k,v in metrics.items()),
+            success.a.tolist(),success_perc.a.tolist(),list(cuts),
+            sorted(index.papers.items(1995,2000).tolist()),edge_pairs(multiplex.citation,index.citations.items(1995,2000)),
+            edge_pairs(multiplex.collab,index.collaborations.items(1995,2000)),edge_values(multiplex.citation,multiplex.citation_years()))
+
+def edge_pairs(graph,edges):
+    #(source, target) of the edge indices, as edge indices of a loaded snapshot differ
+    s,t,idx = array_utils.edge_arrays(graph)
+    pairs = dict(zip(idx.tolist(),zip(s.tolist(),t.tolist())))
+    return sorted(pairs[e] for e in edges.tolist())
+
+def edge_values(graph,values):
+    s,t,idx = array_utils.edge_arrays(graph)
+    return sorted(zip(s.tolist(),t.tolist(),values[idx].tolist()))
+
+class TestCompactMode(data.DataTestCase):
+
+    def setUp(self):
+        self.normal = data.multiplex(self.directory,bulk=True)
+        self.compact = data.multiplex(self.directory,bulk=True)
+        self.compact.enable_compact_mode()
+
+    def test_results_like_normal_mode(self):
+        self.assertEqual(results(self.compact),results(self.normal))
+        self.assertEqual(data.edge_set(self.compact.citation),data.edge_set(self.normal.citation))
+
+    def test_representation(self):
+        self.assertEqual(self.compact.citation.vertex_properties['year'].a.dtype,numpy.int16)
+        self.assertEqual(self.compact.collab.edge_properties['first_year_collaborated'].a.dtype,numpy.int16)
+        self.assertFalse('year' in self.compact.citation.edge_properties)
+        index = self.compact.temporal_index()
+        self.assertEqual((index.papers._items.dtype,index.papers._years.dtype),(numpy.int32,numpy.int16))
+        self.normal.temporal_index()
+        compact,normal = self.compact.memory_report(),self.normal.memory_report()
+        self.assertFalse('citation.edge_properties.year' in compact)
+        self.assertTrue(compact['citation.vertex_properties.year']<normal['citation.vertex_properties.year'])
+        self.assertTrue(compact['incidence']<normal['incidence'])
+        self.assertTrue(compact['temporal_index']<normal['temporal_index'])
+        self.assertTrue(compact['total']<normal['total'])
+
+    def test_disable_restores_edge_year(self):
+        self.compact.disable_compact_mode()
+        years = self.compact.citation.edge_properties['year']
+        for e in self.normal.citation.edges():
+            self.assertEqual(years[self.compact.citation.edge(e.source(),e.target())],self.normal.citation.edge_properties['year'][e])
+        self.assertEqual(results(self.compact),results(self.normal))
+
+    def test_readers_keep_compact(self):
+        years = self.compact._paper_years()
+        ids = self.compact._layer_ids('citation')
+        cited,citing = [int(i) for i in numpy.argsort(years,kind='mergesort')[[0,-1]]]
+        for multiplex in (self.normal,self.compact):
+            multiplex.add_paper('new paper',2010,['new author',self.compact._layer_ids('collab').id_of(0)])
+            multiplex.add_citation(ids.id_of(cited),'new paper')
+        self.assertEqual(self.compact.citation.vertex_properties['year'].a.dtype,numpy.int16)
+        self.assertFalse('year' in self.compact.citation.edge_properties)
+        self.assertEqual(results(self.compact),results(self.normal))
+
+    def test_years_out_of_range(self):
+        self.normal.add_paper('far future',40000,['new author'])
+        self.assertRaises(multiplex_structures.CompactModeError,self.normal.enable_compact_mode)
+        self.assertFalse(self.normal._compact)
+        self.assertEqual(self.normal.citation.vertex_properties['year'].a[-1],40000)
+
+    def test_snapshot(self):
+        directory = tempfile.mkdtemp(prefix='sgt_compact_')
+        try:
+            self.normal.save_snapshot(os.path.join(directory,'snapshot'))
+            loaded = multiplex_structures.PaperAuthorMultiplex()
+            loaded.enable_compact_mode()
+            loaded.load_snapshot(os.path.join(directory,'snapshot'))
+            self.assertEqual(results(loaded),results(self.normal))
+            self.assertEqual(loaded.citation.vertex_properties['year'].a.dtype,numpy.int16)
+            self.assertFalse('year' in loaded.citation.edge_properties)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
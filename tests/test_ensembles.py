@@ -0,0 +1,89 @@
+import unittest
+import numpy
+from scientometric_graph_tool import citation_net
+from scientometric_graph_tool import ensembles
+from tests import data
+
+class TestRunningStatistics(unittest.TestCase):
+
+    def test_matches_numpy(self):
+        values = numpy.random.RandomState(0).normal(size=(20,3))
+        stats = ensembles.RunningStatistics(observed=numpy.zeros(3))
+        for value in values:
+            stats.add(value)
+        self.assertEqual(stats.n,20)
+        numpy.testing.assert_allclose(stats.mean,values.mean(axis=0))
+        numpy.testing.assert_allclose(stats.variance(),values.var(axis=0,ddof=1))
+        numpy.testing.assert_allclose(stats.z_scores(),-values.mean(axis=0)/values.std(axis=0,ddof=1))
+
+    def test_rejects_other_shape(self):
+        stats = ensembles.RunningStatistics()
+        stats.add([1,2])
+        self.assertRaises(ValueError,stats.add,[1,2,3])
+
+
+class TestStatistics(unittest.TestCase):
+
+    def test_citation_lags_of_empty_networks(self):
+        network = citation_net.PaperCitationNet()
+        self.assertEqual(ensembles.citation_lag_distribution(network).tolist(),[])
+        network.add_paper('a',1990)
+        network.add_paper('b',1993)
+        self.assertEqual(ensembles.citation_lag_distribution(network).tolist(),[0,0,0,0])
+        network.add_citation('a','b')
+        self.assertEqual(ensembles.citation_lag_distribution(network).tolist(),[0,0,0,1])
+
+
+class TestRandomize(data.DataTestCase):
+
+    def setUp(self):
+        self.net = data.citation_network(self.directory,bulk=True)
+
+    def test_same_seed_same_network(self):
+        for null_model in (citation_net.MolloyReedCitationInstance,citation_net.EdgeSwapCitationInstance):
+            a = ensembles.randomize(self.net,seed=3,null_model=null_model)
+            b = ensembles.randomize(self.net,seed=3,null_model=null_model)
+            self.assertEqual(data.edge_set(a.graph),data.edge_set(b.graph))
+
+    def test_keeps_degrees_and_time(self):
+        randomized = ensembles.randomize(self.net,seed=3)
+        for deg in ('in','out'):
+            numpy.testing.assert_array_equal(randomized.graph.degree_property_map(deg).a,self.net.graph.degree_property_map(deg).a)
+        years = randomized.graph.vertex_properties['year']
+        self.assertTrue(all(years[e.source()]<=years[e.target()] for e in randomized.graph.edges()))
+
+    def test_multiplex_shares_collaborations(self):
+        m = data.multiplex(self.directory,bulk=True)
+        randomized = ensembles.randomize(m,seed=3)
+        self.assertIs(randomized.collab,m.collab)
+        self.assertEqual(randomized.citation.num_edges(),m.citation.num_edges())
+        self.assertNotEqual(data.edge_set(randomized.citation),data.edge_set(m.citation))
+
+
+class TestNullModelEnsemble(data.DataTestCase):
+
+    def test_independent_of_processes(self):
+        net = data.citation_network(self.directory,bulk=True)
+        serial = ensembles.null_model_ensemble(net,ensembles.citation_lag_distribution,6,processes=1,seed=5)
+        pooled = ensembles.null_model_ensemble(net,ensembles.citation_lag_distribution,6,processes=2,seed=5)
+        self.assertEqual(serial.n,6)
+        numpy.testing.assert_array_equal(serial.mean,pooled.mean)
+        numpy.testing.assert_array_equal(serial.variance(),pooled.variance())
+        numpy.testing.assert_array_equal(serial.observed,ensembles.citation_lag_distribution(net))
+
+    def test_multiplex_independent_of_processes(self):
+        m = data.multiplex(self.directory,bulk=True)
+        serial = ensembles.null_model_ensemble(m,ensembles.socially_biased_citation_totals,4,processes=1,seed=5)
+        pooled = ensembles.null_model_ensemble(m,ensembles.socially_biased_citation_totals,4,processes=2,seed=5)
+        numpy.testing.assert_array_equal(serial.mean,pooled.mean)
+        #randomizing citations keeps their number
+        self.assertEqual(serial.mean[0],serial.observed[0])
+
+    def test_streams_every_instance(self):
+        net = data.citation_network(self.directory,bulk=True)
+        counts = [stats.n for stats in ensembles.iter_null_model_ensemble(net,ensembles.citation_lag_distribution,3,processes=1)]
+        self.assertEqual(counts,[1,2,3])
+
+
+if __name__ == '__main__':
+    unittest.main()
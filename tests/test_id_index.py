@@ -0,0 +1,105 @@
+import cPickle
+import StringIO
+import unittest
+import numpy
+from scientometric_graph_tool import id_index
+
+def random_ids(n,seed=0):
+    rnd = numpy.random.RandomState(seed)
+    return ['id%d_%s'%(k,'x'*rnd.randint(0,12)) for k in rnd.permutation(n)]
+
+class TestIdIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.ids = random_ids(3000)
+
+    def test_single_ids_like_a_dict(self):
+        index = id_index.IdIndex()
+        for k,vertex_id in enumerate(self.ids):
+            self.assertEqual(index.add(vertex_id),k)
+        self.assertEqual(index.add(self.ids[17]),17)
+        self.assertEqual(len(index),len(self.ids))
+        self.assertEqual(index[self.ids[5]],5)
+        self.assertTrue(self.ids[5] in index)
+        self.assertFalse('missing' in index)
+        self.assertEqual(index.get('missing',-7),-7)
+        self.assertRaises(KeyError,index.__getitem__,'missing')
+        self.assertEqual(index.id_of(9),self.ids[9])
+        self.assertRaises(IndexError,index.id_of,len(self.ids))
+        self.assertEqual(list(index),self.ids)
+
+    def test_single_ids_without_a_dict_of_all_ids(self):
+        ids = random_ids(3*id_index._MAX_PENDING,seed=1)
+        index = id_index.IdIndex()
+        for k,vertex_id in enumerate(ids):
+            self.assertEqual(index.add(vertex_id),k)
+            self.assertEqual(index.get(ids[k//2]),k//2)
+        self.assertEqual([index[x] for x in ids],range(len(ids)))
+        self.assertFalse('missing' in index)
+        #only the IDs added since the last batch insertion into the hash table are kept in a dict
+        for value in vars(index).itervalues():
+            if isinstance(value,dict):
+                self.assertTrue(len(value)<id_index._MAX_PENDING)
+        self.assertEqual(len(index._pending),len(ids)%id_index._MAX_PENDING)
+        numpy.testing.assert_array_equal(index.lookup(ids),numpy.arange(len(ids)))
+        self.assertEqual(len(index._pending),0)
+
+    def test_hash_of_one_id(self):
+        data,offsets = id_index.pack(self.ids[:50]+[''])
+        self.assertEqual([id_index._hash_one(x) for x in self.ids[:50]+['']],id_index.hash_packed(data,offsets).tolist())
+
+    def test_add_many_like_add(self):
+        with_duplicates = self.ids[:1000]+self.ids[500:2000]+['']
+        index = id_index.IdIndex(chunk_size=333)
+        expected = id_index.IdIndex()
+        numpy.testing.assert_array_equal(index.add_many(with_duplicates),[expected.add(x) for x in with_duplicates])
+        self.assertEqual(index.ids(),expected.ids())
+
+    def test_batch_and_single_operations_mixed(self):
+        index = id_index.IdIndex(self.ids[:1000])
+        self.assertEqual(index[self.ids[10]],10)
+        for vertex_id in self.ids[1000:1500]:
+            index.add(vertex_id)
+        #ids added one by one are found by lookup, and ids added in batches by single lookups
+        numpy.testing.assert_array_equal(index.lookup(self.ids[:1500]+['missing']),range(1500)+[-1])
+        numpy.testing.assert_array_equal(index.add_many(self.ids[1400:3000]),numpy.arange(1400,3000))
+        self.assertEqual([index[x] for x in self.ids],range(3000))
+        numpy.testing.assert_array_equal(index.lookup(numpy.array(self.ids)),numpy.arange(3000))
+
+    def test_packed(self):
+        index = id_index.IdIndex(self.ids)
+        data,offsets = id_index.pack(self.ids[::-1])
+        numpy.testing.assert_array_equal(index.lookup_packed(data,offsets),numpy.arange(3000)[::-1])
+        data,offsets = index.ids_packed([3,1,4])
+        self.assertEqual([data[a:b].tostring() for a,b in zip(offsets[:-1],offsets[1:])],[self.ids[3],self.ids[1],self.ids[4]])
+        numpy.testing.assert_array_equal(id_index.IdIndex().add_packed(*id_index.pack(self.ids)),numpy.arange(3000))
+        f = StringIO.StringIO()
+        index.write_ids(f,numpy.array([2,0]),separator=';')
+        self.assertEqual(f.getvalue(),self.ids[2]+';'+self.ids[0]+';')
+
+    def test_stored_and_restored(self):
+        index = id_index.IdIndex(self.ids[:2000])
+        for vertex_id in self.ids[2000:]:
+            index.add(vertex_id)
+        for restored in (id_index.IdIndex.from_arrays(*index.arrays()),
+                         id_index.IdIndex.from_arrays(*index.arrays()[:2]),
+                         cPickle.loads(cPickle.dumps(index,2)),
+                         id_index.IdIndex.from_dict(dict(index.iteritems()))):
+            self.assertEqual(restored.ids(),self.ids)
+            numpy.testing.assert_array_equal(restored.lookup(self.ids),numpy.arange(3000))
+            self.assertEqual(restored[self.ids[2500]],2500)
+            self.assertEqual(restored.add('new'),3000)
+
+    def test_read_only_arrays_are_copied(self):
+        pool,offsets,table = [numpy.array(a) for a in id_index.IdIndex(self.ids[:10]).arrays()]
+        for a in (pool,offsets,table):
+            a.flags.writeable = False
+        index = id_index.IdIndex.from_arrays(pool,offsets,table)
+        index.add_many(self.ids[10:20])
+        index.add('new')
+        numpy.testing.assert_array_equal(index.lookup(self.ids[:20]+['new']),numpy.arange(21))
+        self.assertEqual(len(offsets),11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import numpy
+from scientometric_graph_tool import incidence
+
+def random_links(n,n_papers,n_authors,seed):
+    rnd = numpy.random.RandomState(seed)
+    return rnd.randint(0,n_papers,size=n),rnd.randint(0,n_authors,size=n)
+
+class TestMultiplexIncidence(unittest.TestCase):
+
+    def assertLinks(self,inc,links):
+        papers,authors = inc.pairs()
+        self.assertEqual(sorted(zip(papers.tolist(),authors.tolist())),sorted(links))
+        self.assertEqual(inc.n_links,len(links))
+        offsets,indices = inc.paper_csr()
+        for paper in xrange(inc.n_papers):
+            row = indices[offsets[paper]:offsets[paper+1]].tolist()
+            self.assertEqual(row,sorted(a for p,a in links if p==paper))
+            self.assertEqual(inc.paper_degree(paper),len(row))
+        offsets,indices = inc.author_csr()
+        for author in xrange(inc.n_authors):
+            row = indices[offsets[author]:offsets[author+1]].tolist()
+            self.assertEqual(row,sorted(p for p,a in links if a==author))
+            self.assertEqual(inc.author_degree(author),len(row))
+
+    def test_add_with_flushes(self):
+        inc = incidence.MultiplexIncidence(buffer_size=37)
+        links = set()
+        for paper,author in zip(*random_links(500,60,40,0)):
+            self.assertEqual(inc.add(paper,author),(paper,author) not in links)
+            links.add((paper,author))
+            if len(links)%101==0:
+                self.assertLinks(inc,links)
+        self.assertLinks(inc,links)
+
+    def test_add_many_merges(self):
+        inc = incidence.MultiplexIncidence(index_dtype='int32',buffer_size=1000)
+        links = set()
+        for seed in xrange(5):
+            papers,authors = random_links(200,30+20*seed,25+10*seed,seed)
+            inc.add_many(papers,authors)
+            links.update(zip(papers.tolist(),authors.tolist()))
+            #pending links in between
+            for paper,author in zip(*random_links(20,80,60,100+seed)):
+                inc.add(paper,author)
+                links.add((paper,author))
+            self.assertLinks(inc,links)
+        self.assertEqual(inc.paper_csr()[1].dtype,numpy.int32)
+
+    def test_read_only_arrays(self):
+        inc = incidence.MultiplexIncidence()
+        papers,authors = random_links(300,50,30,1)
+        inc.add_many(papers,authors)
+        links = set(zip(papers.tolist(),authors.tolist()))
+        arrays = [numpy.array(a) for a in inc.paper_csr()+inc.author_csr()]
+        for a in arrays:
+            a.flags.writeable = False
+        loaded = incidence.MultiplexIncidence.from_csr(*arrays)
+        papers,authors = random_links(300,70,40,2)
+        loaded.add_many(papers,authors)
+        loaded.add(69,39)
+        links.update(zip(papers.tolist(),authors.tolist()))
+        links.add((69,39))
+        self.assertLinks(loaded,links)
+
+
+if __name__ == '__main__':
+    unittest.main()
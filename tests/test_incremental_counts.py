@@ -0,0 +1,69 @@
+import unittest
+import numpy
+from scientometric_graph_tool import multiplex_structures
+from tests import data
+
+def recomputed(multiplex):
+    counts = multiplex._incremental_counts
+    multiplex._incremental_counts = None
+    try:
+        return numpy.column_stack(multiplex.socially_biased_citations(as_arrays=True))
+    finally:
+        multiplex._incremental_counts = counts
+
+class TestIncrementalCitationCounts(unittest.TestCase):
+
+    def setUp(self):
+        #a cites b, c cites b; a and c share no author with b, but a's author later collaborates with b's
+        self.m = multiplex_structures.PaperAuthorMultiplex()
+        self.m.add_paper('b',2000,['x'])
+        self.m.add_paper('a',2003,['y'])
+        self.m.add_paper('c',2008,['z','w'])
+        self.m.enable_incremental_citation_counts()
+        self.m.add_citation('b','a')
+        self.m.add_citation('b','c')
+
+    def assertCountsUpToDate(self):
+        counts = numpy.column_stack(self.m.socially_biased_citations(as_arrays=True))
+        numpy.testing.assert_array_equal(counts,recomputed(self.m))
+
+    def test_new_collaboration(self):
+        self.m.add_collaboration('x','y',1995)
+        self.assertCountsUpToDate()
+        self.m.add_collaboration('x','z',2005)
+        self.assertCountsUpToDate()
+
+    def test_collaboration_of_year_zero_moved_later(self):
+        self.m.add_collaboration('x','y',0)
+        self.assertCountsUpToDate()
+        self.m.add_collaboration('x','y',2005)
+        self.assertCountsUpToDate()
+
+    def test_collaboration_moved_earlier(self):
+        self.m.add_collaboration('x','y',2005)
+        self.m.add_collaboration('x','y',1999)
+        self.assertCountsUpToDate()
+
+    def test_papers_and_links(self):
+        self.m.add_paper('d',2010,['y','x'])
+        self.m.add_citation('a','d')
+        self.m.add_multiplex('c','y',2008)
+        self.assertCountsUpToDate()
+
+
+class TestIncrementalCitationCountsGenerated(data.DataTestCase):
+
+    def test_growing_multiplex(self):
+        m = data.multiplex(self.directory,bulk=True)
+        m.enable_incremental_citation_counts()
+        numpy.testing.assert_array_equal(numpy.column_stack(m.socially_biased_citations(as_arrays=True)),recomputed(m))
+        authors = m._collab_graphml_vertex_id_to_gt_id.ids()
+        rnd = numpy.random.RandomState(0)
+        for k in xrange(20):
+            a1,a2 = rnd.choice(len(authors),2,replace=False)
+            m.add_collaboration(authors[a1],authors[a2],int(rnd.choice([0,1995,2000,2005])))
+        numpy.testing.assert_array_equal(numpy.column_stack(m.socially_biased_citations(as_arrays=True)),recomputed(m))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import threading
+import unittest
+from scientometric_graph_tool import instrumentation
+
+class _Calls(object):
+    def __init__(self,entered,release):
+        self.entered = entered
+        self.release = release
+    def outer(self):
+        return self.inner()
+    def inner(self):
+        return 1
+    def waiting(self):
+        self.entered.set()
+        self.release.wait(60)
+
+instrumentation.instrument_methods(_Calls)
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = instrumentation.CollectingSink()
+        self.previous = instrumentation.set_sink(self.sink)
+
+    def tearDown(self):
+        instrumentation.set_sink(self.previous)
+
+    def test_only_outermost_call_timed(self):
+        calls = _Calls(None,None)
+        self.assertEqual(calls.outer(),1)
+        self.assertEqual(sorted(self.sink.timings),['_Calls.outer'])
+        calls.inner()
+        self.assertEqual(sorted(self.sink.timings),['_Calls.inner','_Calls.outer'])
+
+    def test_nesting_per_thread(self):
+        entered = threading.Event()
+        release = threading.Event()
+        calls = _Calls(entered,release)
+        waiting = threading.Thread(target=calls.waiting)
+        waiting.start()
+        try:
+            self.assertTrue(entered.wait(60))
+            #a call in another thread is outermost in its thread
+            calls.inner()
+            self.assertEqual(sorted(self.sink.timings),['_Calls.inner'])
+        finally:
+            release.set()
+            waiting.join()
+        self.assertEqual(sorted(self.sink.timings),['_Calls.inner','_Calls.waiting'])
+        calls.inner()
+        self.assertEqual(instrumentation._nesting.depth,0)
+
+
+if __name__ == '__main__':
+    unittest.main()
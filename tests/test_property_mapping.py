@@ -0,0 +1,71 @@
+import unittest
+import numpy
+from scientometric_graph_tool import array_utils
+from scientometric_graph_tool import multiplex_structures
+from tests import data
+
+REDUCTIONS = {'sum':sum,'mean':numpy.mean,'max':max,'min':min,'count':len,'median':numpy.median}
+
+class TestSegmentReduce(unittest.TestCase):
+
+    def test_like_python(self):
+        rnd = numpy.random.RandomState(0)
+        counts = rnd.randint(1,6,size=50)
+        offsets = numpy.concatenate(([7],7+numpy.cumsum(counts)))
+        values = rnd.randint(0,20,size=counts.sum())
+        for name,function in REDUCTIONS.iteritems():
+            expected = [function(values[lo-7:hi-7].tolist()) for lo,hi in zip(offsets[:-1],offsets[1:])]
+            numpy.testing.assert_allclose(array_utils.segment_reduce(offsets,values,name),expected,err_msg=name)
+
+    def test_empty_and_unknown(self):
+        self.assertEqual(len(array_utils.segment_reduce([0],numpy.zeros(0),'median')),0)
+        self.assertRaises(ValueError,array_utils.segment_reduce,[0,1],[1],'mode')
+
+
+class TestMultiplexPropertyMapping(data.DataTestCase):
+
+    def setUp(self):
+        self.m = data.multiplex(self.directory,bulk=True)
+        self.paper_years = self.m.citation.vertex_properties['year']
+        self.degrees = self.m.collab.degree_property_map('total')
+
+    def mappings(self):
+        #(direction, origin layer, origin property, target property)
+        return (('collab_to_citation',self.m.collab,self.degrees,self.paper_years),
+                ('citation_to_collab',self.m.citation,self.paper_years,self.degrees))
+
+    def test_arrays_like_lists(self):
+        for direction,layer,origin_property,target_property in self.mappings():
+            for aggregation in (None,max,numpy.median):
+                origin_values,target_values = self.m.multiplex_property_mapping(layer.vertices(),origin_property,target_property,direction,aggregation)
+                origins,array_origin_values,array_target_values = self.m.multiplex_property_mapping(layer.vertices(),origin_property,target_property,direction,aggregation,as_arrays=True)
+                numpy.testing.assert_array_equal(array_origin_values,origin_values)
+                numpy.testing.assert_allclose(array_target_values,target_values)
+                numpy.testing.assert_array_equal(origin_property.a[origins],origin_values)
+
+    def test_named_reductions_like_functions(self):
+        for direction,layer,origin_property,target_property in self.mappings():
+            for name,function in REDUCTIONS.iteritems():
+                expected = self.m.multiplex_property_mapping(layer.vertices(),origin_property,target_property,direction,function)
+                for named in (self.m.multiplex_property_mapping(layer.vertices(),origin_property,target_property,direction,name),
+                              self.m.multiplex_property_mapping(layer.vertices(),origin_property,target_property,direction,unicode(name))):
+                    self.assertEqual(named[0],expected[0])
+                    numpy.testing.assert_allclose(named[1],expected[1],err_msg=name)
+
+    def test_selections(self):
+        n = self.m.citation.num_vertices()
+        mask = numpy.arange(n)%3==0
+        selections = (mask,numpy.flatnonzero(mask),[self.m.citation.vertex(i) for i in numpy.flatnonzero(mask)])
+        results = [self.m.multiplex_property_mapping(selection,self.paper_years,self.degrees,'citation_to_collab','sum',as_arrays=True) for selection in selections]
+        for result in results[1:]:
+            for a,b in zip(results[0],result):
+                numpy.testing.assert_array_equal(a,b)
+
+    def test_errors(self):
+        self.assertIsNone(self.m.multiplex_property_mapping(self.m.citation.vertices(),self.paper_years,self.degrees))
+        self.assertRaises(multiplex_structures.UnknownAggregationError,self.m.multiplex_property_mapping,self.m.citation.vertices(),self.paper_years,self.degrees,'citation_to_collab','mode')
+        self.assertRaises(multiplex_structures.UnknownDirectionError,self.m.multiplex_property_mapping,self.m.citation.vertices(),self.paper_years,self.degrees,'sideways',as_arrays=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
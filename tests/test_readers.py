@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from benchmarks import generator
+from scientometric_graph_tool import citation_net
+from scientometric_graph_tool import external_memory
+from scientometric_graph_tool import multiplex_structures
+from tests import data
+
+def collaborations(multiplex):
+    ids = multiplex._collab_graphml_vertex_id_to_gt_id
+    years = multiplex.collab.edge_properties['first_year_collaborated']
+    return set((frozenset((ids.id_of(int(e.source())),ids.id_of(int(e.target())))),int(years[e])) for e in multiplex.collab.edges())
+
+def authorships(multiplex):
+    papers = multiplex._citation_graphml_vertex_id_to_gt_id
+    authors = multiplex._collab_graphml_vertex_id_to_gt_id
+    return set((papers.id_of(p),authors.id_of(int(a))) for p in xrange(multiplex.citation.num_vertices()) for a in multiplex._multiplex.authors_of(p))
+
+class TestReadMeta(data.DataTestCase):
+
+    def setUp(self):
+        #the meta file split in two, to read the second part into a multiplex that already has data
+        with open(self.path(generator.META_FILE)) as f:
+            lines = f.readlines()
+        half = len(lines)//2
+        for name,part in (('first.txt',lines[:half]),('second.txt',[lines[0]]+lines[half:])):
+            with open(self.path(name),'w') as f:
+                f.writelines(part)
+
+    def read(self,bulk,remove_collaborations=0):
+        m = multiplex_structures.PaperAuthorMultiplex()
+        m.read_meta_create_collab(self.path('first.txt'),bulk=bulk)
+        for e in list(m.collab.edges())[:remove_collaborations]:
+            m.collab.remove_edge(e)
+        m.read_meta_create_collab(self.path('second.txt'),bulk=bulk,chunk_size=97)
+        return m
+
+    def assertSameMultiplex(self,a,b):
+        self.assertEqual(a._citation_graphml_vertex_id_to_gt_id.ids(),b._citation_graphml_vertex_id_to_gt_id.ids())
+        self.assertEqual(a._collab_graphml_vertex_id_to_gt_id.ids(),b._collab_graphml_vertex_id_to_gt_id.ids())
+        numpy.testing.assert_array_equal(a.citation.vertex_properties['year'].a,b.citation.vertex_properties['year'].a)
+        self.assertEqual(collaborations(a),collaborations(b))
+        self.assertEqual(authorships(a),authorships(b))
+
+    def test_bulk_like_line_by_line(self):
+        self.assertSameMultiplex(self.read(bulk=True),self.read(bulk=False))
+
+    def test_bulk_like_line_by_line_after_removed_collaborations(self):
+        self.assertSameMultiplex(self.read(bulk=True,remove_collaborations=25),self.read(bulk=False,remove_collaborations=25))
+
+    def test_whole_file(self):
+        a = data.multiplex(self.directory,bulk=True)
+        b = data.multiplex(self.directory,bulk=False)
+        self.assertSameMultiplex(a,b)
+        self.assertEqual(data.edge_set(a.citation),data.edge_set(b.citation))
+
+
+_Plan = external_memory._Plan
+
+class _TinyPlan(_Plan):
+    'Sizes small enough for many chunks, partitions, runs and merge passes on the test data'
+
+    def __init__(self,memory_budget,file_size):
+        _Plan.__init__(self,memory_budget,file_size)
+        self.chunk_bytes = 700
+        self.n_partitions = 5
+        self.run_length = 150
+        self.block = 23
+        self.fan_in = 3
+
+class TestReadEdgelist(data.DataTestCase):
+
+    def setUp(self):
+        with open(self.path(generator.CITATION_FILE)) as f:
+            lines = f.readlines()
+        with open(self.path('first.txt'),'w') as f:
+            f.writelines(lines[:len(lines)//2])
+        self.years = dict(data._meta_years(self.directory))
+
+    def read(self,existing=False,removed=0,tiny=False,**read_edgelist_arguments):
+        net = citation_net.PaperCitationNet()
+        if existing:
+            #some papers with years, half of the citations, and a few of them removed again
+            for paper in sorted(self.years)[:100]:
+                net.add_paper(paper,self.years[paper])
+            net.read_edgelist(self.path('first.txt'))
+            for e in list(net.graph.edges())[:removed]:
+                net.graph.remove_edge(e)
+        if tiny:
+            external_memory._Plan = _TinyPlan
+        try:
+            net.read_edgelist(self.path(generator.CITATION_FILE),**read_edgelist_arguments)
+        finally:
+            external_memory._Plan = _Plan
+        return net
+
+    def assertSameNetwork(self,a,b):
+        ids = a._citation_graphml_vertex_id_to_gt_id.ids()
+        self.assertEqual(ids,b._citation_graphml_vertex_id_to_gt_id.ids())
+        numpy.testing.assert_array_equal(a.graph.vertex_properties['year'].a,b.graph.vertex_properties['year'].a)
+        self.assertEqual(data.edge_set(a.graph,a.graph.edge_properties['year']),data.edge_set(b.graph,b.graph.edge_properties['year']))
+
+    def test_readers_agree(self):
+        for existing,removed in ((False,0),(True,0),(True,40)):
+            expected = self.read(existing,removed)
+            self.assertEqual(expected.graph.num_edges(),len(set(data.citations(self.directory))))
+            self.assertSameNetwork(self.read(existing,removed,bulk=True,chunk_size=97),expected)
+            self.assertSameNetwork(self.read(existing,removed,memory_budget=10**6),expected)
+            self.assertSameNetwork(self.read(existing,removed,tiny=True,memory_budget=10**6),expected)
+
+    def test_years_of_new_citations(self):
+        for arguments in ({},{'bulk':True},{'memory_budget':10**6,'tiny':True}):
+            net = self.read(existing=True,removed=40,**arguments)
+            years = net.graph.edge_properties['year']
+            paper_years = net.graph.vertex_properties['year']
+            for e in net.graph.edges():
+                self.assertEqual(years[e],paper_years[e.target()])
+
+    def test_new_keys(self):
+        blocks = [numpy.array([1,4,6]),numpy.array([9,12]),numpy.array([13,30,31])]
+        existing = [numpy.array([0,4]),numpy.array([5,6,7,8,9]),numpy.array([31]),numpy.array([40])]
+        new = numpy.concatenate(list(external_memory._new_keys(blocks,existing)))
+        numpy.testing.assert_array_equal(new,[1,12,13,30])
+        numpy.testing.assert_array_equal(numpy.concatenate(list(external_memory._new_keys(blocks,[]))),numpy.concatenate(blocks))
+
+    def test_merge_passes(self):
+        work = tempfile.mkdtemp(prefix='sgt_test_')
+        try:
+            rnd = numpy.random.RandomState(0)
+            runs = ['run_%d'%k for k in xrange(11)]
+            for run in runs:
+                external_memory._append(work,run,numpy.unique(rnd.randint(0,500,size=40)))
+            expected = numpy.unique(numpy.concatenate([numpy.fromfile(os.path.join(work,run),dtype='int64') for run in runs]))
+            merged = numpy.concatenate(list(external_memory._merge(runs,_TinyPlan(10**6,10**6),work,'merged')))
+            numpy.testing.assert_array_equal(merged,expected)
+            #the runs of every pass are named after the merge
+            self.assertEqual(sorted(os.listdir(work)),['merged_1_0','merged_1_1'])
+        finally:
+            shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from scientometric_graph_tool import instrumentation
+from scientometric_graph_tool import multiplex_structures
+from scientometric_graph_tool import result_cache
+from tests import data
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='sgt_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory,ignore_errors=True)
+
+    def test_versions_and_lru(self):
+        cache = result_cache.ResultCache(max_entries=2)
+        cache.put('a',1,10)
+        cache.put('b',1,20)
+        self.assertEqual(cache.get('a',1),10)
+        cache.put('c',1,30)
+        self.assertRaises(KeyError,cache.get,'b',1) #least recently used
+        self.assertEqual(cache.get('c',1),30)
+        self.assertRaises(KeyError,cache.get,'a',2) #a new version drops everything
+        self.assertRaises(KeyError,cache.get,'c',1)
+        self.assertEqual((cache.hits,cache.misses),(2,3))
+
+    def test_results_are_copies(self):
+        cache = result_cache.ResultCache()
+        result = {'p':[1,2,3],'q':numpy.arange(3)}
+        cache.put('k',0,result)
+        result['p'].append(4)
+        result['q'][0] = 7
+        first = cache.get('k',0)
+        first['p'][0] = -1
+        first['q'][1] = -1
+        second = cache.get('k',0)
+        self.assertEqual(second['p'],[1,2,3])
+        numpy.testing.assert_array_equal(second['q'],[0,1,2])
+
+    def test_disk_tier(self):
+        results = os.path.join(self.directory,'results')
+        cache = result_cache.ResultCache()
+        cache.attach_directory(results,5)
+        cache.put(('m',(1,),()),5,[1,2])
+        cache.put(('m',(2,),()),6,[3]) #not the version on disk
+        later = result_cache.ResultCache()
+        later.attach_directory(results,5)
+        self.assertEqual(later.get(('m',(1,),()),5),[1,2])
+        self.assertRaises(KeyError,later.get,('m',(2,),()),5)
+
+    def test_attach_keeps_other_directories(self):
+        other = os.path.join(self.directory,'other')
+        os.makedirs(other)
+        result_cache.ResultCache().attach_directory(os.path.join(self.directory,'results'),0)
+        self.assertTrue(os.path.isdir(other))
+
+
+class TestMultiplexResultCache(data.DataTestCase):
+
+    def setUp(self):
+        self.snapshot = self.path('snapshot')
+        data.multiplex(self.directory,bulk=True).save_snapshot(self.snapshot)
+
+    def tearDown(self):
+        instrumentation.set_sink(None)
+
+    def loaded(self):
+        m = multiplex_structures.PaperAuthorMultiplex()
+        m.load_snapshot(self.snapshot)
+        m.enable_result_cache()
+        return m
+
+    def test_invalidated_by_changes(self):
+        m = self.loaded()
+        first = m.socially_biased_citations()
+        self.assertEqual(m.socially_biased_citations(),first)
+        self.assertEqual(m._result_cache.hits,1)
+        m.add_paper('new paper',2011,['a1','a2'])
+        self.assertEqual(len(m.socially_biased_citations()),len(first)+1)
+
+    def test_reused_by_later_sessions_until_saved_again(self):
+        expected = self.loaded().socially_biased_citations(as_arrays=True)
+        sink = instrumentation.CollectingSink()
+        instrumentation.set_sink(sink)
+        m = self.loaded()
+        for a,b in zip(m.socially_biased_citations(as_arrays=True),expected):
+            numpy.testing.assert_array_equal(a,b)
+        self.assertEqual(sink.counters.get('result_cache.disk_hits'),1)
+
+        cached = os.listdir(os.path.join(self.snapshot,'result_cache'))
+        m.save_snapshot(self.snapshot)
+        self.assertFalse(os.path.exists(os.path.join(self.snapshot,'result_cache',cached[0])))
+        self.loaded().socially_biased_citations(as_arrays=True)
+        self.assertEqual(sink.counters.get('result_cache.disk_hits'),1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from scientometric_graph_tool import multiplex_structures
+from scientometric_graph_tool import server
+from tests import data
+
+class TestQueryServer(data.DataTestCase):
+
+    def setUp(self):
+        self.m = data.multiplex(self.directory,bulk=True)
+        self.socket_directory = tempfile.mkdtemp(prefix='sgt_socket_')
+        self.server = server.QueryServer(self.m,os.path.join(self.socket_directory,'socket'))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.close()
+        shutil.rmtree(self.socket_directory)
+
+    def test_answers(self):
+        papers = self.m._citation_graphml_vertex_id_to_gt_id.ids()
+        expected = self.m.socially_biased_citations()
+        with server.QueryClient(self.server.address,timeout=60) as client:
+            counts = client.socially_biased_citations(papers+['unknown'])
+            authors = client.authors_of(papers[:10])
+        self.assertEqual(counts[:-1],[list(expected[p]) for p in papers])
+        self.assertEqual(counts[-1],None)
+        for paper,paper_authors in zip(papers[:10],authors):
+            self.assertEqual(sorted(paper_authors),sorted(self.m._collab_graphml_vertex_id_to_gt_id.id_of(int(a)) for a in self.m.authors_of(paper)))
+
+    def test_message_too_long(self):
+        with server.QueryClient(self.server.address,timeout=60) as client:
+            client._wfile.write(server.HEADER.pack(server.MAX_MESSAGE_BYTES+1))
+            response = server._read_message(client._rfile)
+            self.assertEqual(response[0]['error'],'ValueError')
+            self.assertEqual(server._read_message(client._rfile),None) #closed by the server
+
+    def test_counts_do_not_block_other_batches(self):
+        started = threading.Event()
+        release = threading.Event()
+        compute = self.m.socially_biased_citations
+        def blocked(*args,**kwargs):
+            started.set()
+            release.wait(60)
+            return compute(*args,**kwargs)
+        self.m.socially_biased_citations = blocked
+        results = []
+        def ask():
+            with server.QueryClient(self.server.address,timeout=60) as client:
+                results.append(client.socially_biased_citations(self.m._citation_graphml_vertex_id_to_gt_id.ids()[:3]))
+        counting = threading.Thread(target=ask)
+        counting.start()
+        try:
+            self.assertTrue(started.wait(60))
+            #answered while the counts are being computed
+            with server.QueryClient(self.server.address,timeout=60) as client:
+                self.assertEqual(client.info()['papers'],self.m.citation.num_vertices())
+            self.assertEqual(results,[])
+        finally:
+            release.set()
+            counting.join()
+        self.assertEqual(len(results[0]),3)
+
+
+class TestQueryServerOnSnapshot(data.DataTestCase):
+
+    def test_layers_built_once(self):
+        directory = tempfile.mkdtemp(prefix='sgt_socket_')
+        try:
+            data.multiplex(self.directory,bulk=True).save_snapshot(os.path.join(directory,'snapshot'))
+            loaded = multiplex_structures.PaperAuthorMultiplex()
+            loaded.enable_compact_mode()
+            loaded.load_snapshot(os.path.join(directory,'snapshot'))
+            built = []
+            materialize = loaded._snapshot.materialize
+            def slow(name):
+                built.append(name)
+                time.sleep(0.2)
+                return materialize(name)
+            loaded._snapshot.materialize = slow
+            query_server = server.QueryServer(loaded,os.path.join(directory,'socket'))
+            layers = []
+            def ask(queries):
+                layers.append(query_server.answer(queries))
+            threads = [threading.Thread(target=ask,args=([{'op':'degrees','ids':['x'],'layer':layer,'deg':'in'}],)) for layer in ('citation','collab')]
+            threads += [threading.Thread(target=ask,args=([{'op':'info'}],)) for k in xrange(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            query_server.close()
+            self.assertEqual(len(built),len(set(built)))
+            self.assertTrue('citation' in built and 'collab' in built)
+            self.assertFalse(any('error' in response for responses in layers for response in responses))
+            self.assertFalse('year' in loaded.citation.edge_properties)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
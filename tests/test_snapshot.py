@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy
+from scientometric_graph_tool import multiplex_structures
+from scientometric_graph_tool import snapshot
+from tests import data
+
+def kernels(multiplex):
+    #results of the kernels that run on the columns of a snapshot, as plain lists
+    counts = multiplex.socially_biased_citations(as_arrays=True)
+    metrics = multiplex.author_metrics(window=3,exclude_self_citations=True)
+    offsets,papers = multiplex.papers_by_many(numpy.arange(multiplex._num_vertices('collab')))
+    return ([c.tolist() for c in counts],dict((k,v.tolist()) for k,v in metrics.items()),offsets.tolist(),papers.tolist())
+
+def attached_kernels(shared):
+    return os.getpid(),kernels(shared.attach())
+
+class TestSnapshot(data.DataTestCase):
+
+    def setUp(self):
+        self.m = data.multiplex(self.directory,bulk=True)
+        self.work = tempfile.mkdtemp(prefix='sgt_snapshot_')
+
+    def tearDown(self):
+        shutil.rmtree(self.work,ignore_errors=True)
+
+    def loaded(self,with_csr=False):
+        directory = os.path.join(self.work,'csr' if with_csr else 'plain')
+        snapshot.save_snapshot(self.m,directory,with_csr=with_csr)
+        loaded = multiplex_structures.PaperAuthorMultiplex()
+        loaded.load_snapshot(directory)
+        return loaded
+
+    def test_kernels_like_in_memory(self):
+        expected = kernels(self.m)
+        for with_csr in (False,True):
+            loaded = self.loaded(with_csr)
+            self.assertEqual(kernels(loaded),expected)
+            if with_csr:
+                #the kernels ran on the stored CSR columns, without building the layer graphs
+                self.assertFalse('citation' in loaded.__dict__ or 'collab' in loaded.__dict__)
+
+    def test_layers_like_in_memory(self):
+        loaded = self.loaded()
+        self.assertEqual(data.edge_set(loaded.citation),data.edge_set(self.m.citation))
+        self.assertEqual(data.edge_set(loaded.collab),data.edge_set(self.m.collab))
+        numpy.testing.assert_array_equal(loaded.citation.vertex_properties['year'].a,self.m.citation.vertex_properties['year'].a)
+        for layer in ('citation','collab'):
+            ids = self.m._layer_ids(layer).ids()
+            self.assertEqual(loaded._layer_ids(layer).ids(),ids)
+            numpy.testing.assert_array_equal(loaded.vertex_indices(ids,layer)[0],numpy.arange(len(ids)))
+
+    def test_csr_columns(self):
+        loaded = self.loaded(with_csr=True)
+        for stored,computed in ((loaded._citation_csr(),self.m._citation_csr()),(loaded._collab_adjacency(),self.m._collab_adjacency())):
+            self.assertEqual(len(stored),len(computed))
+            for a,b in zip(stored,computed):
+                self.assertTrue(isinstance(a,numpy.memmap))
+                numpy.testing.assert_array_equal(a,b)
+
+    def test_changes_after_loading(self):
+        loaded = self.loaded(with_csr=True)
+        years = loaded._paper_years()
+        ids = loaded._layer_ids('citation')
+        cited,citing = [int(i) for i in numpy.argsort(years,kind='mergesort')[[0,-1]]]
+        loaded.add_citation(ids.id_of(cited),ids.id_of(citing))
+        #the stored citation CSR no longer describes the layer
+        offsets,targets = loaded._citation_csr()
+        self.assertFalse(isinstance(targets,numpy.memmap))
+        self.assertTrue(citing in targets[offsets[cited]:offsets[cited+1]].tolist())
+        self.assertEqual(loaded.socially_biased_citations(as_arrays=True)[0][cited],self.m.socially_biased_citations(as_arrays=True)[0][cited]+1)
+
+
+class TestSharedMultiplex(data.DataTestCase):
+
+    def setUp(self):
+        self.m = data.multiplex(self.directory,bulk=True)
+        self.work = tempfile.mkdtemp(prefix='sgt_shared_')
+        self.shared = self.m.export_shared(self.work)
+
+    def tearDown(self):
+        self.shared.release()
+        shutil.rmtree(self.work,ignore_errors=True)
+
+    def test_attach(self):
+        attached = self.shared.attach()
+        self.assertTrue(self.shared.attach() is attached) #once per process
+        self.assertEqual(kernels(attached),kernels(self.m))
+
+    def test_pickles_as_directory(self):
+        copy = pickle.loads(pickle.dumps(self.shared,2))
+        self.assertEqual(copy.directory,self.shared.directory)
+        self.assertTrue(len(pickle.dumps(self.shared,2))<1000)
+        #only the exporting handle removes the snapshot
+        copy.release()
+        self.assertTrue(os.path.exists(self.shared.directory))
+        self.shared.release()
+        self.assertFalse(os.path.exists(self.shared.directory))
+
+    def test_workers(self):
+        pool = multiprocessing.Pool(2)
+        try:
+            results = pool.map(attached_kernels,[self.shared]*4)
+        finally:
+            pool.close()
+            pool.join()
+        expected = kernels(self.m)
+        for pid,result in results:
+            self.assertNotEqual(pid,os.getpid())
+            self.assertEqual(result,expected)
+        self.assertTrue(os.path.exists(self.shared.directory)) #workers do not remove it
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import numpy
+import graph_tool.all as gt
+from scientometric_graph_tool import temporal
+from tests import data
+
+def collaborations_of(view):
+    return set((int(e.source()),int(e.target())) for e in view.edges())
+
+class TestTemporalIndex(data.DataTestCase):
+
+    def setUp(self):
+        self.m = data.multiplex(self.directory,bulk=True)
+        self.index = self.m.temporal_index()
+        self.years = self.m.collab.edge_properties['first_year_collaborated']
+
+    def expected(self,first_year,last_year):
+        return set((int(e.source()),int(e.target())) for e in self.m.collab.edges() if first_year<=self.years[e]<=last_year)
+
+    def test_views_of_windows(self):
+        view = self.index.collab_view(1995,2000)
+        self.assertEqual(collaborations_of(view),self.expected(1995,2000))
+        self.assertIs(self.index.collab_view(1995,2000),view)
+        papers = self.index.citation_view(1995,2000)
+        paper_years = self.m.citation.vertex_properties['year']
+        self.assertEqual(sorted(int(v) for v in papers.vertices()),[int(v) for v in self.m.citation.vertices() if 1995<=paper_years[v]<=2000])
+
+    def test_cached_views_are_bounded(self):
+        self.index.max_views = 3
+        views = [self.index.collab_view(1990,year) for year in xrange(1995,2001)]
+        self.assertEqual(len(self.index._views),3)
+        self.assertIs(self.index.collab_view(1990,2000),views[-1])
+        self.assertIsNot(self.index.collab_view(1990,1995),views[0])
+
+    def test_least_recently_used_view_is_dropped(self):
+        self.index.max_views = 2
+        a = self.index.collab_view(1990,1995)
+        b = self.index.collab_view(1990,1996)
+        self.assertIs(self.index.collab_view(1990,1995),a)
+        self.index.collab_view(1990,1997)
+        self.assertIs(self.index.collab_view(1990,1995),a)
+        self.assertIsNot(self.index.collab_view(1990,1996),b)
+
+    def test_sweep_keeps_views_bounded(self):
+        self.m.shortest_path_collab_formation_sweep()
+        for year in xrange(1991,2011):
+            self.m.shortest_path_collab_formation(year)
+        self.assertTrue(len(self.index._views)<=self.index.max_views)
+
+    def test_cached_views_follow_new_collaborations(self):
+        view = self.index.collab_view(2000,2005)
+        authors = self.m._collab_graphml_vertex_id_to_gt_id.ids()
+        self.m.add_collaboration(authors[0],authors[-1],2003)
+        self.m.add_collaboration(authors[1],authors[-2],2008)
+        self.assertEqual(collaborations_of(view),self.expected(2000,2005))
+        self.assertEqual(collaborations_of(self.index.collab_view(2006,2010)),self.expected(2006,2010))
+
+    def test_earlier_collaboration_moves_edge(self):
+        late = [e for e in self.m.collab.edges() if self.years[e]>=2005][0]
+        self.index.collab_view(1990,2000)
+        ids = self.m._collab_graphml_vertex_id_to_gt_id
+        self.m.add_collaboration(ids.id_of(int(late.source())),ids.id_of(int(late.target())),1995)
+        self.assertEqual(collaborations_of(self.index.collab_view(1990,2000)),self.expected(1990,2000))
+        self.assertEqual(collaborations_of(self.index.collab_view(2001,2010)),self.expected(2001,2010))
+        self.assertEqual(sorted(self.index.collaborations.items().tolist()),sorted(self.m.collab.edge_index[e] for e in self.m.collab.edges()))
+
+    def test_shortest_path_collab_formation(self):
+        ids = self.m._collab_graphml_vertex_id_to_gt_id
+        self.m.add_collaboration(ids.id_of(0),ids.id_of(len(ids)-1),2004)
+        for year in (1995,2004):
+            distances = self.m.shortest_path_collab_formation(year)
+            edges = [e for e in self.m.collab.edges() if self.years[e]==year]
+            self.assertEqual(sorted(self.m.collab.edge_index[e] for e in distances),sorted(self.m.collab.edge_index[e] for e in edges))
+            older = self.m.collab.new_edge_property('bool')
+            older.a[:] = self.years.a<year
+            view = gt.GraphView(self.m.collab,efilt=older)
+            for e,distance in distances.items():
+                self.assertEqual(distance,gt.shortest_distance(view,view.vertex(int(e.source())),view.vertex(int(e.target()))))
+
+
+class TestYearIndex(unittest.TestCase):
+
+    def test_changes_merged_like_sorting(self):
+        rnd = numpy.random.RandomState(0)
+        years = dict(enumerate(rnd.randint(1990,2000,size=200).tolist()))
+        index = temporal.YearIndex(years.keys(),years.values(),'int32','int16')
+        for step in xrange(60):
+            for k in xrange(rnd.randint(1,5)):
+                item = rnd.randint(0,260)
+                year = rnd.randint(1985,2005)
+                index.set(item,year,years.get(item))
+                years[item] = year
+            first,last = sorted(rnd.randint(1985,2006,size=2))
+            expected = sorted((year,item) for item,year in years.items() if first<=year<=last)
+            self.assertEqual(index.items(first,last).tolist(),[item for year,item in expected])
+        self.assertEqual(index.years().tolist(),sorted(set(years.values())))
+        self.assertEqual(index.items().dtype,numpy.int32)
+
+
+if __name__ == '__main__':
+    unittest.main()